@@ -7,6 +7,8 @@ from flask import Flask, request, jsonify
 from threading import Thread
 from telethon import TelegramClient, events
 from telethon.sessions import StringSession
+from utils.quiz_model import normalize_quiz
+from utils.quiz_formatter import render_quiz, write_quiz
 
 # Flask app setup
 app = Flask(__name__)
@@ -192,43 +194,8 @@ async def fetch_quiz_data(url):
         print("Failed to decode quiz data")
         return None
 
-    # Format quiz questions
-    questions = []
-    count = 1
-
     try:
-        for q in quiz_data.get("questions", []):
-            question_text = q.get('question', '')
-            if not question_text:
-                # Try alternate keys that might contain the question
-                for key in ['text', 'title', 'q']:
-                    if key in q:
-                        question_text = q[key]
-                        break
-            
-            formatted = f"{count}. {question_text}\n"
-            
-            # Handle options with different possible structures
-            options = q.get('options', [])
-            if not options and 'answers' in q:
-                options = q['answers']
-            
-            for i, option in enumerate(options):
-                # Handle both object and string options
-                if isinstance(option, dict):
-                    option_text = option.get('text', '')
-                    is_correct = option.get('correct', False)
-                else:
-                    option_text = str(option)
-                    is_correct = False
-                
-                formatted += f"{chr(65 + i)}. {option_text}"
-                if is_correct:
-                    formatted += " ✅"
-                formatted += "\n"
-            
-            questions.append(formatted)
-            count += 1
+        quiz = normalize_quiz(quiz_data)
     except Exception as e:
         print(f"Error formatting quiz data: {e}")
         if quiz_data:
@@ -236,14 +203,14 @@ async def fetch_quiz_data(url):
             return str(quiz_data)
         return None
 
-    if not questions:
+    if not quiz.questions:
         print("No questions found in quiz data")
         return None
 
     # Write quiz to file
     filename = "quiz_questions.txt"
     with open(filename, "w", encoding="utf-8") as f:
-        f.write("\n\n".join(questions))
+        write_quiz(quiz, 'txt', f)
 
     return filename
 
@@ -312,54 +279,18 @@ def extract():
         if not quiz_data:
             return "Failed to decode quiz data", 400
             
-        # Format quiz questions
-        questions = []
-        count = 1
-        
         try:
-            for q in quiz_data.get("questions", []):
-                question_text = q.get('question', '')
-                if not question_text:
-                    # Try alternate keys that might contain the question
-                    for key in ['text', 'title', 'q']:
-                        if key in q:
-                            question_text = q[key]
-                            break
-                
-                formatted = f"{count}. {question_text}\n"
-                
-                # Handle options with different possible structures
-                options = q.get('options', [])
-                if not options and 'answers' in q:
-                    options = q['answers']
-                
-                for i, option in enumerate(options):
-                    # Handle both object and string options
-                    if isinstance(option, dict):
-                        option_text = option.get('text', '')
-                        is_correct = option.get('correct', False)
-                    else:
-                        option_text = str(option)
-                        is_correct = False
-                    
-                    formatted += f"{chr(65 + i)}. {option_text}"
-                    if is_correct:
-                        formatted += " ✅"
-                    formatted += "\n"
-                
-                questions.append(formatted)
-                count += 1
+            quiz = normalize_quiz(quiz_data)
         except Exception as e:
             print(f"Error formatting quiz data: {str(e)}")
             if quiz_data:
                 return f"Error formatting quiz data: {str(quiz_data)}", 400
             return "Error formatting quiz data", 400
             
-        if not questions:
+        if not quiz.questions:
             return "No questions found in quiz data", 400
             
-        result = "\n\n".join(questions)
-        return f"<pre>{result}</pre>"
+        return f"<pre>{render_quiz(quiz, 'txt')}</pre>"
         
     return """
     <form method="post">
@@ -5,13 +5,26 @@ import os
 import asyncio
 import logging
 from flask_sqlalchemy import SQLAlchemy
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, stream_with_context
 from threading import Thread
 from telethon import TelegramClient, events
 from telethon.sessions import StringSession
-from utils.quiz_extractor import extract_quiz, QuizExtractor
+from utils.quiz_extractor import extract_quiz, QuizExtractor, revalidate_quiz
 from utils.database import QuizDatabase
-from models import db, Quiz, QuizAttempt
+from utils.sharded_store import STORAGE_BACKEND, open_quiz_store, unsupported
+from utils.async_database import AsyncQuizDatabase
+from utils.search_index import QuizSearchIndex
+from utils.access_counter import access_counter
+from utils.persistence_queue import persistence_queue
+from utils.refresh_scheduler import RefreshScheduler
+from utils.top_quizzes import top_quizzes
+from utils.leaderboard import leaderboard
+from utils.db_metrics import db_metrics
+from utils.quiz_cache import quiz_cache, answer_key_cache
+from utils.quiz_model import normalize_quiz
+from utils.quiz_formatter import (MIMETYPES, content_version, format_question_text, iter_quiz,
+                                  render_cache, render_quiz, write_quiz)
+from models import db, QuizAttempt
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, 
@@ -44,8 +57,47 @@ client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH)
 
 # Initialize database tables
 with app.app_context():
+    db_metrics.install(db.engine)
     db.create_all()
     logger.info("Database tables created")
+    QuizDatabase.ensure_indexes()
+    QuizSearchIndex.ensure(load_body=QuizDatabase.get_formatted_text)
+
+# Quiz storage: QuizDatabase, or SQLite shards in SHARD_DIR with
+# STORAGE_BACKEND=sharded (no search index, versions, stats, leaderboards
+# or archive; those routes answer 501)
+quiz_store = open_quiz_store()
+SHARDED = STORAGE_BACKEND == 'sharded'
+
+# Non-blocking database access for the Telegram handlers
+async_db = AsyncQuizDatabase(app, database=quiz_store)
+
+# Flush buffered quiz access counts in the background
+access_counter.start(app)
+
+# Save extracted quizzes in the background
+persistence_queue.start(app, database=quiz_store)
+
+# Compress quizzes stored before compressed columns were introduced
+if not SHARDED:
+    QuizDatabase.start_compression_migration(app)
+
+# Revalidate stored quizzes older than QUIZ_TTL_HOURS against QuizBot in the
+# background, within REFRESH_CALLS_PER_MINUTE Telegram calls
+refresh_scheduler = RefreshScheduler(
+    async_db, lambda quiz_id, fingerprint: revalidate_quiz(client, quiz_id, fingerprint)
+)
+
+# Move quizzes nobody has opened for ARCHIVE_AFTER_DAYS days to the archive segments
+if not SHARDED:
+    QuizDatabase.start_archiver(app, days=int(os.environ.get("ARCHIVE_AFTER_DAYS", "90")))
+
+def top_listings(limit):
+    """Quiz count and the most recent and most popular quizzes"""
+    if SHARDED:
+        return quiz_store.count_quizzes(), quiz_store.get_recent_quizzes(limit), quiz_store.get_popular_quizzes(limit)
+    # Served from memory, see utils.top_quizzes
+    return top_quizzes.count(), top_quizzes.recent(limit), top_quizzes.popular(limit)
 
 def decode_param(start_param):
     try:
@@ -200,57 +252,15 @@ async def fetch_quiz_data(url):
         return None
 
     # Format quiz questions
-    questions = []
-    count = 1
-
-    try:
-        for q in quiz_data.get("questions", []):
-            question_text = q.get('question', '')
-            if not question_text:
-                # Try alternate keys that might contain the question
-                for key in ['text', 'title', 'q']:
-                    if key in q:
-                        question_text = q[key]
-                        break
-            
-            formatted = f"{count}. {question_text}\n"
-            
-            # Handle options with different possible structures
-            options = q.get('options', [])
-            if not options and 'answers' in q:
-                options = q['answers']
-            
-            for i, option in enumerate(options):
-                # Handle both object and string options
-                if isinstance(option, dict):
-                    option_text = option.get('text', '')
-                    is_correct = option.get('correct', False)
-                else:
-                    option_text = str(option)
-                    is_correct = False
-                
-                formatted += f"{chr(65 + i)}. {option_text}"
-                if is_correct:
-                    formatted += " ✅"
-                formatted += "\n"
-            
-            questions.append(formatted)
-            count += 1
-    except Exception as e:
-        print(f"Error formatting quiz data: {e}")
-        if quiz_data:
-            # If we have some data but can't parse it properly, return it raw
-            return str(quiz_data)
-        return None
-
-    if not questions:
+    quiz = normalize_quiz(quiz_data)
+    if not quiz.questions:
         print("No questions found in quiz data")
         return None
 
     # Write quiz to file
     filename = "quiz_questions.txt"
     with open(filename, "w", encoding="utf-8") as f:
-        f.write("\n\n".join(questions))
+        write_quiz(quiz, 'txt', f)
 
     return filename
 
@@ -270,31 +280,52 @@ async def quiz_handler(event):
             return
             
         # Check if this quiz is already in our database
-        with app.app_context():
-            existing_quiz = QuizDatabase.get_quiz_by_id(start_param)
+        existing_quiz = await async_db.get_quiz_by_id(start_param)
+        
+        if existing_quiz:
+            logger.info(f"Quiz already exists in database: {start_param}")
+            await event.reply("Quiz already exists in our database. Sending the saved quiz data...")
             
-            if existing_quiz:
-                logger.info(f"Quiz already exists in database: {start_param}")
-                await event.reply("Quiz already exists in our database. Sending the saved quiz data...")
-                
-                # Send the formatted quiz data
-                filename = f"quiz_{start_param}.txt"
-                with open(filename, "w", encoding="utf-8") as f:
-                    f.write(existing_quiz.formatted_data)
-                
-                await client.send_file(
-                    event.chat_id, 
-                    filename, 
-                    caption=f"Here's your quiz with {existing_quiz.question_count} questions"
-                )
-                
-                # Update access count
-                existing_quiz.increment_access()
-                db.session.commit()
-                
-                # Clean up
-                os.remove(filename)
-                return
+            # Send the formatted quiz data
+            filename = f"quiz_{start_param}.txt"
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(await async_db.get_formatted_text(existing_quiz))
+            
+            await client.send_file(
+                event.chat_id, 
+                filename, 
+                caption=f"Here's your quiz with {existing_quiz.question_count} questions"
+            )
+            
+            # Update access count
+            await async_db.record_access(existing_quiz)
+            
+            # Served as stored; refreshed in the background once stale
+            if not SHARDED:
+                refresh_scheduler.notify(existing_quiz)
+            
+            # Clean up
+            os.remove(filename)
+            return
+        
+        # Extracted moments ago and still waiting to be saved
+        queued_quiz = persistence_queue.pending(start_param)
+        if queued_quiz:
+            logger.info(f"Quiz is queued for saving: {start_param}")
+            quiz = normalize_quiz(queued_quiz)
+            filename = f"quiz_{start_param}.txt"
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(queued_quiz.get('formatted_text') or render_quiz(quiz, 'txt'))
+            
+            await client.send_file(
+                event.chat_id, 
+                filename, 
+                caption=f"Here's your quiz with {quiz.question_count} questions"
+            )
+            
+            # Clean up
+            os.remove(filename)
+            return
         
         # For short codes (typical format: 8-10 alphanumeric characters)
         if len(start_param) < 12 and start_param.isalnum():
@@ -304,9 +335,8 @@ async def quiz_handler(event):
             quiz_data = extract_quiz(start_param, API_ID, API_HASH, SESSION_STRING)
             
             if quiz_data:
-                # Save to database
-                with app.app_context():
-                    QuizDatabase.save_quiz(start_param, quiz_data)
+                # Save to database in the background
+                persistence_queue.submit(start_param, quiz_data)
                 
                 # Create a file with the formatted data
                 filename = f"quiz_{start_param}.txt"
@@ -335,58 +365,25 @@ async def quiz_handler(event):
             return
             
         # Format quiz questions
-        questions = []
-        count = 1
-        
-        for q in quiz_data.get("questions", []):
-            question_text = q.get('question', '')
-            if not question_text:
-                for key in ['text', 'title', 'q']:
-                    if key in q:
-                        question_text = q[key]
-                        break
-            
-            formatted = f"{count}. {question_text}\n"
-            
-            options = q.get('options', [])
-            if not options and 'answers' in q:
-                options = q['answers']
-            
-            for i, option in enumerate(options):
-                if isinstance(option, dict):
-                    option_text = option.get('text', '')
-                    is_correct = option.get('correct', False)
-                else:
-                    option_text = str(option)
-                    is_correct = False
-                
-                formatted += f"{chr(65 + i)}. {option_text}"
-                if is_correct:
-                    formatted += " ✅"
-                formatted += "\n"
-            
-            questions.append(formatted)
-            count += 1
-        
-        if not questions:
+        quiz = normalize_quiz(quiz_data)
+        if not quiz.questions:
             await event.reply("No questions found in quiz data.")
             return
             
         # Create formatted text content
-        formatted_text = "\n\n".join(questions)
+        formatted_text = render_quiz(quiz, 'txt')
         
         # Create a structured version for database storage
         structured_quiz = {
             'quiz_id': start_param,
-            'title': quiz_data.get('quiz_title', 'Telegram Quiz'),
-            'question_count': len(questions),
+            'title': quiz.title or 'Telegram Quiz',
+            'question_count': quiz.question_count,
             'questions': quiz_data.get('questions', []),
             'formatted_text': formatted_text
         }
         
-        # Save to database
-        with app.app_context():
-            QuizDatabase.save_quiz(start_param, structured_quiz)
+        # Save to database in the background
+        persistence_queue.submit(start_param, structured_quiz)
         
         # Write to file and send
         filename = f"quiz_{start_param}.txt"
@@ -396,7 +393,7 @@ async def quiz_handler(event):
         await client.send_file(
             event.chat_id, 
             filename, 
-            caption=f"Here's your quiz with {len(questions)} questions"
+            caption=f"Here's your quiz with {quiz.question_count} questions"
         )
         
         # Clean up
@@ -410,6 +407,108 @@ async def quiz_handler(event):
 def health_check():
     return "OK", 200
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Database latency, pool and slow-query metrics in the Prometheus text format"""
+    return Response(db_metrics.render() + persistence_queue.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/stats", methods=["GET"])
+def api_stats():
+    """Cache hit rates and buffered access counts"""
+    return jsonify({
+        "quiz_cache": quiz_cache.stats(),
+        "answer_key_cache": answer_key_cache.stats(),
+        "persistence_queue": persistence_queue.stats(),
+        "render_cache": {
+            "entries": len(render_cache.entries),
+            "bytes": render_cache.size,
+            "hits": render_cache.hits,
+            "misses": render_cache.misses
+        },
+        "access_counter": {
+            "flushes": access_counter.flushes,
+            "flushed": access_counter.flushed
+        },
+        "refresh_scheduler": refresh_scheduler.stats()
+    })
+
+@app.errorhandler(NotImplementedError)
+def not_implemented(e):
+    """Features the configured STORAGE_BACKEND does not have"""
+    return jsonify({"error": str(e)}), 501
+
+@app.route("/api/quizzes", methods=["GET"])
+def api_quizzes():
+    """Page through quizzes: ?order=recent|popular|created&cursor=...&limit=...&fields=a,b"""
+    fields = request.args.get("fields")
+    try:
+        page = quiz_store.list_quizzes(
+            order=request.args.get("order", "recent"),
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", 20, type=int),
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if page is None:
+        return jsonify({"error": "Could not list quizzes"}), 500
+    return jsonify(page)
+
+@app.route("/api/quiz/<quiz_id>/stats", methods=["GET"])
+def api_quiz_stats(quiz_id):
+    """Attempt statistics of a quiz, read from its running totals"""
+    quiz = quiz_store.get_quiz_by_id(quiz_id)
+    if not quiz:
+        return jsonify({"error": "Quiz not found"}), 404
+    stats = quiz_store.get_quiz_stats(quiz)
+    if stats is None:
+        return jsonify({"error": "Could not read quiz statistics"}), 500
+    stats["quiz_id"] = quiz.quiz_id
+    return jsonify(stats)
+
+@app.route("/api/quiz/<quiz_id>/versions", methods=["GET"])
+def api_quiz_versions(quiz_id):
+    """Saved versions of a quiz, or the questions of one with ?version=N"""
+    version = request.args.get("version", type=int)
+    if version is None:
+        versions = quiz_store.get_quiz_versions(quiz_id)
+        if not versions:
+            return jsonify({"error": "Quiz not found"}), 404
+        for entry in versions:
+            entry["created_at"] = entry["created_at"].isoformat() if entry["created_at"] else None
+        return jsonify({"quiz_id": quiz_id, "versions": versions})
+    data = quiz_store.get_quiz_version(quiz_id, version)
+    if data is None:
+        return jsonify({"error": "Version not found"}), 404
+    result = data.to_dict()
+    result["version"] = version
+    return jsonify(result)
+
+@app.route("/api/quiz/<quiz_id>/leaderboard", methods=["GET"])
+def api_quiz_leaderboard(quiz_id):
+    """Top attempts of a quiz, or the attempts ranked around ?attempt=<id>"""
+    if SHARDED:
+        raise unsupported("leaderboard")
+    quiz = QuizDatabase.get_quiz_by_id(quiz_id)
+    if not quiz:
+        return jsonify({"error": "Quiz not found"}), 404
+    attempt_id = request.args.get("attempt", type=int)
+    if attempt_id is not None:
+        window = min(max(request.args.get("window", 5, type=int), 0), 50)
+        entries = leaderboard.around(quiz.id, attempt_id, window)
+        if not entries:
+            return jsonify({"error": "Attempt not ranked"}), 404
+    else:
+        entries = leaderboard.top(quiz.id, min(max(request.args.get("limit", 10, type=int), 1), 100))
+    return jsonify({
+        "quiz_id": quiz.quiz_id,
+        "ranked": leaderboard.count(quiz.id),
+        "entries": [
+            dict(entry._asdict(), completed_at=entry.completed_at.isoformat())
+            for entry in entries
+        ]
+    })
+
 @app.route("/api/decode", methods=["POST"])
 def api_decode():
     try:
@@ -457,22 +556,36 @@ def extract():
             return "Invalid URL or shortcode format", 400
         
         # Check if we already have this quiz in the database
-        existing_quiz = QuizDatabase.get_quiz_by_id(start_param)
+        existing_quiz = quiz_store.get_quiz_by_id(start_param)
         if existing_quiz:
             logger.info(f"Quiz found in database: {start_param}")
             
             # Update access count
-            existing_quiz.increment_access()
-            db.session.commit()
+            quiz_store.record_access(existing_quiz)
+            access_count, _ = quiz_store.get_access_stats(existing_quiz)
             
             # Return the formatted quiz data
             result = f"""
             <h2>{existing_quiz.title}</h2>
             <p>Quiz ID: {existing_quiz.quiz_id}</p>
             <p>Questions: {existing_quiz.question_count}</p>
-            <p>This quiz has been accessed {existing_quiz.access_count} times.</p>
+            <p>This quiz has been accessed {access_count} times.</p>
+            <hr>
+            <pre>{quiz_store.get_formatted_text(existing_quiz)}</pre>
+            """
+            return result
+        
+        # Extracted moments ago and still waiting to be saved
+        queued_quiz = persistence_queue.pending(start_param)
+        if queued_quiz:
+            logger.info(f"Quiz is queued for saving: {start_param}")
+            quiz = normalize_quiz(queued_quiz)
+            result = f"""
+            <h2>{quiz.title or 'Telegram Quiz'}</h2>
+            <p>Quiz ID: {start_param}</p>
+            <p>Questions: {quiz.question_count}</p>
             <hr>
-            <pre>{existing_quiz.formatted_data}</pre>
+            <pre>{queued_quiz.get('formatted_text') or render_quiz(quiz, 'txt')}</pre>
             """
             return result
         
@@ -485,8 +598,8 @@ def extract():
             quiz_data = extract_quiz(start_param, API_ID, API_HASH, SESSION_STRING)
             
             if quiz_data:
-                # Save to database
-                QuizDatabase.save_quiz(start_param, quiz_data)
+                # Save to database in the background
+                persistence_queue.submit(start_param, quiz_data)
                 
                 # Format for display
                 result = f"""
@@ -507,65 +620,24 @@ def extract():
             return "Failed to decode quiz data. This may be a shortcode that requires advanced extraction.", 400
         
         # Format quiz questions
-        questions = []
-        count = 1
-        
-        try:
-            for q in quiz_data.get("questions", []):
-                question_text = q.get('question', '')
-                if not question_text:
-                    # Try alternate keys that might contain the question
-                    for key in ['text', 'title', 'q']:
-                        if key in q:
-                            question_text = q[key]
-                            break
-                
-                formatted = f"{count}. {question_text}\n"
-                
-                # Handle options with different possible structures
-                options = q.get('options', [])
-                if not options and 'answers' in q:
-                    options = q['answers']
-                
-                for i, option in enumerate(options):
-                    # Handle both object and string options
-                    if isinstance(option, dict):
-                        option_text = option.get('text', '')
-                        is_correct = option.get('correct', False)
-                    else:
-                        option_text = str(option)
-                        is_correct = False
-                    
-                    formatted += f"{chr(65 + i)}. {option_text}"
-                    if is_correct:
-                        formatted += " ✅"
-                    formatted += "\n"
-                
-                questions.append(formatted)
-                count += 1
-        except Exception as e:
-            logger.error(f"Error formatting quiz data: {str(e)}")
-            if quiz_data:
-                return f"Error formatting quiz data: {str(quiz_data)}", 400
-            return "Error formatting quiz data", 400
-        
-        if not questions:
+        quiz = normalize_quiz(quiz_data)
+        if not quiz.questions:
             return "No questions found in quiz data", 400
         
         # Create formatted content
-        formatted_text = "\n\n".join(questions)
+        formatted_text = render_quiz(quiz, 'txt')
         
         # Create structured data for database
         structured_quiz = {
             'quiz_id': start_param,
-            'title': quiz_data.get('quiz_title', 'Telegram Quiz'),
-            'question_count': len(questions),
+            'title': quiz.title or 'Telegram Quiz',
+            'question_count': quiz.question_count,
             'questions': quiz_data.get('questions', []),
             'formatted_text': formatted_text
         }
         
-        # Save to database
-        QuizDatabase.save_quiz(start_param, structured_quiz)
+        # Save to database in the background
+        persistence_queue.submit(start_param, structured_quiz)
         
         # Return formatted result
         result = f"""
@@ -578,7 +650,7 @@ def extract():
         return result
     
     # GET request - show the form
-    recent_quizzes = QuizDatabase.get_recent_quizzes(5)
+    _, recent_quizzes, _ = top_listings(5)
     recent_quiz_list = ""
     if recent_quizzes:
         recent_quiz_list = "<ul class='list-group mt-4'>"
@@ -648,17 +720,49 @@ def extract():
     </html>
     """
 
+# Questions shown per page on the quiz page
+QUESTIONS_PER_PAGE = 50
+
+# Quizzes with more questions are streamed from the question rows on download
+STREAM_DOWNLOAD_THRESHOLD = 500
+
 @app.route("/quiz/<quiz_id>", methods=["GET"])
 def view_quiz(quiz_id):
     """View a specific quiz by ID"""
-    quiz = QuizDatabase.get_quiz_by_id(quiz_id)
+    quiz = quiz_store.get_quiz_by_id(quiz_id)
     
     if not quiz:
         return "Quiz not found", 404
     
     # Update access count
-    quiz.increment_access()
-    db.session.commit()
+    quiz_store.record_access(quiz)
+    access_count, last_accessed = quiz_store.get_access_stats(quiz)
+    # The shards keep no attempt statistics
+    stats = None if SHARDED else quiz_store.get_quiz_stats(quiz)
+    attempts_line = ""
+    if stats and stats["attempts"]:
+        attempts_line = (f"<p>Attempts: {stats['attempts']} "
+                         f"({stats['completion_rate'] * 100:.0f}% completed)")
+        if stats["mean_score"] is not None:
+            attempts_line += f", average score {stats['mean_score']} of {quiz.question_count}"
+        attempts_line += "</p>"
+    
+    # Only the questions of the requested page are loaded
+    page_count = max(1, -(-(quiz.question_count or 0) // QUESTIONS_PER_PAGE))
+    page = min(max(request.args.get("page", 1, type=int), 1), page_count)
+    offset = (page - 1) * QUESTIONS_PER_PAGE
+    questions = quiz_store.get_questions(quiz, offset, QUESTIONS_PER_PAGE)
+    questions_text = ''.join(
+        format_question_text(offset + i, q) for i, q in enumerate(questions, 1)
+    )
+    
+    pagination = ""
+    if page_count > 1:
+        previous_link = (f'<a href="/quiz/{quiz.quiz_id}?page={page - 1}" class="btn btn-sm btn-outline-light">Previous</a>'
+                         if page > 1 else "")
+        next_link = (f'<a href="/quiz/{quiz.quiz_id}?page={page + 1}" class="btn btn-sm btn-outline-light">Next</a>'
+                     if page < page_count else "")
+        pagination = f'<div class="mt-3">{previous_link} Page {page} of {page_count} {next_link}</div>'
     
     # Format the quiz data for display
     return f"""
@@ -678,8 +782,9 @@ def view_quiz(quiz_id):
             <h1>{quiz.title}</h1>
             <p>Quiz ID: {quiz.quiz_id}</p>
             <p>Questions: {quiz.question_count}</p>
-            <p>This quiz has been accessed {quiz.access_count} times.</p>
-            <p>Last accessed: {quiz.last_accessed.strftime('%Y-%m-%d %H:%M:%S UTC')}</p>
+            <p>This quiz has been accessed {access_count} times.</p>
+            <p>Last accessed: {last_accessed.strftime('%Y-%m-%d %H:%M:%S UTC')}</p>
+            {attempts_line}
             
             <div class="d-flex justify-content-between mt-3 mb-4">
                 <a href="/" class="btn btn-secondary">Home</a>
@@ -693,14 +798,17 @@ def view_quiz(quiz_id):
             <hr>
             <div class="card bg-dark">
                 <div class="card-body">
-                    <pre>{quiz.formatted_data}</pre>
+                    <pre>{questions_text}</pre>
                 </div>
             </div>
+            {pagination}
             
             <div class="mt-4">
                 <p>Download as:</p>
                 <a href="/download/{quiz.quiz_id}/txt" class="btn btn-sm btn-outline-light">Text File</a>
                 <a href="/download/{quiz.quiz_id}/json" class="btn btn-sm btn-outline-light">JSON</a>
+                <a href="/download/{quiz.quiz_id}/md" class="btn btn-sm btn-outline-light">Markdown</a>
+                <a href="/download/{quiz.quiz_id}/csv" class="btn btn-sm btn-outline-light">CSV</a>
             </div>
         </div>
     </body>
@@ -710,45 +818,49 @@ def view_quiz(quiz_id):
 @app.route("/download/<quiz_id>/<format>", methods=["GET"])
 def download_quiz(quiz_id, format):
     """Download a quiz in various formats"""
-    quiz = QuizDatabase.get_quiz_by_id(quiz_id)
+    quiz = quiz_store.get_quiz_by_id(quiz_id)
     
     if not quiz:
         return "Quiz not found", 404
     
-    if format == "txt":
-        # Plain text download
-        response = app.response_class(
-            response=quiz.formatted_data,
-            status=200,
-            mimetype="text/plain"
-        )
-        response.headers["Content-Disposition"] = f"attachment; filename=quiz_{quiz_id}.txt"
-        return response
-        
-    elif format == "json":
-        # JSON download
+    if format in MIMETYPES and (quiz.question_count or 0) > STREAM_DOWNLOAD_THRESHOLD:
+        # Large quizzes are written out batch by batch from the question rows
+        output = stream_with_context(iter_quiz(
+            quiz_store.get_quiz_header(quiz),
+            format,
+            questions=quiz_store.iter_questions(quiz)
+        ))
+    elif format == "txt" and quiz.formatted_data:
+        # The stored text export needs no rendering
+        output = quiz.formatted_data
+    elif format in MIMETYPES:
+        # Rendered from the stored questions, memoized per content version
         try:
-            # Extract the JSON data
-            raw_data = json.loads(quiz.raw_data)
-            response = app.response_class(
-                response=json.dumps(raw_data, indent=2),
-                status=200,
-                mimetype="application/json"
+            output = render_cache.get_or_render(
+                quiz.quiz_id,
+                content_version(quiz.raw_data),
+                format,
+                lambda: quiz_store.load_quiz_data(quiz)
             )
-            response.headers["Content-Disposition"] = f"attachment; filename=quiz_{quiz_id}.json"
-            return response
-        except:
-            return "Could not generate JSON file", 400
+        except Exception as e:
+            logger.error(f"Error rendering quiz {quiz_id} as {format}: {str(e)}")
+            return f"Could not generate {format} file", 400
+    else:
+        return "Invalid format", 400
     
-    return "Invalid format", 400
+    response = app.response_class(
+        response=output,
+        status=200,
+        mimetype=MIMETYPES[format]
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename=quiz_{quiz_id}.{format}"
+    return response
 
 @app.route("/", methods=["GET"])
 def index():
     """Home page with quiz listing and stats"""
     # Get quiz statistics
-    quiz_count = Quiz.query.count()
-    recent_quizzes = QuizDatabase.get_recent_quizzes(5)
-    popular_quizzes = QuizDatabase.get_popular_quizzes(5)
+    quiz_count, recent_quizzes, popular_quizzes = top_listings(5)
     
     # Format recent quizzes list
     recent_list = "<p>No quizzes extracted yet.</p>"
@@ -859,4 +971,7 @@ if __name__ == "__main__":
     Thread(target=run_flask).start()
     # Start Telethon in main thread
     with client:
+        if not SHARDED:
+            # Revalidation reads quiz fingerprints the shards do not store
+            refresh_scheduler.start(client.loop)
         client.run_until_disconnected()
@@ -8,6 +8,7 @@ import re
 from flask import Flask, render_template, request, flash, redirect, url_for, jsonify
 from utils.decoder import decode_quiz_param, decode_quiz_data
 from utils.telegram_client import setup_telegram_client, get_quiz_data
+from utils.quiz_model import normalize_quiz
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, 
@@ -96,22 +97,15 @@ def extract():
             return redirect(url_for('index'))
         
         # Format the quiz data for display
+        quiz = normalize_quiz(quiz_data)
         formatted_quiz = {
-            'title': quiz_data.get('title', 'Unknown Quiz'),
-            'description': quiz_data.get('description', 'No description available'),
-            'questions': []
+            'title': quiz.title or 'Unknown Quiz',
+            'description': quiz.description or 'No description available',
+            'questions': [q.to_view() for q in quiz.questions]
         }
-        
-        # Process questions
-        questions = quiz_data.get('questions', [])
-        for q in questions:
-            question = {
-                'text': q.get('text', 'Unknown question'),
-                'options': q.get('options', []),
-                'correct_option': q.get('correct_option', -1)
-            }
-            formatted_quiz['questions'].append(question)
-        
+        for question in formatted_quiz['questions']:
+            question['text'] = question['text'] or 'Unknown question'
+
         return render_template('result.html', quiz=formatted_quiz)
     
     except Exception as e:
@@ -0,0 +1,95 @@
+"""
+Attempt ingestion benchmark: create/update per attempt vs record_attempts
+
+Stores a few synthetic quizzes in a throwaway SQLite file, then submits
+the same kind of scored attempts once through create_quiz_attempt plus
+update_quiz_attempt (two transactions per attempt, scored by the caller)
+and once through record_attempts batches.
+
+    python benchmarks/bench_attempts.py --attempts 100000 --batch-size 1000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from models import db, QuizAttempt
+from utils.database import QuizDatabase
+
+def quiz_items(count, question_count):
+    for index in range(count):
+        yield f"event{index}", {
+            'title': f"Event quiz {index}",
+            'questions': [
+                {'question': f"Question {i} of event quiz {index}?",
+                 'options': [f"Option {j}" for j in range(4)],
+                 'correct_option': i % 4}
+                for i in range(question_count)
+            ]
+        }
+
+def submissions(rng, count, quiz_count, question_count):
+    for index in range(count):
+        yield {
+            'quiz_id': f"event{rng.randrange(quiz_count)}",
+            'user_id': f"user{index}",
+            'answers': [rng.randrange(4) for _ in range(question_count)]
+        }
+
+def run(label, fn, count):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:>32} {elapsed:>8.2f}s {count / elapsed:>10.0f} attempts/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quizzes', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--single', type=int, default=1000,
+                        help='attempts submitted one by one (the slow path is extrapolated from these)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            QuizDatabase.save_quizzes(quiz_items(args.quizzes, args.questions))
+
+            def one_by_one():
+                for submission in submissions(rng, args.single, args.quizzes, args.questions):
+                    quiz = QuizDatabase.get_quiz_by_id(submission['quiz_id'])
+                    key = QuizDatabase.get_answer_key(quiz)
+                    score = sum(1 for answer, correct in zip(submission['answers'], key) if answer == correct)
+                    attempt = QuizDatabase.create_quiz_attempt(submission['quiz_id'], submission['user_id'])
+                    QuizDatabase.update_quiz_attempt(attempt.id, score=score, completed=True)
+
+            def batched():
+                QuizDatabase.record_attempts(submissions(rng, args.attempts, args.quizzes, args.questions),
+                                             batch_size=args.batch_size)
+
+            run(f"create+update x {args.single}", one_by_one, args.single)
+            run(f"record_attempts x {args.attempts}", batched, args.attempts)
+            print(f"{QuizAttempt.query.count()} attempts stored")
+
+            started = time.perf_counter()
+            QuizDatabase.rebuild_quiz_stats()
+            print(f"rebuild_quiz_stats: {time.perf_counter() - started:.2f}s")
+            db.session.remove()
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
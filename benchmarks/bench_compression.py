@@ -0,0 +1,89 @@
+"""
+Compressed quiz storage benchmark
+
+Stores the same synthetic quizzes in two throwaway SQLite files, once as
+plain text (the pre-compression layout) and once through the compressed
+column type, and reports file size, bytes per quiz and the cost of
+compressing and decompressing one quiz.
+
+The quizzes are stored in the layout from before the question store, with
+the full JSON in raw_data and the text export in formatted_data, i.e. the
+rows `manage.py compress` rewrites. Quizzes saved since then keep only a
+short header in raw_data and no formatted_data, which stay below
+MIN_COMPRESS_LENGTH and are stored as they are; their questions are
+compressed only when archived (utils/segment_store.py).
+
+    python benchmarks/bench_compression.py --quizzes 5000 --questions 50
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.compressed_text import compress_text, decompress_text, zstandard
+from utils.quiz_model import Quiz, Question, Option
+from utils.quiz_formatter import render_quiz
+
+WORDS = ("capital river mountain planet element history battle empire physics chemistry "
+         "biology algebra geometry poetry novel painter composer ocean desert island").split()
+
+def build_quiz(rng, index, question_count):
+    return Quiz(
+        quiz_id=f"bench{index}",
+        title=f"Quiz {index}",
+        questions=[
+            Question(f"Which {rng.choice(WORDS)} is linked to the {rng.choice(WORDS)} in question {i}?",
+                     [Option(f"The {rng.choice(WORDS)} {rng.choice(WORDS)}", j == 0) for j in range(4)])
+            for i in range(question_count)
+        ]
+    )
+
+def store(path, rows, encode):
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE quiz (id INTEGER PRIMARY KEY, raw_data TEXT, formatted_data TEXT)")
+    connection.executemany("INSERT INTO quiz (raw_data, formatted_data) VALUES (?, ?)",
+                           ((encode(raw), encode(formatted)) for raw, formatted in rows))
+    connection.commit()
+    connection.execute("VACUUM")
+    connection.close()
+    return os.path.getsize(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quizzes', type=int, default=5000)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = []
+    for index in range(args.quizzes):
+        quiz = build_quiz(rng, index, args.questions)
+        rows.append((quiz.to_json(), render_quiz(quiz, 'txt')))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = store(os.path.join(tmp, 'plain.db'), rows, lambda value: value)
+        started = time.perf_counter()
+        compressed = store(os.path.join(tmp, 'compressed.db'), rows, compress_text)
+        write_time = time.perf_counter() - started
+
+    stored = [compress_text(raw) for raw, _ in rows]
+    started = time.perf_counter()
+    for value in stored:
+        decompress_text(value)
+    read_time = time.perf_counter() - started
+
+    print(f"codec: {'zstd' if zstandard is not None else 'zlib'}")
+    print(f"plain file:      {plain / 1024 / 1024:8.1f} MiB  {plain / args.quizzes:8.0f} B/quiz")
+    print(f"compressed file: {compressed / 1024 / 1024:8.1f} MiB  {compressed / args.quizzes:8.0f} B/quiz"
+          f"  ({plain / compressed:.1f}x smaller)")
+    print(f"compressed write: {write_time / args.quizzes * 1e6:7.1f} us/quiz (both columns)")
+    print(f"raw_data decompress: {read_time / args.quizzes * 1e6:7.1f} us/quiz")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Load/latency benchmark for the quiz extraction engines against the fake QuizBot
+
+Usage:
+    python benchmarks/bench_extraction.py --engine userbot --quizzes 50 --questions 20 --delay 0.01 --jitter 0.02
+    python benchmarks/bench_extraction.py --engine userbot --flood-rate 0.05 --flood-seconds 0.1
+    python benchmarks/bench_extraction.py --engine verify --questions 50
+
+FloodWait errors up to --flood-sleep-threshold seconds are slept through
+and retried, as TelegramClient does; longer ones fail the quiz.
+
+QuizExtractor is not offered as an engine: it reads the messages after
+StartBotRequest without playing the quiz, so it only ever sees QuizBot's
+start message and returns its placeholder question.
+
+The verify engine revalidates already extracted quizzes with
+userbot_main.refresh_quiz_data (fingerprint of the first questions); the
+initial full extractions are not timed.
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.fake_quizbot import FakeQuizBot, FakeTelegramClient
+
+def import_userbot():
+    # userbot_main creates its session file on import; keep it out of the tree
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix='bench_extraction_'))
+    try:
+        import userbot_main
+    finally:
+        os.chdir(cwd)
+    return userbot_main
+
+def load_engine(name):
+    """Return an async callable (shortcode, client) -> quiz dict"""
+    if name == 'userbot':
+        return import_userbot().extract_quiz_data
+
+    if name == 'verify':
+        userbot_main = import_userbot()
+        # shortcode -> (fingerprint, quiz data), filled before the timed run
+        stored = {}
+
+        async def verify(shortcode, tg_client):
+            current, quiz_data = await userbot_main.refresh_quiz_data(shortcode, stored[shortcode][0], tg_client)
+            return stored[shortcode][1] if current else quiz_data
+
+        async def warm_up(shortcode, tg_client):
+            quiz_data = await userbot_main.extract_quiz_data(shortcode, tg_client)
+            stored[shortcode] = (userbot_main.extraction_fingerprint(quiz_data), quiz_data)
+        verify.warm_up = warm_up
+        return verify
+
+    raise ValueError(f"Unknown engine: {name}")
+
+async def run_worker(engine, bot, shortcodes, latencies, failures):
+    tg_client = FakeTelegramClient(bot)
+    for shortcode in shortcodes:
+        started = time.perf_counter()
+        quiz_data = await engine(shortcode, tg_client)
+        latencies.append(time.perf_counter() - started)
+        # Engines return what they got so far when a call fails
+        if not quiz_data or 'error' in quiz_data or len(quiz_data.get('questions', [])) != bot.question_count:
+            failures.append(shortcode)
+
+async def run_benchmark(args):
+    engine = load_engine(args.engine)
+    bot = FakeQuizBot(
+        question_count=args.questions,
+        option_count=args.options,
+        delay=args.delay,
+        jitter=args.jitter,
+        flood_wait_rate=args.flood_rate,
+        flood_wait_seconds=args.flood_seconds,
+        flood_sleep_threshold=args.flood_sleep_threshold,
+        seed=args.seed
+    )
+    shortcodes = [f"bench{i:06d}" for i in range(args.quizzes)]
+    latencies, failures = [], []
+
+    warm_up = getattr(engine, 'warm_up', None)
+    if warm_up is not None:
+        tg_client = FakeTelegramClient(bot)
+        for shortcode in shortcodes:
+            await warm_up(shortcode, tg_client)
+        bot.stats = dict.fromkeys(bot.stats, 0)
+
+    # One fake client (i.e. one account/chat) per concurrent worker
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_worker(engine, bot, shortcodes[i::args.concurrency], latencies, failures)
+        for i in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"engine={args.engine} quizzes={args.quizzes} questions={args.questions} "
+          f"concurrency={args.concurrency}")
+    print(f"  total {elapsed:.3f}s, {args.quizzes / elapsed:.1f} quizzes/s, "
+          f"{bot.stats['questions_sent'] / elapsed:.1f} questions/s")
+    print(f"  latency p50 {statistics.median(latencies) * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms, "
+          f"max {latencies[-1] * 1000:.1f}ms")
+    print(f"  bot calls {bot.stats['calls']}, flood waits {bot.stats['flood_waits']}, "
+          f"failed/incomplete quizzes {len(failures)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', choices=['userbot', 'verify'], default='userbot')
+    parser.add_argument('--quizzes', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--flood-rate', type=float, default=0.0)
+    parser.add_argument('--flood-seconds', type=float, default=1.0, help='wait reported by injected FloodWaits')
+    parser.add_argument('--flood-sleep-threshold', type=float, default=60.0)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run_benchmark(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Export formatter benchmark on large quizzes
+
+Times every export format at several quiz sizes and records peak traced
+memory while streaming to a file, compared with the old `+=` text builder.
+Time per question should stay flat as the quiz grows, and streaming peak
+memory should not grow with the quiz size beyond the input itself.
+
+    python benchmarks/bench_formatter.py --sizes 1000 10000
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.quiz_model import Quiz, Question, Option
+from utils.quiz_formatter import WRITERS, RenderCache, render_quiz, write_quiz
+
+class NullWriter:
+    """Discards output, so only the formatter's own allocations are traced"""
+
+    def write(self, data):
+        return len(data)
+
+def build_quiz(size, option_count=4):
+    return Quiz(
+        quiz_id=f"bench{size}",
+        title=f"Benchmark quiz with {size} questions",
+        questions=[
+            Question(f"Question {i}: which of the following options is the right one for item {i}?",
+                     [Option(f"Option {chr(65 + j)} for question {i}", j == i % option_count)
+                      for j in range(option_count)])
+            for i in range(size)
+        ]
+    )
+
+def legacy_txt(quiz):
+    """The string-concatenation builder QuizExtractor used before"""
+    text_content = f"Quiz: {quiz.title}\n"
+    text_content += f"Questions: {quiz.question_count}\n\n"
+    for i, q in enumerate(quiz.questions):
+        text_content += f"{i+1}. {q.text}\n"
+        for j, opt in enumerate(q.options):
+            text_content += f"   {chr(65 + j)}. {opt.text}"
+            if opt.correct:
+                text_content += " ✅"
+            text_content += "\n"
+        text_content += "\n"
+    return text_content
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'format':>8} {'questions':>10} {'render':>9} {'us/q':>7} {'stream peak':>12} {'render peak':>12}")
+    for size in args.sizes:
+        quiz = build_quiz(size)
+        for fmt in list(WRITERS) + ['legacy']:
+            if fmt == 'legacy':
+                render = lambda: legacy_txt(quiz)
+                stream_peak = None
+            else:
+                render = lambda: render_quiz(quiz, fmt)
+                _, stream_peak = measure(lambda: write_quiz(quiz, fmt, NullWriter()))
+            elapsed, render_peak = measure(render)
+            print(f"{fmt:>8} {size:>10} {elapsed:>8.3f}s {elapsed / size * 1e6:>7.2f} "
+                  f"{'-' if stream_peak is None else f'{stream_peak / 1024:.0f} KiB':>12} "
+                  f"{render_peak / 1024:>8.0f} KiB")
+
+        cache = RenderCache()
+        cache.get_or_render(quiz.quiz_id, 'v1', 'json', lambda: quiz)
+        started = time.perf_counter()
+        for _ in range(100):
+            cache.get_or_render(quiz.quiz_id, 'v1', 'json', lambda: quiz)
+        print(f"{'cached':>8} {size:>10} {(time.perf_counter() - started) / 100 * 1e6:>8.1f}us per repeat download")
+
+if __name__ == '__main__':
+    main()
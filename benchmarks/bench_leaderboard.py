@@ -0,0 +1,69 @@
+"""
+Leaderboard benchmark: ScoreIndex vs sorting every attempt per query
+
+Builds the score index of one quiz with a million completed attempts,
+then times rank lookups, top-N and around-me windows, and score changes,
+against the sort-everything approach a query over the attempts needs.
+
+    python benchmarks/bench_leaderboard.py --attempts 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.leaderboard import ScoreIndex, attempt_key
+
+def timed(label, fn, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:>32} {elapsed / count * 1e6:>12.1f} us/op")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attempts', type=int, default=1000000)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1)
+    keys = [attempt_key(attempt_id, rng.randint(0, args.questions), start + timedelta(seconds=rng.randrange(86400)))
+            for attempt_id in range(1, args.attempts + 1)]
+
+    started = time.perf_counter()
+    index = ScoreIndex(keys)
+    print(f"build {len(index)} keys: {time.perf_counter() - started:.2f}s")
+
+    probes = [rng.choice(keys) for _ in range(args.queries)]
+    probe = iter(probes * 4)
+    timed("rank", lambda: index.index(next(probe)), args.queries)
+    timed("top 10", lambda: index.slice(0, 10), args.queries)
+    timed("around (+-5)", lambda: (lambda p: index.slice(p - 5, p + 6))(index.index(next(probe))), args.queries)
+
+    def change_score():
+        key = next(probe)
+        index.remove(key)
+        index.add(key)
+    timed("score change (remove + add)", change_score, args.queries)
+
+    # What a query without the index does: order every attempt of the quiz
+    naive = max(1, args.queries // 1000)
+    timed("sort all + rank", lambda: sorted(keys).index(next(probe)), naive)
+
+    # Consistency check against the fully sorted keys
+    ordered = sorted(keys)
+    for key in probes[:1000]:
+        assert ordered[index.index(key)] == key
+    assert index.slice(0, 100) == ordered[:100]
+    print("index matches sorted order")
+
+if __name__ == '__main__':
+    main()
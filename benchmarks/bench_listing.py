@@ -0,0 +1,105 @@
+"""
+Quiz listing benchmark: keyset pages through every order
+
+Fills a throwaway SQLite database with synthetic quizzes, a share of them
+with NULL last_accessed, access_count and created_at (rows from before
+those columns had defaults), then pages through each listing order with
+next_cursor. Checks that every quiz is listed exactly once, NULL rows
+included, and reports the time per page at the start and the end of the
+listing; with keyset pagination the two stay the same.
+
+    python benchmarks/bench_listing.py --quizzes 100000 --null-share 0.05
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from models import db, Quiz
+from utils.database import QuizDatabase, LISTING_ORDERS
+
+def populate(count, null_share, seed):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = []
+    unset = []
+    for index in range(count):
+        if rng.random() < null_share:
+            unset.append(f"bench{index}")
+        rows.append({
+            'quiz_id': f"bench{index}",
+            'title': f"Quiz {index}",
+            'question_count': 5,
+            # Coarse values so many quizzes tie and the id decides
+            'created_at': start + timedelta(hours=rng.randrange(count // 10 + 1)),
+            'last_accessed': start + timedelta(hours=rng.randrange(count // 10 + 1)),
+            'access_count': rng.randrange(50),
+        })
+        if len(rows) == 5000:
+            db.session.bulk_insert_mappings(Quiz, rows)
+            rows = []
+    if rows:
+        db.session.bulk_insert_mappings(Quiz, rows)
+    # Inserting None would get the column defaults
+    for i in range(0, len(unset), 500):
+        Quiz.query.filter(Quiz.quiz_id.in_(unset[i:i + 500])).update(
+            {'created_at': None, 'last_accessed': None, 'access_count': None},
+            synchronize_session=False)
+    db.session.commit()
+
+def page_through(order, limit):
+    seen = []
+    times = []
+    cursor = None
+    while True:
+        started = time.perf_counter()
+        page = QuizDatabase.list_quizzes(order, cursor, limit, fields=('quiz_id',))
+        times.append(time.perf_counter() - started)
+        seen.extend(item['quiz_id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return seen, times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quizzes', type=int, default=20000)
+    parser.add_argument('--null-share', type=float, default=0.05)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+
+        failed = False
+        with app.app_context():
+            db.create_all()
+            populate(args.quizzes, args.null_share, args.seed)
+            nulls = Quiz.query.filter(Quiz.last_accessed.is_(None)).count()
+            print(f"Inserted {args.quizzes} quizzes, {nulls} without sort values\n")
+
+            print(f"{'order':>8} {'pages':>6} {'listed':>7} {'unique':>7} {'first':>9} {'last':>9}")
+            for order in LISTING_ORDERS:
+                seen, times = page_through(order, args.limit)
+                head = sum(times[:10]) / len(times[:10])
+                tail = sum(times[-10:]) / len(times[-10:])
+                print(f"{order:>8} {len(times):>6} {len(seen):>7} {len(set(seen)):>7} "
+                      f"{head * 1000:>7.2f}ms {tail * 1000:>7.2f}ms")
+                if len(seen) != args.quizzes or len(set(seen)) != args.quizzes:
+                    print(f"  {order}: expected each of the {args.quizzes} quizzes exactly once")
+                    failed = True
+            db.session.remove()
+            db.engine.dispose()
+        return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Correct-option matcher benchmark: per-option substring scan vs compiled matcher
+
+Every question pairs options so that a shorter one comes first and is a
+prefix ("✅ option" layout) or suffix ("option ✅" layout) of its
+neighbour. When the longer option is the correct one, the substring scan
+picks the shorter one. Exits with status 1 unless the matcher gets every
+question right and the scan misses each of those.
+
+With --transcripts, the result messages of recorded QuizBot conversations
+(see benchmarks/bench_parsing.py --record) are also run through both, and
+every answer that changed with the word-boundary matching is listed; an
+answer the substring scan found and the matcher does not is a failure.
+
+    python benchmarks/bench_matcher.py --questions 10000 --options 4 10 100 1000
+    python benchmarks/bench_matcher.py --transcripts quiz_transcripts.jsonl.gz
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.quiz_parser import CORRECT_MARK, extract_correct_option, get_option_matcher
+from utils.transcript import read_transcripts
+
+def naive_extract_correct_option(result_text, options):
+    """The original per-option f-string scan from userbot_main"""
+    for option in options:
+        if f"{option} ✅" in result_text or f"✅ {option}" in result_text:
+            return option
+    return None
+
+def build_questions(count, option_count, rng):
+    """
+    Questions whose options nest inside each other, the shorter one first
+
+    Returns:
+        tuple: ([(options, result text, correct option), ...], number of
+            questions whose correct option contains the option before it)
+    """
+    questions = []
+    nested = 0
+    for q in range(count):
+        # Alternate layouts: "✅ Paris" / "✅ Paris, France", "France ✅" / "Paris, France ✅"
+        marker_first = q % 2 == 0
+        options = []
+        for i in range(option_count):
+            if i % 2 == 0:
+                options.append(f"Answer {q}-{i}")
+            elif marker_first:
+                options.append(f"{options[i - 1]}, extended")
+            else:
+                options.append(f"Part of {options[i - 1]}")
+        correct = rng.randrange(option_count)
+        nested += correct % 2
+        lines = [f"Question {q}", ""]
+        if marker_first:
+            lines += [f"✅ {opt}" if i == correct else f"❌ {opt}" for i, opt in enumerate(options)]
+        else:
+            lines += [f"{opt} ✅" if i == correct else f"{opt} ❌" for i, opt in enumerate(options)]
+        questions.append((options, "\n".join(lines), options[correct]))
+    return questions, nested
+
+def timed(fn, questions):
+    started = time.perf_counter()
+    results = [fn(text, options) for options, text, _ in questions]
+    elapsed = time.perf_counter() - started
+    correct = sum(r == expected for r, (_, _, expected) in zip(results, questions))
+    return elapsed, correct
+
+def transcript_questions(transcript):
+    """(options, result text) of each answered question of a transcript, in order"""
+    # Recorded messages are [text, buttons, entities(, raw text)]
+    messages = transcript.messages
+    for record, following in zip(messages, messages[1:]):
+        if record[1] and CORRECT_MARK in following[0]:
+            yield [label for row in record[1] for label in row], following[0]
+
+def check_transcripts(path):
+    """
+    Compare the substring scan and the matcher on recorded result messages
+
+    Returns:
+        int: Questions where the scan found an answer and the matcher none
+    """
+    checked = changed = lost = differs = 0
+    for transcript in read_transcripts(path):
+        recorded = (transcript.expected or {}).get('answers') or []
+        for i, (options, result_text) in enumerate(transcript_questions(transcript)):
+            naive = naive_extract_correct_option(result_text, options)
+            matched = extract_correct_option(result_text, options)
+            checked += 1
+            if i < len(recorded) and matched != recorded[i]:
+                differs += 1
+            if matched == naive:
+                continue
+            changed += 1
+            lost += matched is None
+            print(f"  {transcript.param} question {i + 1}: substring scan {naive!r}, matcher {matched!r}")
+    print(f"transcripts: {checked} questions, {changed} answers changed ({lost} lost), "
+          f"{differs} differ from the recording")
+    return lost
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--options', type=int, nargs='+', default=[4, 10, 100, 1000])
+    parser.add_argument('--transcripts', help='recorded transcripts to check the matcher against')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failed = False
+    print(f"{'options':>8} {'questions':>10} {'naive':>10} {'compiled':>10} {'cached':>10}  correct (naive/compiled)")
+    for option_count in args.options:
+        count = max(1, args.questions // max(1, option_count // 10))
+        questions, nested = build_questions(count, option_count, rng)
+        naive_time, naive_correct = timed(naive_extract_correct_option, questions)
+        # First pass builds one matcher per question, second pass hits the cache
+        compiled_time, compiled_correct = timed(extract_correct_option, questions)
+        cached_time, _ = timed(lambda text, options: get_option_matcher(options).find(text), questions)
+        print(f"{option_count:>8} {count:>10} {naive_time:>9.3f}s {compiled_time:>9.3f}s {cached_time:>9.3f}s"
+              f"  {naive_correct}/{compiled_correct} of {count}")
+        if compiled_correct != count:
+            print(f"  matcher missed {count - compiled_correct} questions")
+            failed = True
+        if option_count > 1 and (not nested or naive_correct > count - nested):
+            print(f"  expected the substring scan to miss the {nested} nested answers")
+            failed = True
+
+    if args.transcripts:
+        failed = check_transcripts(args.transcripts) > 0 or failed
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
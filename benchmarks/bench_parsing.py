@@ -0,0 +1,78 @@
+"""
+Parse throughput/correctness benchmark over recorded QuizBot conversations
+
+Record synthetic transcripts through the userbot extraction path and the fake
+QuizBot, then replay them (or real recorded transcripts) through play_quiz and
+through QuizExtractor's message parser. Without --record the file must exist:
+
+    python benchmarks/bench_parsing.py --record 2000 --questions 20 --file /tmp/quizzes.jsonl.gz
+    python benchmarks/bench_parsing.py --file /tmp/quizzes.jsonl.gz
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_extraction import load_engine
+from utils.fake_quizbot import FakeQuizBot, FakeTelegramClient
+from utils.transcript import (TranscriptWriter, read_transcripts, record_extraction,
+                              replay_transcript, replay_transcript_batch, check_transcript)
+
+async def record(args):
+    extract = load_engine('userbot')
+    bot = FakeQuizBot(question_count=args.questions, option_count=args.options, seed=args.seed)
+    tg_client = FakeTelegramClient(bot)
+    with TranscriptWriter(args.file, mode='wt') as writer:
+        for i in range(args.record):
+            await record_extraction(extract, f"rec{i:07d}", tg_client, writer)
+    print(f"recorded {writer.count} transcripts to {args.file} "
+          f"({os.path.getsize(args.file) / 1024:.1f} KiB)")
+
+async def replay_all(transcripts):
+    return [await replay_transcript(t) for t in transcripts]
+
+def replay(args):
+    transcripts = list(read_transcripts(args.file))
+    message_count = sum(len(t.messages) for t in transcripts)
+
+    replay_conversations = lambda: asyncio.run(replay_all(transcripts))
+    replay_batches = lambda: [replay_transcript_batch(t) for t in transcripts]
+    for name, replay_fn in (('conversation', replay_conversations), ('batch', replay_batches)):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            results = replay_fn()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>12}: {len(transcripts) / best:,.0f} transcripts/s, "
+              f"{message_count / best:,.0f} messages/s (best of {args.repeat})")
+        if name == 'conversation':
+            mismatches = sum(not check_transcript(t, r) for t, r in zip(transcripts, results))
+            print(f"{'':>12}  {mismatches} of {len(transcripts)} replays differ from the recording")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default='quiz_transcripts.jsonl.gz')
+    parser.add_argument('--record', type=int, default=0, help='record N synthetic transcripts first')
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.record:
+        asyncio.run(record(args))
+    elif not os.path.exists(args.file):
+        print(f"No transcripts at {args.file}; record some first, e.g.\n"
+              f"    python benchmarks/bench_parsing.py --record 2000 --file {args.file}")
+        return 1
+    replay(args)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Quiz cache benchmark: local and shared hit rates, and the invalidation race
+
+Fills a throwaway SQLite database with synthetic quizzes and looks them up
+with a skewed (Zipf-like) distribution through two QuizCache instances
+that share an in-process stand-in for Redis, as two worker processes
+would. Reports hit rates and the time per lookup against the uncached
+database read.
+
+Also checks that a load racing an invalidation (load, then invalidate,
+then fill) is cached at neither level, so no process can be served the
+stale snapshot from Redis; exits with status 1 if it is.
+
+    python benchmarks/bench_quiz_cache.py --quizzes 5000 --lookups 50000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from models import db, Quiz
+from utils.database import QuizDatabase
+from utils.quiz_cache import QuizCache, REDIS_KEY_PREFIX
+
+class FakeRedis:
+    """The part of the redis client QuizCache uses, kept in a dict"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode('utf-8') if isinstance(value, str) else value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def ping(self):
+        return True
+
+def populate(count):
+    rows = [{'quiz_id': f"bench{index}", 'title': f"Quiz {index}", 'question_count': 0,
+             'raw_data': '{"title": "Quiz %d", "questions": []}' % index, 'access_count': 0}
+            for index in range(count)]
+    db.session.bulk_insert_mappings(Quiz, rows)
+    db.session.commit()
+
+def load(quiz_id):
+    return lambda: QuizDatabase._load_quiz_row(quiz_id)
+
+def check_race(redis):
+    """Load a quiz, invalidate it while the load is in flight, then fill"""
+    cache = QuizCache(redis_client=redis)
+    quiz_id = 'bench0'
+    entry, generation = cache._lookup(quiz_id, time.monotonic())
+    loaded = QuizDatabase._load_quiz_row(quiz_id)
+    cache.invalidate(quiz_id)
+    cache._fill(loaded, time.monotonic(), generation)
+    failures = []
+    if quiz_id in cache.entries:
+        failures.append("the local level kept the raced load")
+    if REDIS_KEY_PREFIX + quiz_id in redis.data:
+        failures.append("Redis kept the raced load")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quizzes', type=int, default=5000)
+    parser.add_argument('--lookups', type=int, default=50000)
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of the lookups')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    weights = [1 / (rank + 1) ** args.skew for rank in range(args.quizzes)]
+    lookups = [f"bench{index}" for index in rng.choices(range(args.quizzes), weights, k=args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            populate(args.quizzes)
+
+            sample = lookups[:min(len(lookups), 2000)]
+            started = time.perf_counter()
+            for quiz_id in sample:
+                QuizDatabase._load_quiz_row(quiz_id)
+                db.session.expunge_all()
+            uncached = (time.perf_counter() - started) / len(sample)
+
+            redis = FakeRedis()
+            workers = [QuizCache(redis_client=redis), QuizCache(redis_client=redis)]
+            started = time.perf_counter()
+            for i, quiz_id in enumerate(lookups):
+                workers[i % 2].get(quiz_id, load(quiz_id))
+            cached = (time.perf_counter() - started) / len(lookups)
+
+            print(f"uncached read: {uncached * 1e6:8.1f} us/lookup")
+            print(f"cached read:   {cached * 1e6:8.1f} us/lookup ({uncached / cached:.0f}x)")
+            for index, cache in enumerate(workers):
+                stats = cache.stats()
+                print(f"worker {index}: hit rate {stats['hit_rate']:.3f} "
+                      f"({stats['hits']} local, {stats['shared_hits']} shared, {stats['misses']} misses)")
+
+            failures = check_race(FakeRedis())
+            print(f"invalidation race: {'; '.join(failures) if failures else 'not cached at either level'}")
+            db.session.remove()
+            db.engine.dispose()
+        return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Bulk save benchmark: save_quiz per quiz vs save_quizzes batches
+
+Imports the same synthetic quizzes into a throwaway SQLite file once with
+one save_quiz (one transaction) per quiz and once through save_quizzes,
+then re-imports them to exercise the ON CONFLICT update path.
+
+    python benchmarks/bench_save.py --quizzes 20000 --batch-size 500
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from models import db, Quiz
+from utils.database import QuizDatabase
+from utils.search_index import QuizSearchIndex
+
+def quiz_items(count, question_count, prefix):
+    for index in range(count):
+        yield f"{prefix}{index}", {
+            'title': f"Imported quiz {index}",
+            'questions': [
+                {'question': f"Question {i} of quiz {index}?",
+                 'options': [f"Option {j}" for j in range(4)],
+                 'correct_option': i % 4}
+                for i in range(question_count)
+            ]
+        }
+
+def run(label, fn, count):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:>28} {elapsed:>8.2f}s {count / elapsed:>10.0f} quizzes/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quizzes', type=int, default=20000)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--single', type=int, default=2000,
+                        help='quizzes saved one by one (the slow path is extrapolated from these)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            QuizSearchIndex.ensure()
+
+            def one_by_one():
+                for quiz_id, data in quiz_items(args.single, args.questions, 'single'):
+                    QuizDatabase.save_quiz(quiz_id, data)
+
+            def batched():
+                QuizDatabase.save_quizzes(quiz_items(args.quizzes, args.questions, 'bulk'),
+                                          batch_size=args.batch_size)
+
+            run(f"save_quiz x {args.single}", one_by_one, args.single)
+            run(f"save_quizzes x {args.quizzes}", batched, args.quizzes)
+            run(f"save_quizzes (update) x {args.quizzes}", batched, args.quizzes)
+            print(f"{Quiz.query.count()} quizzes stored")
+            db.session.remove()
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
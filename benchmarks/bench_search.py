@@ -0,0 +1,115 @@
+"""
+Quiz search benchmark: ILIKE scan vs the full-text index
+
+Fills a throwaway SQLite database with synthetic quizzes, builds the FTS5
+index and times the same queries through both paths. The ILIKE scan reads
+every row until it has `--limit` matches, so common words return fast
+(unranked) while rare words and multi-word queries scan the whole table;
+the indexed search ranks all matches and stays in the milliseconds either way.
+
+    python benchmarks/bench_search.py --quizzes 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from models import db, Quiz
+from utils.quiz_model import Quiz as QuizModel, Question, Option
+from utils.quiz_formatter import render_quiz
+from utils.database import QuizDatabase
+from utils.search_index import QuizSearchIndex
+
+WORDS = ("capital river mountain planet element history battle empire physics chemistry "
+         "biology algebra geometry poetry novel painter composer ocean desert island "
+         "volcano galaxy protein enzyme theorem dynasty treaty revolution climate language").split()
+
+QUERIES = ['volcano', 'capital river', 'photosynthesis', 'geom', 'treaty dynasty empire']
+
+def build_quiz(rng, index, question_count):
+    questions = []
+    for i in range(question_count):
+        topic = ' '.join(rng.sample(WORDS, 3))
+        questions.append(Question(f"Question {i} about {topic}?",
+                                  [Option(f"{rng.choice(WORDS)} {j}", j == 0) for j in range(4)]))
+    if index % 1000 == 0:
+        questions[0].text = "Which process do plants use for photosynthesis?"
+    return QuizModel(quiz_id=f"bench{index}", title=f"{rng.choice(WORDS).title()} quiz {index}",
+                     questions=questions)
+
+def populate(count, question_count, seed):
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        quiz = build_quiz(rng, index, question_count)
+        rows.append({
+            'quiz_id': quiz.quiz_id,
+            'title': quiz.title,
+            'question_count': quiz.question_count,
+            'raw_data': quiz.to_json(),
+            'formatted_data': render_quiz(quiz, 'txt'),
+            'access_count': 0,
+        })
+        if len(rows) == 5000:
+            db.session.bulk_insert_mappings(Quiz, rows)
+            rows = []
+    if rows:
+        db.session.bulk_insert_mappings(Quiz, rows)
+    db.session.commit()
+
+def ilike_search(query, limit):
+    pattern = f"%{query}%"
+    return Quiz.query.filter(db.or_(
+        Quiz.title.ilike(pattern),
+        Quiz.raw_data.ilike(pattern),
+        Quiz.formatted_data.ilike(pattern)
+    )).limit(limit).all()
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quizzes', type=int, default=100000)
+    parser.add_argument('--questions', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            populate(args.quizzes, args.questions, args.seed)
+            print(f"Inserted {args.quizzes} quizzes in {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            QuizSearchIndex.ensure()
+            print(f"Built the full-text index in {time.perf_counter() - started:.1f}s\n")
+
+            print(f"{'query':>24} {'ilike':>10} {'fts':>10} {'speedup':>8} {'hits':>5}")
+            for query in QUERIES:
+                ilike_time, _ = timed(lambda: ilike_search(query, args.limit), args.repeat)
+                fts_time, results = timed(lambda: QuizDatabase.search_quizzes_ranked(query, args.limit),
+                                          args.repeat)
+                print(f"{query:>24} {ilike_time * 1000:>8.1f}ms {fts_time * 1000:>8.2f}ms "
+                      f"{ilike_time / fts_time:>7.0f}x {len(results):>5}")
+            db.session.remove()
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Sharded SQLite store benchmark: write throughput by shard count
+
+Runs the same concurrent workload against ShardedQuizStore directories
+with different shard counts: writer threads each save quizzes one at a
+time (one commit per save), record accesses and create/complete attempts,
+the way the bot does. Then times the fan-out listing reads.
+
+    python benchmarks/bench_sharded.py --shards 1,2,4,8 --threads 8 --quizzes 4000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.sharded_store import ShardedQuizStore
+
+def quiz_data(index, question_count):
+    return {
+        'title': f"Sharded quiz {index}",
+        'questions': [
+            {'question': f"Question {i} of quiz {index}?",
+             'options': [f"Option {j}" for j in range(4)],
+             'correct_option': i % 4}
+            for i in range(question_count)
+        ]
+    }
+
+def run_writers(store, threads, quizzes, question_count):
+    per_thread = quizzes // threads
+
+    def writer(worker):
+        for i in range(per_thread):
+            quiz_id = f"w{worker}q{i}"
+            quiz = store.save_quiz(quiz_id, quiz_data(i, question_count))
+            store.record_access(quiz)
+            attempt = store.create_quiz_attempt(quiz_id, f"user{i}")
+            store.update_quiz_attempt(attempt.id, score=i % (question_count + 1), completed=True)
+        store.close()
+
+    workers = [threading.Thread(target=writer, args=(worker,)) for worker in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', default='1,2,4,8', help='comma-separated shard counts to compare')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--quizzes', type=int, default=4000)
+    parser.add_argument('--questions', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'shards':>6} {'quizzes/s':>10} {'writes/s':>10} {'recent':>9} {'popular':>9} {'search':>9}")
+    for shards in (int(value) for value in args.shards.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ShardedQuizStore(tmp, shards=shards)
+            saved, elapsed = run_writers(store, args.threads, args.quizzes, args.questions)
+
+            timings = []
+            for read in (lambda: store.get_recent_quizzes(10),
+                         lambda: store.get_popular_quizzes(10),
+                         lambda: store.search_quizzes('quiz 12', 10)):
+                started = time.perf_counter()
+                for _ in range(50):
+                    read()
+                timings.append((time.perf_counter() - started) / 50 * 1000)
+            store.close()
+
+        # Each quiz is four commits: save, access, attempt, completion
+        print(f"{shards:>6} {saved / elapsed:>10.0f} {saved * 4 / elapsed:>10.0f} "
+              + ' '.join(f"{t:>7.2f}ms" for t in timings))
+
+if __name__ == '__main__':
+    main()
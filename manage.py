@@ -0,0 +1,150 @@
+"""
+Maintenance commands for the quiz database
+
+Uses DATABASE_URL (default: sqlite:///quizzes.db) and does not start the
+web server or the Telegram client.
+
+    python manage.py dedupe-report
+    python manage.py prune-questions
+    python manage.py migrate-questions
+    python manage.py compress
+    python manage.py reindex
+    python manage.py rebuild-stats
+    python manage.py archive --days 90
+    python manage.py restore QUIZ_ID
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from flask import Flask
+from models import db
+from utils.database import QuizDatabase
+from utils.search_index import QuizSearchIndex
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def create_app():
+    """Minimal app that only configures the database"""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///quizzes.db")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+def dedupe_report(args):
+    report = QuizDatabase.get_dedupe_report(top=args.top)
+    if report is None:
+        return 1
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    print(f"Question references: {report['question_references']}")
+    print(f"Unique questions:    {report['unique_questions']}")
+    print(f"Referenced content:  {format_bytes(report['referenced_bytes'])}")
+    print(f"Stored content:      {format_bytes(report['stored_bytes'])}")
+    print(f"Saved by dedupe:     {format_bytes(report['saved_bytes'])} ({report['dedupe_ratio']}x)")
+    print(f"Orphaned questions:  {report['orphaned_questions']}")
+    if report['most_shared']:
+        print("\nMost shared questions:")
+        for entry in report['most_shared']:
+            print(f"  {entry['uses']:>6}  {entry['hash']}  {entry['text'][:60]}")
+    return 0
+
+def prune_questions(args):
+    print(f"Deleted {QuizDatabase.prune_question_content()} unreferenced questions")
+    return 0
+
+def migrate_questions(args):
+    moved = QuizDatabase.migrate_legacy_questions(args.batch_size)
+    if moved is None:
+        return 1
+    print(f"Moved the questions of {moved} quizzes to the question store")
+    return 0
+
+def compress(args):
+    print(f"Compressed {QuizDatabase.compress_stored_quizzes(args.batch_size)} quizzes")
+    return 0
+
+def reindex(args):
+    if not QuizSearchIndex.ensure():
+        print("Full-text search is not supported on this database")
+        return 1
+    print(f"Indexed {QuizSearchIndex.rebuild(args.batch_size, load_body=QuizDatabase.get_formatted_text)} quizzes")
+    return 0
+
+def rebuild_stats(args):
+    rebuilt = QuizDatabase.rebuild_quiz_stats(args.quiz_id, args.batch_size)
+    if rebuilt is None:
+        return 1
+    print(f"Rebuilt attempt statistics of {rebuilt} quizzes")
+    return 0
+
+def archive(args):
+    print(f"Archived {QuizDatabase.archive_cold_quizzes(args.days, args.batch_size, args.limit)} quizzes")
+    return 0
+
+def restore(args):
+    if not QuizDatabase.restore_quiz(args.quiz_id):
+        print(f"Quiz {args.quiz_id} is not archived")
+        return 1
+    print(f"Restored quiz {args.quiz_id}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = commands.add_parser('dedupe-report', help='show how much the question store saves')
+    report_parser.add_argument('--top', type=int, default=5, help='most shared questions to list')
+    report_parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    report_parser.set_defaults(handler=dedupe_report)
+
+    prune_parser = commands.add_parser('prune-questions', help='delete questions no quiz references')
+    prune_parser.set_defaults(handler=prune_questions)
+
+    migrate_parser = commands.add_parser('migrate-questions',
+                                         help='move quiz_question/quiz_option rows to the question store and drop them')
+    migrate_parser.add_argument('--batch-size', type=int, default=200)
+    migrate_parser.set_defaults(handler=migrate_questions)
+
+    compress_parser = commands.add_parser('compress', help='compress quizzes stored as plain text')
+    compress_parser.add_argument('--batch-size', type=int, default=200)
+    compress_parser.set_defaults(handler=compress)
+
+    reindex_parser = commands.add_parser('reindex', help='rebuild the full-text search index')
+    reindex_parser.add_argument('--batch-size', type=int, default=500)
+    reindex_parser.set_defaults(handler=reindex)
+
+    stats_parser = commands.add_parser('rebuild-stats', help='recompute attempt statistics from the attempts')
+    stats_parser.add_argument('--quiz-id', help='only rebuild this quiz')
+    stats_parser.add_argument('--batch-size', type=int, default=1000)
+    stats_parser.set_defaults(handler=rebuild_stats)
+
+    archive_parser = commands.add_parser('archive', help='move quizzes not accessed recently to the archive segments')
+    archive_parser.add_argument('--days', type=int, default=90, help='minimum days since the last access')
+    archive_parser.add_argument('--batch-size', type=int, default=100)
+    archive_parser.add_argument('--limit', type=int, help='archive at most this many quizzes')
+    archive_parser.set_defaults(handler=archive)
+
+    restore_parser = commands.add_parser('restore', help='move an archived quiz back into the database')
+    restore_parser.add_argument('quiz_id')
+    restore_parser.set_defaults(handler=restore)
+
+    args = parser.parse_args()
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,9 @@
 import os
+import json
+import math
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from utils.compressed_text import CompressedText
 
 db = SQLAlchemy()
 
@@ -17,15 +20,22 @@ class Quiz(db.Model):
     description = db.Column(db.Text, nullable=True)
     question_count = db.Column(db.Integer, default=0)
 
-    # Content storage
-    raw_data = db.Column(db.Text, nullable=True)  # Original JSON/data
-    formatted_data = db.Column(db.Text, nullable=True)  # Formatted text version
+    # Content storage, compressed and only loaded when accessed
+    raw_data = db.deferred(db.Column(CompressedText, nullable=True), group='content')  # Original JSON/data
+    formatted_data = db.deferred(db.Column(CompressedText, nullable=True), group='content')  # Formatted text version
 
     # Tracking
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_accessed = db.Column(db.DateTime, default=datetime.utcnow)
     access_count = db.Column(db.Integer, default=0)
 
+    # Recent/popular listings, with id as tie-breaker
+    __table_args__ = (
+        db.Index('ix_quiz_last_accessed_id', 'last_accessed', 'id'),
+        db.Index('ix_quiz_access_count_id', 'access_count', 'id'),
+        db.Index('ix_quiz_created_at_id', 'created_at', 'id'),
+    )
+
     def __repr__(self):
         return f"<Quiz {self.quiz_id} ({self.title})>"
 
@@ -53,8 +63,71 @@ class Quiz(db.Model):
 
         return True
 
+class QuestionContent(db.Model):
+    """Model for storing a question once, addressed by a hash of its content"""
+    # utils.quiz_model.question_hash of the normalized text and options
+    hash = db.Column(db.String(32), primary_key=True)
+
+    text = db.Column(db.Text, nullable=False, default='')
+    options = db.Column(db.Text, nullable=False, default='[]')  # JSON [[text, correct], ...]
+    correct_index = db.Column(db.Integer, nullable=False, default=-1)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<QuestionContent {self.hash}>"
+
+class QuizQuestionRef(db.Model):
+    """Model for the position of a stored question within a quiz"""
+    # Foreign key to Quiz model and position within the quiz (0-based)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+    ordinal = db.Column(db.Integer, primary_key=True)
+
+    question_hash = db.Column(db.String(32), db.ForeignKey('question_content.hash'), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<QuizQuestionRef {self.ordinal} of Quiz {self.quiz_id}>"
+
+class QuizVersion(db.Model):
+    """Model for one saved version of a quiz"""
+    # Foreign key to Quiz model and version number (1-based)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+
+    header = db.Column(db.Text, nullable=False)  # raw_data header of this version
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Snapshots list every question; other versions only the positions that changed
+    snapshot = db.Column(db.Boolean, nullable=False, default=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<QuizVersion {self.version} of Quiz {self.quiz_id}>"
+
+class QuizVersionQuestion(db.Model):
+    """Model for a question position written by a quiz version"""
+    quiz_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    ordinal = db.Column(db.Integer, primary_key=True)
+
+    question_hash = db.Column(db.String(32), db.ForeignKey('question_content.hash'), nullable=False, index=True)
+
+    __table_args__ = (
+        db.ForeignKeyConstraint(['quiz_id', 'version'], ['quiz_version.quiz_id', 'quiz_version.version'],
+                                ondelete='CASCADE'),
+    )
+
+    def __repr__(self):
+        return f"<QuizVersionQuestion {self.ordinal} of version {self.version} of Quiz {self.quiz_id}>"
+
 class QuizAttempt(db.Model):
     """Model for storing quiz attempts"""
+    __table_args__ = (
+        # Loading a quiz's leaderboard reads its completed attempts
+        db.Index('ix_quiz_attempt_quiz_completed', 'quiz_id', 'completed'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # Foreign key to Quiz model
@@ -73,3 +146,106 @@ class QuizAttempt(db.Model):
 
     def __repr__(self):
         return f"<QuizAttempt {self.id} for Quiz {self.quiz_id}>"
+
+class QuizStats(db.Model):
+    """Model for running totals of the attempts of a quiz"""
+    # Histogram buckets over the score as a share of max_score (10% each)
+    HISTOGRAM_BUCKETS = 10
+
+    # Foreign key to Quiz model, one row per quiz
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+
+    # Attempts started and completed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+    # Totals over the scores of completed attempts
+    score_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    score_sumsq = db.Column(db.BigInteger, nullable=False, default=0)
+    score_min = db.Column(db.Integer, nullable=True)
+    score_max = db.Column(db.Integer, nullable=True)
+    histogram = db.Column(db.Text, nullable=False, default='[]')  # JSON list of HISTOGRAM_BUCKETS counts
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<QuizStats for Quiz {self.quiz_id}>"
+
+    @classmethod
+    def bucket(cls, score, max_score):
+        """Histogram bucket of a score"""
+        if not max_score:
+            return 0
+        return min(max(int(score * cls.HISTOGRAM_BUCKETS // max_score), 0), cls.HISTOGRAM_BUCKETS - 1)
+
+    def add_score(self, score, max_score, sign=1):
+        """
+        Add a completed attempt's score to the totals, or remove it with sign=-1
+
+        The minimum and maximum are not narrowed when a score is removed;
+        QuizDatabase.rebuild_quiz_stats recomputes them exactly.
+        """
+        self.add_scores([score], max_score, sign)
+
+    def add_scores(self, scores, max_score, sign=1):
+        """Add (or with sign=-1 remove) the scores of several completed attempts"""
+        scores = [score or 0 for score in scores]
+        if not scores:
+            return
+        self.completed = (self.completed or 0) + sign * len(scores)
+        self.score_sum = (self.score_sum or 0) + sign * sum(scores)
+        self.score_sumsq = (self.score_sumsq or 0) + sign * sum(score * score for score in scores)
+        if self.completed <= 0:
+            self.score_min = self.score_max = None
+        elif sign > 0:
+            low, high = min(scores), max(scores)
+            self.score_min = low if self.score_min is None else min(self.score_min, low)
+            self.score_max = high if self.score_max is None else max(self.score_max, high)
+        histogram = json.loads(self.histogram or '[]') or [0] * self.HISTOGRAM_BUCKETS
+        for score in scores:
+            histogram[self.bucket(score, max_score)] += sign
+        self.histogram = json.dumps(histogram)
+        self.updated_at = datetime.utcnow()
+
+    def to_dict(self):
+        """Summary statistics computed from the running totals"""
+        completed = self.completed or 0
+        mean = self.score_sum / completed if completed else None
+        stddev = None
+        if completed:
+            stddev = math.sqrt(max(self.score_sumsq / completed - mean * mean, 0.0))
+        return {
+            'attempts': self.attempts or 0,
+            'completed': completed,
+            'completion_rate': round(completed / self.attempts, 4) if self.attempts else 0.0,
+            'mean_score': round(mean, 2) if mean is not None else None,
+            'stddev_score': round(stddev, 2) if stddev is not None else None,
+            'min_score': self.score_min,
+            'max_score': self.score_max,
+            'histogram': json.loads(self.histogram or '[]') or [0] * self.HISTOGRAM_BUCKETS
+        }
+
+class QuizArchiveEntry(db.Model):
+    """Model for the location of an archived quiz's content in the segment files"""
+    # Foreign key to Quiz model; the quiz row stays behind as a stub
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+
+    # utils.segment_store record location
+    segment = db.Column(db.String(64), nullable=False)
+    offset = db.Column(db.BigInteger, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<QuizArchiveEntry for Quiz {self.quiz_id} at {self.segment}:{self.offset}>"
+
+class QuizFreshness(db.Model):
+    """Model for when a stored quiz was last checked against QuizBot"""
+    # Foreign key to Quiz model, one row per quiz once it has been checked
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='CASCADE'), primary_key=True)
+
+    verified_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<QuizFreshness of Quiz {self.quiz_id} at {self.verified_at}>"
@@ -9,6 +9,9 @@ import time
 import json
 from flask import Flask
 import threading
+from utils.quiz_model import FINGERPRINT_QUESTIONS
+from utils.quiz_formatter import render_quiz
+from utils.quiz_extractor import play_quiz, revalidate_quiz
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,102 +38,26 @@ client = TelegramClient(SESSION_FILE, API_ID, API_HASH)
 quiz_url_pattern = r'https?://t\.me/QuizBot\?start=([a-zA-Z0-9_-]+)'
 direct_quiz_pattern = r'^/quiz\s+([a-zA-Z0-9_-]+)$'
 
-async def extract_quiz_data(quiz_param):
-    """Extract quiz data from QuizBot using the parameter."""
-    try:
-        logger.info(f"Extracting quiz data for parameter: {quiz_param}")
-        
-        async with client.conversation('@QuizBot') as conv:
-            await conv.send_message(f"/start {quiz_param}")
-            response = await conv.get_response(timeout=30)
-            
-            if not response:
-                return {"error": "No response from QuizBot"}
-            
-            quiz_data = {
-                "title": "",
-                "param": quiz_param,
-                "questions": []
-            }
-            
-            text = response.text
-            quiz_data["title"] = extract_title(text)
-            
-            await conv.send_message("/play")
-            question_count = 0
-
-            while True:
-                try:
-                    question_msg = await conv.get_response(timeout=15)
-                    if "Quiz finished" in question_msg.text or "Your result" in question_msg.text:
-                        break
-                    
-                    question_text = question_msg.text
-                    question_data = {"question": question_text, "options": [], "correct_option": None}
-                    
-                    async for message in client.iter_messages('@QuizBot', limit=1):
-                        if message.buttons:
-                            for row in message.buttons:
-                                for button in row:
-                                    question_data["options"].append(button.text)
-
-                    await question_msg.click(0)
-                    result_msg = await conv.get_response(timeout=15)
-                    correct_option = extract_correct_option(result_msg.text, question_data["options"])
-                    if correct_option:
-                        question_data["correct_option"] = correct_option
-                    
-                    quiz_data["questions"].append(question_data)
-                    question_count += 1
-                    
-                    await result_msg.click(0)
-                except Exception as e:
-                    logger.error(f"Error processing question: {e}")
-                    break
-                
-            quiz_data["question_count"] = question_count
-            return quiz_data
-    
-    except Exception as e:
-        logger.exception(f"Error extracting quiz data: {e}")
-        return {"error": f"Failed to extract quiz data: {str(e)}"}
-
-def extract_title(text):
-    if "Get ready for the quiz" in text:
-        title_match = re.search(r'Get ready for the quiz [\'\"](.+?)[\'\"]', text)
-        if title_match:
-            return title_match.group(1)
-    return "Untitled Quiz"
-
-def extract_correct_option(result_text, options):
-    for i, option in enumerate(options):
-        if f"{option} ✅" in result_text or f"✅ {option}" in result_text:
-            return option
-    return None
+async def extract_quiz_data(quiz_param, tg_client=None, max_questions=None):
+    """Extract quiz data from QuizBot using the parameter.
+
+    tg_client defaults to the module's TelegramClient; any object with the same
+    conversation/iter_messages interface (e.g. utils.fake_quizbot.FakeTelegramClient)
+    can be passed instead. See utils.quiz_extractor.play_quiz.
+    """
+    return await play_quiz(tg_client or client, quiz_param, max_questions)
+
+async def refresh_quiz_data(quiz_param, stored_fingerprint, tg_client=None, sample=FINGERPRINT_QUESTIONS):
+    """Re-extract a stored quiz only if QuizBot serves a different version.
+
+    See utils.quiz_extractor.revalidate_quiz.
+    """
+    return await revalidate_quiz(tg_client or client, quiz_param, stored_fingerprint, sample)
 
 def format_quiz_to_text(quiz_data):
     if "error" in quiz_data:
         return f"Error: {quiz_data['error']}"
-    
-    text = []
-    text.append(f"📝 QUIZ: {quiz_data['title']}")
-    text.append(f"🔢 Total Questions: {quiz_data.get('question_count', len(quiz_data['questions']))}")
-    text.append("=" * 50)
-    text.append("")
-    
-    for i, question in enumerate(quiz_data['questions'], 1):
-        text.append(f"Question {i}: {question['question']}")
-        for j, option in enumerate(question['options'], 1):
-            if option == question['correct_option']:
-                text.append(f"  {j}. {option} ✅")
-            else:
-                text.append(f"  {j}. {option}")
-        text.append("")
-    
-    text.append("=" * 50)
-    text.append("Generated by Telegram Quiz Extractor Bot")
-    
-    return "\n".join(text)
+    return render_quiz(quiz_data, 'telegram')
 
 @client.on(events.NewMessage(pattern=direct_quiz_pattern))
 async def handle_direct_quiz(event):
@@ -0,0 +1,191 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, text
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes of the buffered counters
+FLUSH_INTERVAL = 5.0
+
+# Quizzes per UPDATE statement (3 parameters each, well under SQLite's limit)
+FLUSH_BATCH_SIZE = 300
+
+class AccessCounter:
+    """
+    Write-behind buffer for Quiz.access_count and Quiz.last_accessed
+
+    Views only touch an in-memory shard, so reading a hot quiz never takes
+    a row lock. A background thread flushes the totals every
+    flush_interval seconds with one UPDATE ... FROM (VALUES ...) per batch,
+    so the stored counters lag by at most one interval.
+    """
+
+    def __init__(self, shards=16, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        # Each shard maps quiz row id -> [hits, last access]
+        self.shards = [({}, threading.Lock()) for _ in range(shards)]
+        self.app = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.flush_lock = threading.Lock()
+        self.flushed = 0
+        self.flushes = 0
+        self.listeners = []
+
+    def start(self, app):
+        """
+        Start the background flusher
+
+        Args:
+            app (Flask): Application whose database the counters are flushed to
+        """
+        if self.thread is not None:
+            return
+        self.app = app
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='access-counter', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flusher and write out whatever is still buffered"""
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=self.flush_interval + 5)
+        self.thread = None
+        with self.app.app_context():
+            self.flush()
+
+    def add_listener(self, callback):
+        """
+        Call callback(counts) after every successful flush
+
+        Args:
+            callback (callable): Receives a dict of quiz row id -> (hits, last access)
+        """
+        self.listeners.append(callback)
+
+    def record(self, quiz_pk, when=None):
+        """
+        Count one access of a quiz
+
+        Args:
+            quiz_pk (int): Quiz row id (Quiz.id)
+            when (datetime, optional): Access time, defaults to now (UTC)
+        """
+        if self.thread is None:
+            # Started lazily so every entry point gets write-behind counters
+            self.start(current_app._get_current_object())
+        when = when or datetime.utcnow()
+        entries, lock = self.shards[hash(quiz_pk) % len(self.shards)]
+        with lock:
+            entry = entries.get(quiz_pk)
+            if entry is None:
+                entries[quiz_pk] = [1, when]
+            else:
+                entry[0] += 1
+                if when > entry[1]:
+                    entry[1] = when
+
+    def pending(self, quiz_pk):
+        """
+        Accesses of a quiz that are not flushed yet
+
+        Returns:
+            tuple: (hits, last access or None)
+        """
+        entries, lock = self.shards[hash(quiz_pk) % len(self.shards)]
+        with lock:
+            entry = entries.get(quiz_pk)
+            return (entry[0], entry[1]) if entry else (0, None)
+
+    def drain(self):
+        """Take all buffered counts, leaving the shards empty"""
+        drained = {}
+        for entries, lock in self.shards:
+            with lock:
+                drained.update(entries)
+                entries.clear()
+        return drained
+
+    def flush(self):
+        """
+        Write the buffered counts to the database (needs an app context)
+
+        Returns:
+            int: Number of quizzes updated
+        """
+        with self.flush_lock:
+            drained = self.drain()
+            if not drained:
+                return 0
+            items = list(drained.items())
+            try:
+                with db.engine.begin() as connection:
+                    for start in range(0, len(items), FLUSH_BATCH_SIZE):
+                        batch = items[start:start + FLUSH_BATCH_SIZE]
+                        statement, params = self._build_update(connection.dialect.name, batch)
+                        connection.execute(statement, params)
+            except Exception as e:
+                logger.error(f"Error flushing access counts: {str(e)}")
+                self._restore(drained)
+                return 0
+            self.flushed += len(items)
+            self.flushes += 1
+            for listener in self.listeners:
+                try:
+                    listener(drained)
+                except Exception as e:
+                    logger.error(f"Error in access counter listener: {str(e)}")
+            return len(items)
+
+    def _build_update(self, dialect, batch):
+        values = []
+        params = {}
+        binds = []
+        for i, (quiz_pk, (hits, when)) in enumerate(batch):
+            values.append(f"(:id{i}, :hits{i}, :seen{i})")
+            params[f"id{i}"] = quiz_pk
+            params[f"hits{i}"] = hits
+            params[f"seen{i}"] = when
+            binds.append(bindparam(f"seen{i}", type_=db.DateTime))
+        # GREATEST on PostgreSQL, the two-argument MAX on SQLite; an older
+        # timestamp must never overwrite a newer one written elsewhere
+        latest = 'GREATEST' if dialect == 'postgresql' else 'MAX'
+        seen = 'CAST(v.seen AS TIMESTAMP)' if dialect == 'postgresql' else 'v.seen'
+        statement = text(
+            f"WITH v (id, hits, seen) AS (VALUES {', '.join(values)}) "
+            f"UPDATE quiz SET "
+            f"access_count = COALESCE(quiz.access_count, 0) + v.hits, "
+            f"last_accessed = {latest}(COALESCE(quiz.last_accessed, {seen}), {seen}) "
+            f"FROM v WHERE quiz.id = v.id"
+        ).bindparams(*binds)
+        return statement, params
+
+    def _restore(self, drained):
+        # Put counts back after a failed flush so they are retried next time
+        for quiz_pk, (hits, when) in drained.items():
+            entries, lock = self.shards[hash(quiz_pk) % len(self.shards)]
+            with lock:
+                entry = entries.get(quiz_pk)
+                if entry is None:
+                    entries[quiz_pk] = [hits, when]
+                else:
+                    entry[0] += hits
+                    entry[1] = max(entry[1], when)
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Error in access counter flusher: {str(e)}")
+
+# Shared counter used by QuizDatabase.record_access
+access_counter = AccessCounter()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+from sqlalchemy import select
+from sqlalchemy.orm import undefer_group
+from models import Quiz, QuizStats
+from utils import quiz_model
+from utils.database import QuizDatabase, question_range_select, questions_from_rows
+from utils.quiz_cache import quiz_cache
+from utils.quiz_formatter import content_version, render_cache, render_quiz
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+except ImportError:
+    AsyncSession = create_async_engine = None
+
+# Async driver for each database URL scheme
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+# Connections of the async pool (kept apart from the Flask-SQLAlchemy pool)
+POOL_SIZE = 5
+MAX_OVERFLOW = 5
+
+def async_database_url(url):
+    """
+    Rewrite a database URL to use the asyncio driver of its backend
+
+    Args:
+        url (str): SQLAlchemy database URL, e.g. postgresql://... or sqlite:///quizzes.db
+
+    Returns:
+        str: The URL with an async driver, or None for unsupported backends
+    """
+    scheme, separator, rest = url.partition('://')
+    driver = ASYNC_DRIVERS.get(scheme.split('+')[0])
+    return f"{driver}://{rest}" if driver and separator else None
+
+class AsyncQuizDatabase:
+    """
+    asyncio access to the quiz database for the Telethon handlers
+
+    The reads on the bot's hot path (quiz lookup, questions, text export,
+    stats) run on an async engine with its own connection pool. Every
+    other QuizDatabase method is available under the same name as a
+    coroutine that runs the blocking call in a worker thread inside the
+    Flask app context, so no call blocks the event loop. Without an async
+    driver (asyncpg for PostgreSQL, aiosqlite for SQLite), or with another
+    store than QuizDatabase (e.g. a ShardedQuizStore), all calls take the
+    worker thread path. ORM rows returned from a worker thread are
+    detached from their session; read only attributes that were loaded.
+    """
+
+    def __init__(self, app, url=None, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, database=QuizDatabase):
+        self.app = app
+        self.database = database
+        self.engine = None
+        if database is not QuizDatabase:
+            # The async engine reads the SQLAlchemy tables directly
+            return
+        url = url or app.config.get("SQLALCHEMY_DATABASE_URI")
+        async_url = async_database_url(url) if url else None
+        if async_url is None or create_async_engine is None:
+            return
+        options = {"pool_recycle": 300, "pool_pre_ping": True}
+        if not async_url.startswith('sqlite'):
+            options.update(pool_size=pool_size, max_overflow=max_overflow)
+        try:
+            self.engine = create_async_engine(async_url, **options)
+        except ImportError as e:
+            logger.warning(f"Async database driver not installed, running queries in worker threads: {str(e)}")
+
+    def __getattr__(self, name):
+        method = getattr(self.database, name)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking database call in a worker thread inside the app context"""
+        def call():
+            with self.app.app_context():
+                return fn(*args, **kwargs)
+        return await asyncio.to_thread(call)
+
+    async def close(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    async def get_quiz_by_id(self, quiz_id):
+        """
+        Get a quiz by its unique ID, through the shared quiz cache
+
+        Args:
+            quiz_id (str): The quiz identifier
+
+        Returns:
+            QuizSnapshot: Read-only copy of the Quiz row or None if not found
+
+        Raises:
+            Exception: Database errors are passed on rather than reported as
+                "not found", so callers do not extract a stored quiz again
+        """
+        if self.database is not QuizDatabase:
+            return await self.run(self.database.get_quiz_by_id, quiz_id)
+        if self.engine is None:
+            return await self.run(quiz_cache.get, quiz_id, lambda: QuizDatabase._load_quiz_row(quiz_id))
+
+        async def load():
+            async with AsyncSession(self.engine, expire_on_commit=False) as session:
+                result = await session.execute(
+                    select(Quiz).options(undefer_group('content')).where(Quiz.quiz_id == quiz_id)
+                )
+                quiz = result.scalars().first()
+            if quiz is not None and quiz.raw_data is None:
+                # Archived stub; restoring it writes, so it takes the thread path
+                return await self.run(QuizDatabase._load_quiz_row, quiz_id)
+            return quiz
+
+        return await quiz_cache.get_async(quiz_id, load)
+
+    async def get_questions(self, quiz, offset=0, limit=None):
+        """
+        Load a range of questions of a quiz
+
+        Args:
+            quiz (Quiz): Quiz row or snapshot
+            offset (int): Index of the first question to load
+            limit (int, optional): Maximum number of questions, all remaining if None
+
+        Returns:
+            list: utils.quiz_model.Question objects in quiz order
+        """
+        if self.engine is None:
+            return await self.run(self.database.get_questions, quiz, offset, limit)
+        try:
+            async with self.engine.connect() as connection:
+                result = await connection.execute(question_range_select(quiz.id, offset, limit))
+                rows = result.all()
+        except Exception as e:
+            logger.error(f"Error retrieving questions: {str(e)}")
+            return []
+        if not rows and offset < (quiz.question_count or 0):
+            # Quiz saved before questions were stored as rows; QuizDatabase stores them
+            return await self.run(QuizDatabase.get_questions, quiz, offset, limit)
+        return questions_from_rows(rows)
+
+    async def load_quiz_data(self, quiz):
+        """
+        Load the stored questions of a quiz
+
+        Returns:
+            utils.quiz_model.Quiz: Normalized quiz data
+        """
+        data = quiz_model.Quiz.from_json(quiz.raw_data)
+        if not data.quiz_id:
+            data.quiz_id = quiz.quiz_id
+        if not data.questions and quiz.question_count:
+            data.questions = await self.get_questions(quiz)
+        return data
+
+    async def get_formatted_text(self, quiz):
+        """
+        Get the text export of a quiz
+
+        Returns:
+            str: The stored export, or the one rendered from the question store
+        """
+        if quiz.formatted_data:
+            return quiz.formatted_data
+        version = content_version(quiz.raw_data)
+        output = render_cache.get(quiz.quiz_id, version, 'txt')
+        if output is None:
+            output = render_cache.put(quiz.quiz_id, version, 'txt',
+                                      render_quiz(await self.load_quiz_data(quiz), 'txt'))
+        return output
+
+    async def record_access(self, quiz):
+        """Count an access; buffered in memory, so no I/O happens here"""
+        if self.database is not QuizDatabase:
+            # Other stores write the access straight away
+            return await self.run(self.database.record_access, quiz)
+        with self.app.app_context():
+            return QuizDatabase.record_access(quiz)
+
+    async def get_quiz_stats(self, quiz):
+        """
+        Get attempt statistics of a quiz from its running totals
+
+        Returns:
+            dict: See QuizDatabase.get_quiz_stats, or None if they cannot be read
+        """
+        if self.engine is None:
+            return await self.run(self.database.get_quiz_stats, quiz)
+        try:
+            async with AsyncSession(self.engine) as session:
+                stats = await session.get(QuizStats, quiz.id)
+                return (stats or QuizStats(quiz_id=quiz.id)).to_dict()
+        except Exception as e:
+            logger.error(f"Error getting quiz stats: {str(e)}")
+            return None
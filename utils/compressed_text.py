@@ -0,0 +1,127 @@
+import zlib
+import base64
+import logging
+import threading
+from sqlalchemy.types import Text, TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Stored values start with "~z", the codec letter and the format version,
+# e.g. "~zs1:<base64>" (zstd) or "~zl1:<base64>" (zlib); anything else is
+# a plain value written before compression was enabled. A plain value that
+# itself looks like a header is stored escaped as "~zp1:<value>".
+HEADER_PREFIX = '~z'
+FORMAT_VERSION = '1'
+ZSTD = 's'
+ZLIB = 'l'
+PLAIN = 'p'
+
+# Values shorter than this are stored as they are
+MIN_COMPRESS_LENGTH = 256
+
+ZSTD_LEVEL = 6
+ZLIB_LEVEL = 6
+
+_local = threading.local()
+
+def _zstd_compressor():
+    # zstd (de)compressors must not be shared between threads
+    compressor = getattr(_local, 'compressor', None)
+    if compressor is None:
+        compressor = _local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor
+
+def _zstd_decompressor():
+    decompressor = getattr(_local, 'decompressor', None)
+    if decompressor is None:
+        decompressor = _local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+def is_compressed(value):
+    return isinstance(value, str) and value.startswith(HEADER_PREFIX) and value[3:5] == FORMAT_VERSION + ':'
+
+def compress_text(value):
+    """
+    Compress a string into the stored form
+
+    Args:
+        value (str): Text to store
+
+    Returns:
+        str: Header plus base64 payload, or the value itself if compressing does not pay off
+    """
+    if value is None:
+        return value
+    if len(value) >= MIN_COMPRESS_LENGTH:
+        codec, payload = compress_bytes(value.encode('utf-8'))
+        stored = f"{HEADER_PREFIX}{codec}{FORMAT_VERSION}:" + base64.b64encode(payload).decode('ascii')
+        if len(stored) < len(value):
+            return stored
+    if is_compressed(value):
+        # Would be taken for a compressed value when read back
+        return f"{HEADER_PREFIX}{PLAIN}{FORMAT_VERSION}:" + value
+    return value
+
+def decompress_text(value):
+    """
+    Turn a stored value back into the original string
+
+    Args:
+        value (str): Stored value (compressed or plain)
+
+    Returns:
+        str: The original text
+    """
+    if not is_compressed(value):
+        return value
+    if value[2] == PLAIN:
+        return value[5:]
+    return decompress_bytes(value[2], base64.b64decode(value[5:])).decode('utf-8')
+
+def compress_bytes(data):
+    """
+    Compress bytes with the best available codec
+
+    Returns:
+        tuple: (codec letter, compressed bytes)
+    """
+    if zstandard is not None:
+        return ZSTD, _zstd_compressor().compress(data)
+    return ZLIB, zlib.compress(data, ZLIB_LEVEL)
+
+def decompress_bytes(codec, payload):
+    """Reverse compress_bytes"""
+    if codec == ZLIB:
+        return zlib.decompress(payload)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ValueError("Stored value is zstd-compressed but the zstandard package is not installed")
+        return _zstd_decompressor().decompress(payload)
+    raise ValueError(f"Unknown compression codec in stored value: {codec!r}")
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored compressed (zstd if installed, zlib otherwise)
+
+    The database column stays TEXT, so no schema change is needed and
+    rows written before compression are read back unchanged. Use with
+    deferred columns so the value is only fetched and decompressed when
+    the attribute is accessed.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+    def coerce_compared_value(self, op, value):
+        # Comparisons (LIKE '~z%' and friends) see the stored form
+        return Text()
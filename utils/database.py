@@ -1,31 +1,151 @@
+import copy
 import json
+import time
+import base64
+import binascii
+import hashlib
 import logging
-from datetime import datetime
-from models import db, Quiz, QuizAttempt
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, inspect, select
+from sqlalchemy.orm import defer, undefer_group
+from sqlalchemy.dialects import postgresql, sqlite
+from models import (db, Quiz, QuizAttempt, QuizStats, QuestionContent, QuizQuestionRef, QuizArchiveEntry,
+                    QuizVersion, QuizVersionQuestion, QuizFreshness)
+from utils import quiz_model
+from utils.quiz_model import normalize_quiz
+from utils.quiz_formatter import content_version, render_cache, render_quiz
+from utils.search_index import QuizSearchIndex, make_snippet
+from utils.access_counter import access_counter
+from utils.top_quizzes import top_quizzes, summarize
+from utils.leaderboard import leaderboard
+from utils.db_metrics import timed_operation
+from utils.quiz_cache import quiz_cache, answer_key_cache
+from utils.compressed_text import HEADER_PREFIX, MIN_COMPRESS_LENGTH
+from utils.segment_store import archive_store
 
 logger = logging.getLogger(__name__)
 
+# Cached snapshots keep their access counts current between reloads
+access_counter.add_listener(quiz_cache.apply_access_counts)
+
+# Questions loaded per query when streaming a quiz
+QUESTION_BATCH_SIZE = 200
+
+# Quizzes written per transaction by save_quizzes
+SAVE_BATCH_SIZE = 500
+
+# Quizzes rewritten per transaction by compress_stored_quizzes
+COMPRESS_BATCH_SIZE = 200
+
+# Hashes per IN (...) lookup in the question store
+CONTENT_LOOKUP_BATCH_SIZE = 500
+
+# Quizzes moved per transaction by migrate_legacy_questions
+LEGACY_MIGRATION_BATCH_SIZE = 200
+
+# Question and option tables of the row-per-question layout the question
+# store replaced; only read by migrate_legacy_questions, which drops them
+LEGACY_QUESTIONS = db.table('quiz_question', db.column('quiz_id'), db.column('ordinal'), db.column('text'))
+LEGACY_OPTIONS = db.table('quiz_option', db.column('quiz_id'), db.column('question_ordinal'), db.column('ordinal'),
+                          db.column('text'), db.column('correct'))
+
+# Attempts read per round trip by rebuild_quiz_stats
+STATS_REBUILD_BATCH_SIZE = 1000
+
+# Submitted attempts written per transaction by record_attempts
+ATTEMPT_BATCH_SIZE = 1000
+
+# Orderings of list_quizzes: name -> sort column (ties broken by id, newest/largest first)
+LISTING_ORDERS = {
+    'recent': Quiz.last_accessed,
+    'popular': Quiz.access_count,
+    'created': Quiz.created_at
+}
+
+# Columns list_quizzes can return, and those it returns when none are requested
+LISTING_FIELDS = ('quiz_id', 'title', 'author', 'description', 'question_count',
+                  'created_at', 'last_accessed', 'access_count')
+DEFAULT_LISTING_FIELDS = ('quiz_id', 'title', 'question_count', 'last_accessed', 'access_count')
+
+MAX_LISTING_LIMIT = 100
+
+# Every this many versions of a quiz is stored in full, bounding the
+# deltas read to reconstruct a version
+VERSION_SNAPSHOT_INTERVAL = 10
+
+# Quizzes not accessed for this many days are moved to the archive segments
+ARCHIVE_AFTER_DAYS = 90
+
+# Quizzes archived per segment write and transaction
+ARCHIVE_BATCH_SIZE = 100
+
+# Seconds between runs of the background archiver
+ARCHIVE_INTERVAL = 6 * 60 * 60
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
 class QuizDatabase:
     """Class for handling database operations for quizzes"""
     
     @staticmethod
+    @timed_operation
+    def ensure_indexes():
+        """
+        Create indexes declared on the models that an existing table is missing
+        
+        db.create_all() only creates indexes together with new tables.
+        """
+        try:
+            for table in db.Model.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            logger.error(f"Error creating indexes: {str(e)}")
+    
+    @staticmethod
+    @timed_operation
     def get_quiz_by_id(quiz_id):
         """
         Get a quiz by its unique ID (shortcode or parameter)
         
+        Served from utils.quiz_cache; the database is only queried on a miss.
+        
         Args:
             quiz_id (str): The quiz identifier
             
         Returns:
-            Quiz: Quiz object or None if not found
+            QuizSnapshot: Read-only copy of the Quiz row or None if not found
         """
         try:
-            return Quiz.query.filter_by(quiz_id=quiz_id).first()
+            return quiz_cache.get(quiz_id, lambda: QuizDatabase._load_quiz_row(quiz_id))
         except Exception as e:
             logger.error(f"Error retrieving quiz by ID: {str(e)}")
             return None
     
     @staticmethod
+    def _get_quiz_row(quiz_id, content=False):
+        # Uncached ORM row, for code that modifies or deletes the quiz;
+        # content=True also fetches the deferred raw/formatted data
+        query = Quiz.query
+        if content:
+            query = query.options(undefer_group('content'))
+        return query.filter_by(quiz_id=quiz_id).first()
+    
+    @staticmethod
+    def _load_quiz_row(quiz_id):
+        # Cache loader: an archived quiz is restored before it is cached
+        quiz = QuizDatabase._get_quiz_row(quiz_id, content=True)
+        if quiz is not None and quiz.raw_data is None and QuizDatabase._restore_archived(quiz):
+            quiz = QuizDatabase._get_quiz_row(quiz_id, content=True)
+        return quiz
+    
+    @staticmethod
+    @timed_operation
     def save_quiz(quiz_id, quiz_data):
         """
         Save or update a quiz in the database
@@ -38,31 +158,13 @@ class QuizDatabase:
             Quiz: Saved Quiz object or None if save fails
         """
         try:
-            # Check if the quiz already exists
-            quiz = QuizDatabase.get_quiz_by_id(quiz_id)
-            
-            if quiz:
-                # Update existing quiz
-                logger.info(f"Updating existing quiz: {quiz_id}")
-                quiz.raw_data = json.dumps(quiz_data)
-                quiz.formatted_data = quiz_data.get('formatted_text', '')
-                quiz.update_from_data(quiz_data)
-                quiz.increment_access()
-            else:
-                # Create new quiz
-                logger.info(f"Creating new quiz: {quiz_id}")
-                quiz = Quiz(
-                    quiz_id=quiz_id,
-                    title=quiz_data.get('title', 'Telegram Quiz'),
-                    question_count=len(quiz_data.get('questions', [])),
-                    raw_data=json.dumps(quiz_data),
-                    formatted_data=quiz_data.get('formatted_text', '')
-                )
-                db.session.add(quiz)
+            logger.info(f"Saving quiz: {quiz_id}")
+            quizzes, created = QuizDatabase._upsert_quizzes([(quiz_id, quiz_data)])
             
             # Commit the changes
             db.session.commit()
-            return quiz
+            QuizDatabase._on_quizzes_saved(quizzes, created)
+            return quizzes[0]
             
         except Exception as e:
             logger.error(f"Error saving quiz: {str(e)}")
@@ -70,6 +172,1169 @@ class QuizDatabase:
             return None
     
     @staticmethod
+    @timed_operation
+    def save_quizzes(quizzes, batch_size=SAVE_BATCH_SIZE):
+        """
+        Save or update many quizzes, one transaction per batch
+        
+        Args:
+            quizzes (iterable): (quiz_id, quiz_data) pairs
+            batch_size (int): Quizzes written per transaction
+            
+        Returns:
+            int: Number of quizzes saved
+        """
+        saved = 0
+        batch = []
+        for item in quizzes:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                saved += QuizDatabase._save_batch(batch)
+                batch = []
+        if batch:
+            saved += QuizDatabase._save_batch(batch)
+        return saved
+    
+    @staticmethod
+    def _save_batch(batch):
+        try:
+            return QuizDatabase.write_quiz_batch(batch)
+        except Exception as e:
+            logger.error(f"Error saving batch of {len(batch)} quizzes: {str(e)}")
+            return 0
+    
+    @staticmethod
+    @timed_operation
+    def write_quiz_batch(batch):
+        """
+        Save or update quizzes in one transaction, raising on failure
+        
+        For callers that handle errors themselves (e.g. retrying); the
+        transaction is rolled back before the exception propagates.
+        
+        Args:
+            batch (list): (quiz_id, quiz_data) pairs
+            
+        Returns:
+            int: Number of quizzes saved
+        """
+        try:
+            quizzes, created = QuizDatabase._upsert_quizzes(batch)
+            # Read what the in-memory views need before the commit expires every row
+            summaries = [summarize(quiz) for quiz in quizzes]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        QuizDatabase._on_quizzes_saved(summaries, created)
+        return len(quizzes)
+    
+    @staticmethod
+    def _upsert_quizzes(items):
+        """
+        Insert or update quiz rows with their questions and search entries (caller commits)
+        
+        Args:
+            items (list): (quiz_id, quiz_data) pairs
+            
+        Returns:
+            tuple: (saved Quiz objects, one per distinct quiz_id; set of quiz_ids that were created)
+        """
+        # Normalize once; a quiz_id repeated within the batch keeps its
+        # last data, as sequential saves would. The questions themselves go
+        # to the content-addressed store, raw_data only keeps the header and
+        # the text export is rendered on demand.
+        prepared = {}
+        for quiz_id, quiz_data in items:
+            # normalize_quiz returns Quiz objects as they are; copy before
+            # setting quiz_id so the caller's object is left alone
+            normalized = copy.copy(normalize_quiz(quiz_data))
+            normalized.quiz_id = quiz_id
+            prepared.pop(quiz_id, None)
+            prepared[quiz_id] = (normalized, QuizDatabase._header_json(normalized))
+        
+        insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+        if insert is None:
+            existing = {quiz.quiz_id for quiz in Quiz.query.filter(Quiz.quiz_id.in_(list(prepared)))}
+            created = set(prepared) - existing
+            quizzes = [QuizDatabase._write_quiz_row(quiz_id, normalized, header)
+                       for quiz_id, (normalized, header) in prepared.items()]
+        else:
+            now = datetime.utcnow()
+            rows = [{
+                'quiz_id': quiz_id,
+                'title': normalized.title or 'Telegram Quiz',
+                'author': normalized.author,
+                'description': normalized.description,
+                'question_count': normalized.question_count,
+                'raw_data': header,
+                'formatted_data': None,
+                'created_at': now,
+                'last_accessed': now,
+                'access_count': 0
+            } for quiz_id, (normalized, header) in prepared.items()]
+            
+            # One INSERT ... ON CONFLICT for the whole batch; saving an
+            # existing quiz counts as an access, as it always has
+            statement = insert(Quiz.__table__).values(rows)
+            excluded = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=[Quiz.quiz_id],
+                set_={
+                    'title': excluded.title,
+                    'author': db.func.coalesce(excluded.author, Quiz.author),
+                    'description': db.func.coalesce(excluded.description, Quiz.description),
+                    'question_count': excluded.question_count,
+                    'raw_data': excluded.raw_data,
+                    'formatted_data': excluded.formatted_data,
+                    'access_count': db.func.coalesce(Quiz.access_count, 0) + 1,
+                    'last_accessed': excluded.last_accessed
+                }
+            )
+            
+            if getattr(db.engine.dialect, 'full_returning', False):
+                # PostgreSQL hands the rows back in the same round trip
+                quizzes = db.session.execute(
+                    select(Quiz)
+                    .from_statement(statement.returning(*Quiz.__table__.c))
+                    .execution_options(populate_existing=True)
+                ).scalars().all()
+            else:
+                db.session.execute(statement)
+                quizzes = (Quiz.query
+                           .filter(Quiz.quiz_id.in_(list(prepared)))
+                           .populate_existing()
+                           .all())
+            by_id = {quiz.quiz_id: quiz for quiz in quizzes}
+            quizzes = [by_id[quiz_id] for quiz_id in prepared]
+            # The conflict update keeps created_at, so only new rows carry ours
+            created = {quiz.quiz_id for quiz in quizzes if quiz.created_at == now}
+        
+        # Store the questions as rows, a new version and the full-text
+        # index in the same transaction; only changed positions are written
+        changes = QuizDatabase._store_question_rows(
+            [(quiz.id, prepared[quiz.quiz_id][0].questions) for quiz in quizzes]
+        )
+        versioned = QuizDatabase._record_versions([
+            (quiz.id, prepared[quiz.quiz_id][1], prepared[quiz.quiz_id][0].questions, changes[quiz.id])
+            for quiz in quizzes
+        ])
+        # Saving an archived quiz replaces its content, so the archived copy is dropped
+        (QuizArchiveEntry.query
+         .filter(QuizArchiveEntry.quiz_id.in_([quiz.id for quiz in quizzes]))
+         .delete(synchronize_session=False))
+        for quiz in quizzes:
+            if quiz.id in versioned:
+                QuizSearchIndex.index_quiz(quiz, render_quiz(prepared[quiz.quiz_id][0], 'txt'))
+        # A fresh extraction is as good as a revalidation
+        QuizDatabase._mark_verified([quiz.id for quiz in quizzes])
+        return quizzes, created
+    
+    @staticmethod
+    def _on_quizzes_saved(quizzes, created):
+        # In-memory views are only updated once the save is committed;
+        # quizzes are Quiz rows or top_quizzes.QuizSummary tuples
+        for quiz in quizzes:
+            quiz_cache.invalidate(quiz.quiz_id)
+            answer_key_cache.invalidate(quiz.id)
+            top_quizzes.on_saved(quiz, quiz.quiz_id in created)
+    
+    @staticmethod
+    def _header_json(normalized):
+        # Quiz metadata plus a digest of the question hashes, so
+        # content_version(raw_data) still changes whenever a question does
+        header = {'quiz_id': normalized.quiz_id, 'title': normalized.title}
+        if normalized.author is not None:
+            header['author'] = normalized.author
+        if normalized.description is not None:
+            header['description'] = normalized.description
+        digest = hashlib.blake2b(digest_size=16)
+        for question in normalized.questions:
+            digest.update(question.content_hash().encode('ascii'))
+        header['content_hash'] = digest.hexdigest()
+        return json.dumps(header, ensure_ascii=False, separators=(',', ':'))
+    
+    @staticmethod
+    def _write_quiz_row(quiz_id, normalized, header):
+        # Select-then-write for databases without INSERT ... ON CONFLICT
+        quiz = QuizDatabase._get_quiz_row(quiz_id)
+        if quiz:
+            quiz.raw_data = header
+            quiz.formatted_data = None
+            quiz.title = normalized.title or 'Telegram Quiz'
+            quiz.question_count = normalized.question_count
+            QuizDatabase.record_access(quiz)
+        else:
+            quiz = Quiz(
+                quiz_id=quiz_id,
+                title=normalized.title or 'Telegram Quiz',
+                question_count=normalized.question_count,
+                raw_data=header
+            )
+            db.session.add(quiz)
+        db.session.flush()
+        return quiz
+    
+    @staticmethod
+    @timed_operation
+    def load_quiz_data(quiz):
+        """
+        Load the stored questions of a quiz
+        
+        Args:
+            quiz (Quiz): Quiz row
+            
+        Returns:
+            utils.quiz_model.Quiz: Normalized quiz data
+        """
+        if quiz.raw_data is None:
+            # Archived stub: read the archived copy without restoring it
+            archived = QuizDatabase._read_archived(quiz.id)
+            if archived is not None:
+                return archived[0]
+        data = quiz_model.Quiz.from_json(quiz.raw_data)
+        if not data.quiz_id:
+            data.quiz_id = quiz.quiz_id
+        if not data.questions and quiz.question_count:
+            # raw_data only holds the header; questions live in the question store
+            data.questions = QuizDatabase.get_questions(quiz)
+        return data
+    
+    @staticmethod
+    @timed_operation
+    def get_formatted_text(quiz):
+        """
+        Get the text export of a quiz
+        
+        Args:
+            quiz (Quiz): Quiz row
+            
+        Returns:
+            str: The stored export for quizzes saved with one, otherwise
+                rendered from the question store (memoized per content version)
+        """
+        if quiz.formatted_data:
+            return quiz.formatted_data
+        return render_cache.get_or_render(
+            quiz.quiz_id,
+            content_version(quiz.raw_data),
+            'txt',
+            lambda: QuizDatabase.load_quiz_data(quiz)
+        )
+    
+    @staticmethod
+    @timed_operation
+    def record_access(quiz):
+        """
+        Count an access of a quiz without a write transaction
+        
+        The count is buffered in memory and flushed to access_count and
+        last_accessed in the background (see utils.access_counter).
+        
+        Args:
+            quiz (Quiz): Quiz row
+        """
+        access_counter.record(quiz.id)
+        top_quizzes.on_access(quiz)
+    
+    @staticmethod
+    @timed_operation
+    def get_access_stats(quiz):
+        """
+        Get the access count and last access time including unflushed accesses
+        
+        Args:
+            quiz (Quiz): Quiz row
+            
+        Returns:
+            tuple: (access count, last accessed datetime)
+        """
+        hits, last = access_counter.pending(quiz.id)
+        last_accessed = quiz.last_accessed
+        if last is not None and (last_accessed is None or last > last_accessed):
+            last_accessed = last
+        return (quiz.access_count or 0) + hits, last_accessed
+    
+    @staticmethod
+    @timed_operation
+    def store_questions(quiz, questions):
+        """
+        Replace the question references of a quiz (caller commits)
+        
+        Args:
+            quiz (Quiz): Flushed quiz row
+            questions (list): utils.quiz_model.Question objects in order
+        """
+        QuizDatabase._store_question_rows([(quiz.id, questions)])
+    
+    @staticmethod
+    def _store_question_rows(quizzes):
+        # Diff against the stored references and write only the positions
+        # that changed; returns {quiz pk: {ordinal: hash written}}
+        quiz_pks = [quiz_pk for quiz_pk, _ in quizzes]
+        if not quiz_pks:
+            return {}
+        existing = QuizDatabase._load_question_hashes(quiz_pks)
+        
+        now = datetime.utcnow()
+        changes = {}
+        refs = []
+        updates = []
+        removed = []
+        contents = {}
+        for quiz_pk, questions in quizzes:
+            stored = existing.get(quiz_pk, [])
+            changed = changes[quiz_pk] = {}
+            for ordinal, question in enumerate(questions):
+                content_hash = question.content_hash()
+                previous = stored[ordinal] if ordinal < len(stored) else None
+                if previous == content_hash:
+                    continue
+                changed[ordinal] = content_hash
+                row = {'quiz_pk': quiz_pk, 'position': ordinal, 'content_hash': content_hash}
+                (updates if previous is not None else refs).append(row)
+                if content_hash not in contents:
+                    contents[content_hash] = {
+                        'hash': content_hash,
+                        'text': question.text or '',
+                        'options': json.dumps([[o.text or '', bool(o.correct)] for o in question.options],
+                                              ensure_ascii=False, separators=(',', ':')),
+                        'correct_index': question.correct_index,
+                        'created_at': now
+                    }
+        
+            removed.extend({'quiz_pk': quiz_pk, 'position': ordinal}
+                           for ordinal in range(len(questions), len(stored)))
+        
+        QuizDatabase._store_question_content(contents)
+        table = QuizQuestionRef.__table__
+        at_position = (table.c.quiz_id == bindparam('quiz_pk')) & (table.c.ordinal == bindparam('position'))
+        if removed:
+            db.session.execute(table.delete().where(at_position), removed)
+        if updates:
+            db.session.execute(table.update().where(at_position).values(question_hash=bindparam('content_hash')),
+                               updates)
+        if refs:
+            db.session.execute(table.insert().values(quiz_id=bindparam('quiz_pk'), ordinal=bindparam('position'),
+                                                     question_hash=bindparam('content_hash')), refs)
+        return changes
+    
+    @staticmethod
+    def _load_question_hashes(quiz_pks):
+        # {quiz pk: [question hash per ordinal, None for gaps]}
+        hashes = {}
+        for start in range(0, len(quiz_pks), CONTENT_LOOKUP_BATCH_SIZE):
+            chunk = quiz_pks[start:start + CONTENT_LOOKUP_BATCH_SIZE]
+            rows = (db.session.query(QuizQuestionRef.quiz_id, QuizQuestionRef.ordinal, QuizQuestionRef.question_hash)
+                    .filter(QuizQuestionRef.quiz_id.in_(chunk))
+                    .all())
+            for quiz_pk, ordinal, question_hash in rows:
+                stored = hashes.setdefault(quiz_pk, [])
+                if ordinal >= len(stored):
+                    stored.extend([None] * (ordinal + 1 - len(stored)))
+                stored[ordinal] = question_hash
+        return hashes
+    
+    @staticmethod
+    def _record_versions(items):
+        """
+        Add a version to each quiz whose header changed (caller commits)
+        
+        Every VERSION_SNAPSHOT_INTERVAL-th version lists all question
+        positions; the others only those written by _store_question_rows.
+        The header carries a digest of the question hashes, so an unchanged
+        header means unchanged questions.
+        
+        Args:
+            items (list): (quiz pk, header JSON, questions, {ordinal: hash} changed) tuples
+            
+        Returns:
+            set: Pks of the quizzes that got a new version
+        """
+        quiz_pks = [quiz_pk for quiz_pk, _, _, _ in items]
+        latest = {}
+        for start in range(0, len(quiz_pks), CONTENT_LOOKUP_BATCH_SIZE):
+            chunk = quiz_pks[start:start + CONTENT_LOOKUP_BATCH_SIZE]
+            newest = (db.session.query(QuizVersion.quiz_id, db.func.max(QuizVersion.version).label('version'))
+                      .filter(QuizVersion.quiz_id.in_(chunk))
+                      .group_by(QuizVersion.quiz_id)
+                      .subquery())
+            rows = (db.session.query(QuizVersion.quiz_id, QuizVersion.version, QuizVersion.header)
+                    .join(newest, db.and_(QuizVersion.quiz_id == newest.c.quiz_id,
+                                          QuizVersion.version == newest.c.version))
+                    .all())
+            latest.update((quiz_pk, (version, header)) for quiz_pk, version, header in rows)
+        
+        now = datetime.utcnow()
+        versions = []
+        positions = []
+        for quiz_pk, header, questions, changed in items:
+            version, previous_header = latest.get(quiz_pk, (0, None))
+            if header == previous_header:
+                continue
+            version += 1
+            snapshot = version % VERSION_SNAPSHOT_INTERVAL == 1 or VERSION_SNAPSHOT_INTERVAL == 1
+            versions.append({'quiz_id': quiz_pk, 'version': version, 'header': header,
+                             'question_count': len(questions), 'snapshot': snapshot, 'created_at': now})
+            written = ({ordinal: question.content_hash() for ordinal, question in enumerate(questions)}
+                       if snapshot else changed)
+            positions.extend({'quiz_id': quiz_pk, 'version': version, 'ordinal': ordinal, 'question_hash': h}
+                             for ordinal, h in written.items())
+        if versions:
+            db.session.execute(QuizVersion.__table__.insert(), versions)
+        if positions:
+            db.session.execute(QuizVersionQuestion.__table__.insert(), positions)
+        return {row['quiz_id'] for row in versions}
+    
+    @staticmethod
+    def _store_question_content(contents):
+        # Only questions the store has not seen yet are written
+        hashes = list(contents)
+        for start in range(0, len(hashes), CONTENT_LOOKUP_BATCH_SIZE):
+            chunk = hashes[start:start + CONTENT_LOOKUP_BATCH_SIZE]
+            for (known,) in db.session.query(QuestionContent.hash).filter(QuestionContent.hash.in_(chunk)):
+                contents.pop(known, None)
+        if not contents:
+            return
+        
+        insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+        if insert is None:
+            db.session.execute(QuestionContent.__table__.insert(), list(contents.values()))
+        else:
+            # A concurrent save may have stored the same question meanwhile
+            db.session.execute(
+                insert(QuestionContent.__table__).on_conflict_do_nothing(index_elements=['hash']),
+                list(contents.values())
+            )
+    
+    @staticmethod
+    @timed_operation
+    def get_quiz_metadata(quiz_id):
+        """
+        Get a quiz without loading its raw_data and formatted_data columns
+        
+        Args:
+            quiz_id (str): The quiz identifier
+            
+        Returns:
+            Quiz: Quiz object or None if not found
+        """
+        try:
+            return (Quiz.query
+                    .options(defer(Quiz.raw_data), defer(Quiz.formatted_data))
+                    .filter_by(quiz_id=quiz_id)
+                    .first())
+        except Exception as e:
+            logger.error(f"Error retrieving quiz metadata: {str(e)}")
+            return None
+    
+    @staticmethod
+    @timed_operation
+    def get_quiz_header(quiz):
+        """
+        Build a question-less utils.quiz_model.Quiz for streaming exports
+        
+        Args:
+            quiz (Quiz): Quiz row
+            
+        Returns:
+            utils.quiz_model.Quiz: Metadata with question_count set from the row
+        """
+        return quiz_model.Quiz(
+            quiz_id=quiz.quiz_id,
+            title=quiz.title,
+            author=quiz.author,
+            description=quiz.description,
+            total_questions=quiz.question_count or 0
+        )
+    
+    @staticmethod
+    @timed_operation
+    def get_questions(quiz, offset=0, limit=None):
+        """
+        Load a range of questions of a quiz
+        
+        Args:
+            quiz (Quiz): Quiz row
+            offset (int): Index of the first question to load
+            limit (int, optional): Maximum number of questions, all remaining if None
+            
+        Returns:
+            list: utils.quiz_model.Question objects in quiz order
+        """
+        try:
+            questions = QuizDatabase._load_question_range(quiz.id, offset, limit)
+            if not questions and offset < (quiz.question_count or 0):
+                # Quiz saved before questions were stored as rows
+                if QuizDatabase._backfill_questions(quiz):
+                    questions = QuizDatabase._load_question_range(quiz.id, offset, limit)
+            return questions
+        except Exception as e:
+            logger.error(f"Error retrieving questions: {str(e)}")
+            return []
+    
+    @staticmethod
+    @timed_operation
+    def iter_questions(quiz, batch_size=QUESTION_BATCH_SIZE):
+        """
+        Stream the questions of a quiz in batches
+        
+        Args:
+            quiz (Quiz): Quiz row
+            batch_size (int): Questions loaded per query
+            
+        Yields:
+            Question: utils.quiz_model.Question objects in quiz order
+        """
+        offset = 0
+        while True:
+            batch = QuizDatabase.get_questions(quiz, offset, batch_size)
+            yield from batch
+            if len(batch) < batch_size:
+                break
+            offset += batch_size
+    
+    @staticmethod
+    @timed_operation
+    def get_quiz_fingerprint(quiz, sample=quiz_model.FINGERPRINT_QUESTIONS):
+        """
+        Fingerprint of a stored quiz, to compare with a partial re-extraction
+        
+        Args:
+            quiz (Quiz): Quiz row or snapshot
+            sample (int): Number of leading questions included
+            
+        Returns:
+            str: See utils.quiz_model.quiz_fingerprint, or None if it cannot be computed
+        """
+        try:
+            if quiz.raw_data is None:
+                # Archived: read from the segment without restoring
+                header = QuizDatabase.load_quiz_data(quiz)
+            else:
+                header = quiz_model.Quiz.from_json(quiz.raw_data)
+            hashes = [question.content_hash() for question in header.questions[:sample]]
+            if not hashes:
+                hashes = [question_hash for (question_hash,) in
+                          db.session.query(QuizQuestionRef.question_hash)
+                          .filter(QuizQuestionRef.quiz_id == quiz.id, QuizQuestionRef.ordinal < sample)
+                          .order_by(QuizQuestionRef.ordinal)]
+            return quiz_model.quiz_fingerprint(header.title, quiz.question_count or 0, hashes, sample)
+        except Exception as e:
+            logger.error(f"Error computing quiz fingerprint: {str(e)}")
+            return None
+    
+    @staticmethod
+    @timed_operation
+    def get_stale_quizzes(ttl, limit=50, quiz_ids=None):
+        """
+        Find stored quizzes not checked against QuizBot within a time-to-live
+        
+        A quiz counts as checked when it was saved or revalidated; archived
+        quizzes are left alone.
+        
+        Args:
+            ttl (float): Seconds a check stays valid
+            limit (int): Maximum number of quizzes
+            quiz_ids (list, optional): Only consider these quizzes
+            
+        Returns:
+            list: (quiz_id, access_count) tuples, most accessed first
+        """
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+            checked = db.func.coalesce(QuizFreshness.verified_at, Quiz.created_at)
+            archived = db.session.query(QuizArchiveEntry.quiz_id).filter(QuizArchiveEntry.quiz_id == Quiz.id)
+            query = (db.session.query(Quiz.quiz_id, Quiz.access_count)
+                     .outerjoin(QuizFreshness, QuizFreshness.quiz_id == Quiz.id)
+                     .filter(checked < cutoff)
+                     .filter(~archived.exists()))
+            if quiz_ids is not None:
+                query = query.filter(Quiz.quiz_id.in_(list(quiz_ids)))
+            rows = query.order_by(Quiz.access_count.desc(), Quiz.id).limit(limit).all()
+            return [(quiz_id, access_count or 0) for quiz_id, access_count in rows]
+        except Exception as e:
+            logger.error(f"Error finding stale quizzes: {str(e)}")
+            return []
+    
+    @staticmethod
+    @timed_operation
+    def mark_quiz_verified(quiz_id):
+        """
+        Record that a stored quiz was found to match QuizBot
+        
+        Args:
+            quiz_id (str): The quiz identifier
+            
+        Returns:
+            bool: True if the quiz exists and was marked
+        """
+        try:
+            quiz = QuizDatabase.get_quiz_metadata(quiz_id)
+            if quiz is None:
+                return False
+            QuizDatabase._mark_verified([quiz.id])
+            db.session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error marking quiz verified: {str(e)}")
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    def _mark_verified(quiz_pks):
+        # Set verified_at of the quizzes to now (caller commits)
+        if not quiz_pks:
+            return
+        now = datetime.utcnow()
+        rows = [{'quiz_id': quiz_pk, 'verified_at': now} for quiz_pk in quiz_pks]
+        insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+        if insert is None:
+            QuizFreshness.query.filter(QuizFreshness.quiz_id.in_(quiz_pks)).delete(synchronize_session=False)
+            db.session.execute(QuizFreshness.__table__.insert(), rows)
+        else:
+            statement = insert(QuizFreshness.__table__)
+            db.session.execute(
+                statement.on_conflict_do_update(index_elements=['quiz_id'],
+                                                set_={'verified_at': statement.excluded.verified_at}),
+                rows
+            )
+    
+    @staticmethod
+    @timed_operation
+    def get_quiz_versions(quiz_id):
+        """
+        List the saved versions of a quiz
+        
+        Args:
+            quiz_id (str): The quiz identifier
+            
+        Returns:
+            list: Dictionaries with version, created_at, question_count and
+                snapshot, oldest first; empty if the quiz is not found
+        """
+        try:
+            rows = (db.session.query(QuizVersion.version, QuizVersion.created_at,
+                                     QuizVersion.question_count, QuizVersion.snapshot)
+                    .join(Quiz, Quiz.id == QuizVersion.quiz_id)
+                    .filter(Quiz.quiz_id == quiz_id)
+                    .order_by(QuizVersion.version)
+                    .all())
+            return [{'version': version, 'created_at': created_at, 'question_count': question_count,
+                     'snapshot': snapshot}
+                    for version, created_at, question_count, snapshot in rows]
+        except Exception as e:
+            logger.error(f"Error listing quiz versions: {str(e)}")
+            return []
+    
+    @staticmethod
+    @timed_operation
+    def get_quiz_version(quiz_id, version=None):
+        """
+        Reconstruct a saved version of a quiz
+        
+        Reads the nearest snapshot at or before the version and applies
+        the deltas after it, at most VERSION_SNAPSHOT_INTERVAL versions.
+        
+        Args:
+            quiz_id (str): The quiz identifier
+            version (int, optional): Version number, the latest if None
+            
+        Returns:
+            utils.quiz_model.Quiz: The quiz as saved in that version, or None if not found
+        """
+        try:
+            quiz = QuizDatabase._get_quiz_row(quiz_id)
+            if quiz is None:
+                return None
+            versions = QuizVersion.query.filter(QuizVersion.quiz_id == quiz.id)
+            if version is not None:
+                versions = versions.filter(QuizVersion.version <= version)
+            base = (db.session.query(db.func.max(QuizVersion.version))
+                    .filter(QuizVersion.quiz_id == quiz.id, QuizVersion.snapshot.is_(True))
+                    .filter(QuizVersion.version <= version if version is not None else db.true())
+                    .scalar())
+            if base is None:
+                return None
+            versions = versions.filter(QuizVersion.version >= base).order_by(QuizVersion.version).all()
+            if version is not None and versions[-1].version != version:
+                return None
+            
+            positions = {}
+            for number, ordinal, question_hash in (
+                    db.session.query(QuizVersionQuestion.version, QuizVersionQuestion.ordinal,
+                                     QuizVersionQuestion.question_hash)
+                    .filter(QuizVersionQuestion.quiz_id == quiz.id,
+                            QuizVersionQuestion.version.between(base, versions[-1].version))):
+                positions.setdefault(number, []).append((ordinal, question_hash))
+            hashes = []
+            for row in versions:
+                del hashes[row.question_count:]
+                hashes.extend([None] * (row.question_count - len(hashes)))
+                for ordinal, question_hash in positions.get(row.version, ()):
+                    hashes[ordinal] = question_hash
+            
+            contents = {}
+            wanted = list({question_hash for question_hash in hashes if question_hash})
+            for start in range(0, len(wanted), CONTENT_LOOKUP_BATCH_SIZE):
+                chunk = wanted[start:start + CONTENT_LOOKUP_BATCH_SIZE]
+                contents.update((question_hash, (text, options)) for question_hash, text, options in
+                                db.session.query(QuestionContent.hash, QuestionContent.text,
+                                                 QuestionContent.options)
+                                .filter(QuestionContent.hash.in_(chunk)))
+            data = quiz_model.Quiz.from_json(versions[-1].header)
+            data.questions = questions_from_rows([contents[h] for h in hashes if h in contents])
+            return data
+        except Exception as e:
+            logger.error(f"Error reconstructing quiz version: {str(e)}")
+            return None
+    
+    @staticmethod
+    @timed_operation
+    def get_answer_key(quiz):
+        """
+        Get the correct option index of every question
+        
+        Args:
+            quiz (Quiz): Quiz row
+            
+        Returns:
+            list: Correct option index per question, -1 where none is known
+        """
+        try:
+            keys = answer_key_cache.get_many([quiz.id], QuizDatabase._load_answer_keys)
+            return list(keys.get(quiz.id, ()))
+        except Exception as e:
+            logger.error(f"Error retrieving answer key: {str(e)}")
+            return []
+    
+    @staticmethod
+    def _load_answer_keys(quiz_pks):
+        """Load the answer keys of several quizzes with one query per chunk of ids"""
+        keys = {}
+        for start in range(0, len(quiz_pks), CONTENT_LOOKUP_BATCH_SIZE):
+            chunk = quiz_pks[start:start + CONTENT_LOOKUP_BATCH_SIZE]
+            counts = (db.session.query(Quiz.id, Quiz.question_count)
+                      .filter(Quiz.id.in_(chunk))
+                      .all())
+            for quiz_pk, question_count in counts:
+                keys[quiz_pk] = [-1] * (question_count or 0)
+            rows = (db.session.query(QuizQuestionRef.quiz_id, QuizQuestionRef.ordinal, QuestionContent.correct_index)
+                    .join(QuestionContent, QuestionContent.hash == QuizQuestionRef.question_hash)
+                    .filter(QuizQuestionRef.quiz_id.in_(chunk))
+                    .all())
+            stored = set()
+            for quiz_pk, ordinal, correct_index in rows:
+                key = keys.setdefault(quiz_pk, [])
+                if ordinal >= len(key):
+                    key.extend([-1] * (ordinal + 1 - len(key)))
+                key[ordinal] = correct_index
+                stored.add(quiz_pk)
+            
+            # Quizzes saved before questions were stored as rows
+            for quiz_pk, question_count in counts:
+                if question_count and quiz_pk not in stored:
+                    quiz = Quiz.query.options(undefer_group('content')).get(quiz_pk)
+                    if quiz is not None and QuizDatabase._backfill_questions(quiz):
+                        keys.update(QuizDatabase._load_answer_keys([quiz_pk]))
+        return keys
+    
+    @staticmethod
+    def _load_question_range(quiz_pk, offset, limit):
+        # Plain column tuples; no ORM objects are built for the rows
+        rows = db.session.execute(question_range_select(quiz_pk, offset, limit)).all()
+        return questions_from_rows(rows)
+    
+    @staticmethod
+    def _backfill_questions(quiz):
+        if quiz.raw_data is None:
+            # Archived: restoring brings the question rows back
+            if QuizDatabase._restore_archived(quiz):
+                quiz_cache.invalidate(quiz.quiz_id)
+                return True
+            return False
+        try:
+            # Stored before the question store existed: raw_data has them all
+            data = quiz_model.Quiz.from_json(quiz.raw_data)
+            if not data.questions:
+                return False
+            logger.info(f"Storing {data.question_count} questions as rows for quiz {quiz.quiz_id}")
+            QuizDatabase.store_questions(quiz, data.questions)
+            db.session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error storing questions for quiz {quiz.quiz_id}: {str(e)}")
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    @timed_operation
+    def compress_stored_quizzes(batch_size=COMPRESS_BATCH_SIZE, pause=0.0):
+        """
+        Rewrite quizzes stored before compression in the compressed form
+        
+        Args:
+            batch_size (int): Quizzes rewritten per transaction
+            pause (float): Seconds to sleep between batches to limit load
+            
+        Returns:
+            int: Number of quizzes rewritten
+        """
+        table = Quiz.__table__
+        update = (table.update()
+                  .where(table.c.id == bindparam('quiz_pk'))
+                  .values(raw_data=bindparam('raw'), formatted_data=bindparam('formatted')))
+        count = 0
+        last_id = 0
+        try:
+            while True:
+                # Plain values long enough to compress, i.e. without the header
+                rows = db.session.execute(
+                    select(table.c.id, table.c.raw_data, table.c.formatted_data)
+                    .where(table.c.id > last_id)
+                    .where(db.or_(*[
+                        db.and_(db.func.length(column) >= MIN_COMPRESS_LENGTH,
+                                db.not_(column.startswith(HEADER_PREFIX)))
+                        for column in (table.c.raw_data, table.c.formatted_data)
+                    ]))
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                # The column type compresses the values on the way back in
+                db.session.execute(update, [
+                    {'quiz_pk': row[0], 'raw': row[1], 'formatted': row[2]} for row in rows
+                ])
+                db.session.commit()
+                count += len(rows)
+                last_id = rows[-1][0]
+                if pause:
+                    time.sleep(pause)
+            if count:
+                logger.info(f"Compressed {count} stored quizzes")
+        except Exception as e:
+            logger.error(f"Error compressing stored quizzes: {str(e)}")
+            db.session.rollback()
+        return count
+    
+    @staticmethod
+    @timed_operation
+    def start_compression_migration(app, batch_size=COMPRESS_BATCH_SIZE, pause=0.5):
+        """
+        Run compress_stored_quizzes in a background thread
+        
+        Args:
+            app (Flask): Application whose database is migrated
+            batch_size (int): Quizzes rewritten per transaction
+            pause (float): Seconds to sleep between batches
+            
+        Returns:
+            threading.Thread: The started thread
+        """
+        def run():
+            with app.app_context():
+                QuizDatabase.compress_stored_quizzes(batch_size, pause)
+                db.session.remove()
+        
+        thread = threading.Thread(target=run, name='compress-quizzes', daemon=True)
+        thread.start()
+        return thread
+    
+    @staticmethod
+    @timed_operation
+    def archive_cold_quizzes(days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, limit=None):
+        """
+        Move quizzes that have not been accessed for a while to the archive segments
+        
+        The content of each quiz (header, questions and any stored text
+        export) is appended to utils.segment_store.archive_store and its
+        location recorded in QuizArchiveEntry. The quiz row stays behind
+        as a stub with its metadata, counters and search entry, but its
+        content and question references are removed, which keeps the hot
+        tables and their indexes small. Questions no other quiz uses are
+        left for prune_question_content. Reading an archived quiz through
+        get_quiz_by_id or get_questions restores it.
+        
+        Args:
+            days (int): Minimum days since the last access
+            batch_size (int): Quizzes archived per segment write and transaction
+            limit (int, optional): Stop after this many quizzes
+            
+        Returns:
+            int: Number of quizzes archived
+        """
+        # Buffered accesses count, or a quiz in use could look cold
+        access_counter.flush()
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        archived = db.session.query(QuizArchiveEntry.quiz_id).filter(QuizArchiveEntry.quiz_id == Quiz.id)
+        count = 0
+        last = None
+        try:
+            while limit is None or count < limit:
+                size = batch_size if limit is None else min(batch_size, limit - count)
+                query = (Quiz.query
+                         .options(undefer_group('content'))
+                         .filter(Quiz.last_accessed < cutoff)
+                         .filter(~archived.exists()))
+                if last is not None:
+                    query = query.filter(db.tuple_(Quiz.last_accessed, Quiz.id) > last)
+                quizzes = query.order_by(Quiz.last_accessed, Quiz.id).limit(size).all()
+                if not quizzes:
+                    break
+                last = (quizzes[-1].last_accessed, quizzes[-1].id)
+                
+                # The records are durable before any stub points at them; a
+                # failed transaction only leaves unreferenced records behind
+                payloads = [json.dumps({
+                    'raw_data': quiz.raw_data,
+                    'formatted_data': quiz.formatted_data,
+                    'questions': [question.to_dict() for question in QuizDatabase.load_quiz_data(quiz).questions]
+                }, ensure_ascii=False, separators=(',', ':')).encode('utf-8') for quiz in quizzes]
+                locations = archive_store.append_many(payloads)
+                
+                now = datetime.utcnow()
+                quiz_pks = [quiz.id for quiz in quizzes]
+                db.session.bulk_insert_mappings(QuizArchiveEntry, [
+                    {'quiz_id': quiz.id, 'segment': segment, 'offset': offset, 'length': length,
+                     'archived_at': now}
+                    for quiz, (segment, offset, length) in zip(quizzes, locations)
+                ])
+                (QuizQuestionRef.query
+                 .filter(QuizQuestionRef.quiz_id.in_(quiz_pks))
+                 .delete(synchronize_session=False))
+                (Quiz.query
+                 .filter(Quiz.id.in_(quiz_pks))
+                 .update({'raw_data': None, 'formatted_data': None}, synchronize_session=False))
+                quiz_ids = [quiz.quiz_id for quiz in quizzes]
+                db.session.commit()
+                
+                for quiz_id, quiz_pk in zip(quiz_ids, quiz_pks):
+                    quiz_cache.invalidate(quiz_id)
+                    answer_key_cache.invalidate(quiz_pk)
+                count += len(quizzes)
+            if count:
+                logger.info(f"Archived {count} quizzes not accessed for {days} days")
+        except Exception as e:
+            logger.error(f"Error archiving quizzes: {str(e)}")
+            db.session.rollback()
+        return count
+    
+    @staticmethod
+    @timed_operation
+    def restore_quiz(quiz_id):
+        """
+        Move an archived quiz back into the database
+        
+        Args:
+            quiz_id (str): The quiz identifier
+            
+        Returns:
+            bool: True if the quiz was archived and has been restored
+        """
+        quiz = QuizDatabase._get_quiz_row(quiz_id, content=True)
+        if quiz is None or quiz.raw_data is not None or not QuizDatabase._restore_archived(quiz):
+            return False
+        quiz_cache.invalidate(quiz_id)
+        return True
+    
+    @staticmethod
+    def _read_archived(quiz_pk):
+        # (quiz data, stored text export, archive entry) or None if not archived
+        entry = db.session.get(QuizArchiveEntry, quiz_pk)
+        if entry is None:
+            return None
+        payload = json.loads(archive_store.read(entry.segment, entry.offset, entry.length))
+        data = quiz_model.Quiz.from_json(payload['raw_data'])
+        data.questions = quiz_model.Quiz.from_dict({'questions': payload['questions']}).questions
+        return data, payload, entry
+    
+    @staticmethod
+    def _restore_archived(quiz):
+        # Works on rows and snapshots: only the ids are used
+        try:
+            archived = QuizDatabase._read_archived(quiz.id)
+            if archived is None:
+                return False
+            data, payload, entry = archived
+            QuizDatabase.store_questions(quiz, data.questions)
+            (Quiz.query
+             .filter(Quiz.id == quiz.id)
+             .update({'raw_data': payload['raw_data'], 'formatted_data': payload['formatted_data']},
+                     synchronize_session=False))
+            db.session.delete(entry)
+            db.session.commit()
+            answer_key_cache.invalidate(quiz.id)
+            logger.info(f"Restored archived quiz {quiz.quiz_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error restoring archived quiz {quiz.quiz_id}: {str(e)}")
+            db.session.rollback()
+            return False
+    
+    @staticmethod
+    @timed_operation
+    def start_archiver(app, days=ARCHIVE_AFTER_DAYS, interval=ARCHIVE_INTERVAL):
+        """
+        Run archive_cold_quizzes periodically in a background thread
+        
+        Args:
+            app (Flask): Application whose database is archived
+            days (int): Minimum days since the last access
+            interval (float): Seconds between runs
+            
+        Returns:
+            threading.Thread: The started thread
+        """
+        def run():
+            while True:
+                with app.app_context():
+                    QuizDatabase.archive_cold_quizzes(days)
+                    db.session.remove()
+                time.sleep(interval)
+        
+        thread = threading.Thread(target=run, name='archive-quizzes', daemon=True)
+        thread.start()
+        return thread
+    
+    @staticmethod
+    @timed_operation
+    def get_dedupe_report(top=5):
+        """
+        Measure how much the content-addressed question store saves
+        
+        Args:
+            top (int): Number of most shared questions to list
+            
+        Returns:
+            dict: Reference and unique question counts, referenced vs stored
+                bytes, orphaned questions and the most shared questions
+        """
+        try:
+            content_size = db.func.length(QuestionContent.text) + db.func.length(QuestionContent.options)
+            references = db.session.query(db.func.count()).select_from(QuizQuestionRef).scalar() or 0
+            referenced_bytes = (db.session.query(db.func.coalesce(db.func.sum(content_size), 0))
+                                .select_from(QuizQuestionRef)
+                                .join(QuestionContent, QuestionContent.hash == QuizQuestionRef.question_hash)
+                                .scalar())
+            unique_questions, stored_bytes = db.session.query(
+                db.func.count(QuestionContent.hash), db.func.coalesce(db.func.sum(content_size), 0)
+            ).one()
+            referenced = db.union(select(QuizQuestionRef.question_hash),
+                                  select(QuizVersionQuestion.question_hash)).subquery()
+            orphaned = (db.session.query(db.func.count(QuestionContent.hash))
+                        .filter(QuestionContent.hash.notin_(db.session.query(referenced.c.question_hash)))
+                        .scalar())
+            shared = (db.session.query(QuizQuestionRef.question_hash, db.func.count().label('uses'),
+                                       QuestionContent.text)
+                      .join(QuestionContent, QuestionContent.hash == QuizQuestionRef.question_hash)
+                      .group_by(QuizQuestionRef.question_hash, QuestionContent.text)
+                      .order_by(db.desc('uses'))
+                      .limit(top)
+                      .all())
+            return {
+                'question_references': references,
+                'unique_questions': unique_questions,
+                'referenced_bytes': int(referenced_bytes),
+                'stored_bytes': int(stored_bytes),
+                'saved_bytes': int(referenced_bytes) - int(stored_bytes),
+                'dedupe_ratio': round(referenced_bytes / stored_bytes, 2) if stored_bytes else 0.0,
+                'orphaned_questions': orphaned,
+                'most_shared': [{'hash': h, 'uses': uses, 'text': text} for h, uses, text in shared]
+            }
+        except Exception as e:
+            logger.error(f"Error building dedupe report: {str(e)}")
+            db.session.rollback()
+            return None
+    
+    @staticmethod
+    @timed_operation
+    def prune_question_content():
+        """
+        Delete stored questions that no quiz or quiz version references
+        
+        Run it while no imports are in progress: a save that found a
+        question already stored does not write it again.
+        
+        Returns:
+            int: Number of questions deleted
+        """
+        try:
+            # Questions of earlier versions are kept for get_quiz_version
+            referenced = db.union(select(QuizQuestionRef.question_hash),
+                                  select(QuizVersionQuestion.question_hash)).subquery()
+            deleted = (QuestionContent.query
+                       .filter(QuestionContent.hash.notin_(select(referenced.c.question_hash)))
+                       .delete(synchronize_session=False))
+            db.session.commit()
+            return deleted
+        except Exception as e:
+            logger.error(f"Error pruning question store: {str(e)}")
+            db.session.rollback()
+            return 0
+    
+    @staticmethod
+    @timed_operation
+    def migrate_legacy_questions(batch_size=LEGACY_MIGRATION_BATCH_SIZE):
+        """
+        Move questions from the quiz_question/quiz_option tables into the question store
+        
+        Quizzes that already have question references (saved again since)
+        keep them. The old tables are dropped once every quiz is moved; a
+        failed run keeps them and can be repeated.
+        
+        Args:
+            batch_size (int): Quizzes moved per transaction
+            
+        Returns:
+            int: Number of quizzes moved, or None if the migration fails
+        """
+        if not inspect(db.engine).has_table(LEGACY_QUESTIONS.name):
+            return 0
+        moved = 0
+        try:
+            pending = [quiz_pk for (quiz_pk,) in db.session.execute(
+                select(LEGACY_QUESTIONS.c.quiz_id).distinct()
+                .where(LEGACY_QUESTIONS.c.quiz_id.notin_(select(QuizQuestionRef.quiz_id)))
+                .order_by(LEGACY_QUESTIONS.c.quiz_id)
+            )]
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                questions = {}
+                for quiz_pk, ordinal, text in db.session.execute(
+                        select(LEGACY_QUESTIONS.c.quiz_id, LEGACY_QUESTIONS.c.ordinal, LEGACY_QUESTIONS.c.text)
+                        .where(LEGACY_QUESTIONS.c.quiz_id.in_(chunk))
+                        .order_by(LEGACY_QUESTIONS.c.quiz_id, LEGACY_QUESTIONS.c.ordinal)):
+                    questions.setdefault(quiz_pk, {})[ordinal] = quiz_model.Question(text)
+                if inspect(db.engine).has_table(LEGACY_OPTIONS.name):
+                    for quiz_pk, question_ordinal, text, correct in db.session.execute(
+                            select(LEGACY_OPTIONS.c.quiz_id, LEGACY_OPTIONS.c.question_ordinal,
+                                   LEGACY_OPTIONS.c.text, LEGACY_OPTIONS.c.correct)
+                            .where(LEGACY_OPTIONS.c.quiz_id.in_(chunk))
+                            .order_by(LEGACY_OPTIONS.c.quiz_id, LEGACY_OPTIONS.c.question_ordinal,
+                                      LEGACY_OPTIONS.c.ordinal)):
+                        question = questions.get(quiz_pk, {}).get(question_ordinal)
+                        if question is not None:
+                            question.options.append(quiz_model.Option(text, bool(correct)))
+                QuizDatabase._store_question_rows([
+                    (quiz_pk, [by_ordinal[ordinal] for ordinal in sorted(by_ordinal)])
+                    for quiz_pk, by_ordinal in questions.items()
+                ])
+                db.session.commit()
+                moved += len(questions)
+                logger.info(f"Moved the questions of {moved} of {len(pending)} quizzes to the question store")
+        except Exception as e:
+            logger.error(f"Error moving questions to the question store: {str(e)}")
+            db.session.rollback()
+            return None
+        
+        for legacy in (LEGACY_OPTIONS, LEGACY_QUESTIONS):
+            db.Table(legacy.name, db.MetaData()).drop(db.engine, checkfirst=True)
+        logger.info(f"Dropped the {LEGACY_OPTIONS.name} and {LEGACY_QUESTIONS.name} tables")
+        return moved
+    
+    @staticmethod
+    @timed_operation
     def get_recent_quizzes(limit=10):
         """
         Get a list of recently accessed quizzes
@@ -81,12 +1346,13 @@ class QuizDatabase:
             list: List of Quiz objects
         """
         try:
-            return Quiz.query.order_by(Quiz.last_accessed.desc()).limit(limit).all()
+            return Quiz.query.order_by(Quiz.last_accessed.desc(), Quiz.id.desc()).limit(limit).all()
         except Exception as e:
             logger.error(f"Error retrieving recent quizzes: {str(e)}")
             return []
     
     @staticmethod
+    @timed_operation
     def get_popular_quizzes(limit=10):
         """
         Get a list of most popular quizzes by access count
@@ -98,12 +1364,83 @@ class QuizDatabase:
             list: List of Quiz objects
         """
         try:
-            return Quiz.query.order_by(Quiz.access_count.desc()).limit(limit).all()
+            return Quiz.query.order_by(Quiz.access_count.desc(), Quiz.id.desc()).limit(limit).all()
         except Exception as e:
             logger.error(f"Error retrieving popular quizzes: {str(e)}")
             return []
     
     @staticmethod
+    @timed_operation
+    def list_quizzes(order='recent', cursor=None, limit=20, fields=None):
+        """
+        Page through all quizzes with keyset pagination
+        
+        Each page continues from the sort value and id of the previous
+        page's last quiz, so any page costs one index range scan no matter
+        how deep it is. Quizzes whose sort column is NULL are listed after
+        all the others, by id.
+        
+        Args:
+            order (str): 'recent', 'popular' or 'created'
+            cursor (str, optional): next_cursor of the previous page
+            limit (int): Quizzes per page (at most MAX_LISTING_LIMIT)
+            fields (iterable, optional): Columns to return, from LISTING_FIELDS
+            
+        Returns:
+            dict: 'items' (list of dicts with the requested fields) and
+                'next_cursor' (None on the last page), or None if the query fails
+            
+        Raises:
+            ValueError: If the order, a field or the cursor is invalid
+        """
+        if order not in LISTING_ORDERS:
+            raise ValueError(f"Unknown order: {order}")
+        fields = tuple(fields) if fields else DEFAULT_LISTING_FIELDS
+        unknown = [field for field in fields if field not in LISTING_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        limit = min(max(int(limit), 1), MAX_LISTING_LIMIT)
+        sort_column = LISTING_ORDERS[order]
+        
+        try:
+            query = db.session.query(Quiz.id, sort_column.label('sort_value'),
+                                     *(getattr(Quiz, field) for field in fields))
+            value, last_id = decode_cursor(cursor, order) if cursor else (None, None)
+            rows = []
+            if not cursor or value is not None:
+                ranked = query.filter(sort_column.isnot(None))
+                if cursor:
+                    ranked = ranked.filter(db.tuple_(sort_column, Quiz.id) < db.tuple_(value, last_id))
+                rows = ranked.order_by(sort_column.desc(), Quiz.id.desc()).limit(limit + 1).all()
+            if len(rows) <= limit:
+                # Quizzes without a sort value come last, newest first; a
+                # row-value comparison against NULL would never match them
+                unranked = query.filter(sort_column.is_(None))
+                if cursor and value is None:
+                    unranked = unranked.filter(Quiz.id < last_id)
+                rows += unranked.order_by(Quiz.id.desc()).limit(limit + 1 - len(rows)).all()
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error listing quizzes: {str(e)}")
+            db.session.rollback()
+            return None
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(order, rows[-1].sort_value, rows[-1].id)
+        items = []
+        for row in rows:
+            item = {}
+            for field in fields:
+                value = getattr(row, field)
+                item[field] = value.isoformat() if isinstance(value, datetime) else value
+            items.append(item)
+        return {'items': items, 'next_cursor': next_cursor}
+    
+    @staticmethod
+    @timed_operation
     def search_quizzes(query, limit=10):
         """
         Search for quizzes by title or content
@@ -113,22 +1450,60 @@ class QuizDatabase:
             limit (int): Maximum number of quizzes to return
             
         Returns:
-            list: List of Quiz objects matching the search
+            list: List of Quiz objects matching the search, best match first
+        """
+        return [result['quiz'] for result in QuizDatabase.search_quizzes_ranked(query, limit)]
+    
+    @staticmethod
+    @timed_operation
+    def search_quizzes_ranked(query, limit=10):
+        """
+        Search for quizzes using the full-text index
+        
+        Falls back to a substring scan when no full-text index is available.
+        
+        Args:
+            query (str): Search query
+            limit (int): Maximum number of quizzes to return
+            
+        Returns:
+            list: Dicts with 'quiz' (Quiz), 'rank' (float) and 'snippet' (str), best match first
         """
         try:
+            hits = QuizSearchIndex.search(query, limit)
+            if hits is not None:
+                quizzes = {q.id: q for q in Quiz.query.filter(Quiz.id.in_([h[0] for h in hits])).all()} if hits else {}
+                results = []
+                for quiz_pk, rank, snippet in hits:
+                    quiz = quizzes.get(quiz_pk)
+                    if quiz is None:
+                        continue
+                    if snippet is None:
+                        snippet = make_snippet(QuizDatabase.get_formatted_text(quiz), query)
+                    results.append({'quiz': quiz, 'rank': rank, 'snippet': snippet})
+                return results
+        except Exception as e:
+            logger.error(f"Error in full-text search, falling back to substring search: {str(e)}")
+            db.session.rollback()
+        
+        try:
+            # Compressed content only matches the title here
             search_pattern = f"%{query}%"
-            return Quiz.query.filter(
+            quizzes = Quiz.query.filter(
                 db.or_(
                     Quiz.title.ilike(search_pattern),
                     Quiz.raw_data.ilike(search_pattern),
                     Quiz.formatted_data.ilike(search_pattern)
                 )
             ).limit(limit).all()
+            return [{'quiz': quiz, 'rank': 0.0, 'snippet': make_snippet(QuizDatabase.get_formatted_text(quiz), query)}
+                    for quiz in quizzes]
         except Exception as e:
             logger.error(f"Error searching quizzes: {str(e)}")
             return []
     
     @staticmethod
+    @timed_operation
     def delete_quiz(quiz_id):
         """
         Delete a quiz from the database
@@ -140,10 +1515,21 @@ class QuizDatabase:
             bool: True if deletion was successful, False otherwise
         """
         try:
-            quiz = QuizDatabase.get_quiz_by_id(quiz_id)
+            quiz = QuizDatabase._get_quiz_row(quiz_id)
             if quiz:
+                QuizSearchIndex.remove_quiz(quiz)
+                QuizQuestionRef.query.filter_by(quiz_id=quiz.id).delete(synchronize_session=False)
+                QuizStats.query.filter_by(quiz_id=quiz.id).delete(synchronize_session=False)
+                QuizArchiveEntry.query.filter_by(quiz_id=quiz.id).delete(synchronize_session=False)
+                QuizVersionQuestion.query.filter_by(quiz_id=quiz.id).delete(synchronize_session=False)
+                QuizVersion.query.filter_by(quiz_id=quiz.id).delete(synchronize_session=False)
+                QuizFreshness.query.filter_by(quiz_id=quiz.id).delete(synchronize_session=False)
                 db.session.delete(quiz)
                 db.session.commit()
+                quiz_cache.invalidate(quiz_id)
+                answer_key_cache.invalidate(quiz.id)
+                leaderboard.invalidate(quiz.id)
+                top_quizzes.on_deleted(quiz)
                 return True
             return False
         except Exception as e:
@@ -152,6 +1538,7 @@ class QuizDatabase:
             return False
     
     @staticmethod
+    @timed_operation
     def create_quiz_attempt(quiz_id, user_id=None):
         """
         Create a new quiz attempt
@@ -177,6 +1564,9 @@ class QuizDatabase:
             )
             
             db.session.add(attempt)
+            stats = QuizDatabase._lock_quiz_stats(quiz.id)
+            stats.attempts += 1
+            stats.updated_at = datetime.utcnow()
             db.session.commit()
             return attempt
             
@@ -186,6 +1576,7 @@ class QuizDatabase:
             return None
     
     @staticmethod
+    @timed_operation
     def update_quiz_attempt(attempt_id, score=None, completed=None):
         """
         Update a quiz attempt
@@ -199,10 +1590,12 @@ class QuizDatabase:
             QuizAttempt: Updated attempt or None if update fails
         """
         try:
-            attempt = QuizAttempt.query.get(attempt_id)
+            attempt = QuizAttempt.query.filter_by(id=attempt_id).with_for_update().first()
             if not attempt:
                 return None
             
+            was_completed, old_score = bool(attempt.completed), attempt.score or 0
+            
             if score is not None:
                 attempt.score = score
             
@@ -211,10 +1604,275 @@ class QuizDatabase:
                 if completed:
                     attempt.completed_at = datetime.utcnow()
             
+            # Only completed attempts count towards the score totals
+            if (was_completed, old_score) != (bool(attempt.completed), attempt.score or 0):
+                stats = QuizDatabase._lock_quiz_stats(attempt.quiz_id)
+                if was_completed:
+                    stats.add_score(old_score, attempt.max_score, sign=-1)
+                if attempt.completed:
+                    stats.add_score(attempt.score, attempt.max_score)
+            
             db.session.commit()
+            if attempt.completed:
+                leaderboard.on_completed(attempt.quiz_id, attempt.id, attempt.user_id, attempt.score,
+                                         attempt.max_score, attempt.completed_at)
+            elif was_completed:
+                leaderboard.on_removed(attempt.quiz_id, attempt.id)
             return attempt
             
         except Exception as e:
             logger.error(f"Error updating quiz attempt: {str(e)}")
             db.session.rollback()
-            return None
\ No newline at end of file
+            return None
+    
+    @staticmethod
+    @timed_operation
+    def record_attempts(submissions, batch_size=ATTEMPT_BATCH_SIZE):
+        """
+        Score and store many completed attempts, one transaction per batch
+        
+        Quiz identifiers are resolved with one query per batch, answers are
+        scored against cached answer keys and the attempts are inserted
+        with a single executemany; the running statistics of each quiz in
+        the batch are updated once.
+        
+        Args:
+            submissions (iterable): Dicts with 'quiz_id', 'answers' (chosen
+                option index per question, None if unanswered) and optionally
+                'user_id', 'started_at' and 'completed_at'
+            batch_size (int): Attempts written per transaction
+            
+        Returns:
+            list: (score, max_score) per submission in input order, None for
+                submissions that could not be stored
+        """
+        results = []
+        batch = []
+        for submission in submissions:
+            batch.append(submission)
+            if len(batch) >= batch_size:
+                results.extend(QuizDatabase._record_attempt_batch(batch))
+                batch = []
+        if batch:
+            results.extend(QuizDatabase._record_attempt_batch(batch))
+        return results
+    
+    @staticmethod
+    def _record_attempt_batch(batch):
+        try:
+            quiz_ids = {submission['quiz_id'] for submission in batch}
+            quiz_pks = dict(db.session.query(Quiz.quiz_id, Quiz.id).filter(Quiz.quiz_id.in_(quiz_ids)).all())
+            keys = answer_key_cache.get_many(quiz_pks.values(), QuizDatabase._load_answer_keys)
+            
+            now = datetime.utcnow()
+            rows = []
+            results = []
+            scores = {}
+            for submission in batch:
+                quiz_pk = quiz_pks.get(submission['quiz_id'])
+                if quiz_pk is None:
+                    results.append(None)
+                    continue
+                key = keys.get(quiz_pk, ())
+                answers = submission.get('answers') or ()
+                score = sum(1 for answer, correct in zip(answers, key) if correct >= 0 and answer == correct)
+                completed_at = submission.get('completed_at') or now
+                rows.append({
+                    'quiz_id': quiz_pk,
+                    'user_id': submission.get('user_id'),
+                    'score': score,
+                    'max_score': len(key),
+                    'completed': True,
+                    'started_at': submission.get('started_at') or completed_at,
+                    'completed_at': completed_at
+                })
+                results.append((score, len(key)))
+                scores.setdefault(quiz_pk, []).append(score)
+            
+            ranked = {quiz_pk for quiz_pk in scores if leaderboard.is_loaded(quiz_pk)}
+            inserted = None
+            if rows:
+                table = QuizAttempt.__table__
+                if ranked and db.engine.dialect.full_returning:
+                    # The new ids come back with the insert, so loaded boards are updated in place
+                    inserted = db.session.execute(
+                        table.insert().values(rows).returning(table.c.quiz_id, table.c.id, table.c.user_id,
+                                                              table.c.score, table.c.max_score,
+                                                              table.c.completed_at)
+                    ).all()
+                else:
+                    db.session.execute(table.insert(), rows)
+                # Lock the statistics rows in a fixed order so batches cannot deadlock
+                for quiz_pk in sorted(scores):
+                    stats = QuizDatabase._lock_quiz_stats(quiz_pk)
+                    stats.attempts += len(scores[quiz_pk])
+                    stats.add_scores(scores[quiz_pk], len(keys.get(quiz_pk, ())))
+            db.session.commit()
+            if inserted is not None:
+                for row in inserted:
+                    if row.quiz_id in ranked:
+                        leaderboard.on_completed(*row)
+            else:
+                # No RETURNING on this dialect: the new ids are unknown, so
+                # the boards are reloaded when next read
+                for quiz_pk in ranked:
+                    leaderboard.invalidate(quiz_pk)
+            
+            skipped = results.count(None)
+            if skipped:
+                logger.warning(f"Skipped {skipped} attempts for unknown quizzes")
+            return results
+        except Exception as e:
+            logger.error(f"Error recording batch of {len(batch)} attempts: {str(e)}")
+            db.session.rollback()
+            return [None] * len(batch)
+    
+    @staticmethod
+    def _lock_quiz_stats(quiz_pk):
+        """Return the QuizStats row of a quiz, created if missing and locked until commit"""
+        insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+        if insert is not None:
+            db.session.execute(
+                insert(QuizStats.__table__)
+                .values(quiz_id=quiz_pk, attempts=0, completed=0, score_sum=0, score_sumsq=0, histogram='[]')
+                .on_conflict_do_nothing(index_elements=['quiz_id'])
+            )
+        stats = (QuizStats.query.filter_by(quiz_id=quiz_pk)
+                 .with_for_update().populate_existing().first())
+        if stats is None:
+            stats = QuizStats(quiz_id=quiz_pk, attempts=0, completed=0, score_sum=0, score_sumsq=0, histogram='[]')
+            db.session.add(stats)
+        return stats
+    
+    @staticmethod
+    @timed_operation
+    def get_quiz_stats(quiz):
+        """
+        Get attempt statistics of a quiz from its running totals
+        
+        Args:
+            quiz (Quiz): Quiz row or cached snapshot
+            
+        Returns:
+            dict: Attempts, completion rate, score mean/stddev/min/max and
+                histogram, or None if they cannot be read
+        """
+        try:
+            stats = QuizStats.query.get(quiz.id) or QuizStats(quiz_id=quiz.id)
+            return stats.to_dict()
+        except Exception as e:
+            logger.error(f"Error getting quiz stats: {str(e)}")
+            db.session.rollback()
+            return None
+    
+    @staticmethod
+    @timed_operation
+    def rebuild_quiz_stats(quiz_id=None, batch_size=STATS_REBUILD_BATCH_SIZE):
+        """
+        Recompute the running totals from the stored attempts
+        
+        Corrects drift from failed writes or attempts changed outside
+        QuizDatabase, and narrows min/max after scores were removed.
+        
+        Args:
+            quiz_id (str, optional): Only rebuild this quiz (default: all quizzes)
+            batch_size (int): Attempts read per round trip
+            
+        Returns:
+            int: Number of quizzes with statistics, or None if the rebuild fails
+        """
+        try:
+            query = db.session.query(QuizAttempt.quiz_id, QuizAttempt.score,
+                                     QuizAttempt.max_score, QuizAttempt.completed)
+            stats_query = QuizStats.query
+            if quiz_id is not None:
+                quiz = QuizDatabase._get_quiz_row(quiz_id)
+                if not quiz:
+                    return None
+                query = query.filter(QuizAttempt.quiz_id == quiz.id)
+                stats_query = stats_query.filter(QuizStats.quiz_id == quiz.id)
+            
+            totals = {}
+            for quiz_pk, score, max_score, completed in query.yield_per(batch_size):
+                stats = totals.get(quiz_pk)
+                if stats is None:
+                    stats = totals[quiz_pk] = {
+                        'quiz_id': quiz_pk, 'attempts': 0, 'completed': 0, 'score_sum': 0,
+                        'score_sumsq': 0, 'score_min': None, 'score_max': None,
+                        'histogram': [0] * QuizStats.HISTOGRAM_BUCKETS
+                    }
+                stats['attempts'] += 1
+                if not completed:
+                    continue
+                score = score or 0
+                stats['completed'] += 1
+                stats['score_sum'] += score
+                stats['score_sumsq'] += score * score
+                stats['score_min'] = score if stats['score_min'] is None else min(stats['score_min'], score)
+                stats['score_max'] = score if stats['score_max'] is None else max(stats['score_max'], score)
+                stats['histogram'][QuizStats.bucket(score, max_score)] += 1
+            
+            now = datetime.utcnow()
+            for stats in totals.values():
+                stats['histogram'] = json.dumps(stats['histogram'])
+                stats['updated_at'] = now
+            
+            stats_query.delete(synchronize_session=False)
+            if totals:
+                db.session.bulk_insert_mappings(QuizStats, list(totals.values()))
+            db.session.commit()
+            logger.info(f"Rebuilt attempt statistics of {len(totals)} quizzes")
+            return len(totals)
+        except Exception as e:
+            logger.error(f"Error rebuilding quiz stats: {str(e)}")
+            db.session.rollback()
+            return None
+
+def question_range_select(quiz_pk, offset=0, limit=None):
+    """SELECT of the (text, options) of a range of a quiz's stored questions, in order"""
+    filters = [QuizQuestionRef.quiz_id == quiz_pk, QuizQuestionRef.ordinal >= offset]
+    if limit is not None:
+        filters.append(QuizQuestionRef.ordinal < offset + limit)
+    return (select(QuestionContent.text, QuestionContent.options)
+            .select_from(QuizQuestionRef)
+            .join(QuestionContent, QuestionContent.hash == QuizQuestionRef.question_hash)
+            .where(*filters)
+            .order_by(QuizQuestionRef.ordinal))
+
+def questions_from_rows(rows):
+    """Build utils.quiz_model.Question objects from question_range_select rows"""
+    return [
+        quiz_model.Question(text, [quiz_model.Option(option_text, bool(correct))
+                                   for option_text, correct in json.loads(options)])
+        for text, options in rows
+    ]
+
+def encode_cursor(order, value, last_id):
+    """Opaque cursor for the page after the quiz with this sort value and id"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([order, value, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, order):
+    """
+    Unpack a cursor made by encode_cursor
+    
+    Returns:
+        tuple: (sort value, quiz row id); the sort value is None once the
+            listing has reached the quizzes without one
+        
+    Raises:
+        ValueError: If the cursor is malformed or was made for another order
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_order, value, last_id = json.loads(data)
+        if value is not None and LISTING_ORDERS[cursor_order].type.python_type is datetime:
+            value = datetime.fromisoformat(value)
+        last_id = int(last_id)
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if cursor_order != order:
+        raise ValueError("Cursor belongs to a different order")
+    return value, last_id
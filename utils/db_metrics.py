@@ -0,0 +1,262 @@
+import os
+import time
+import logging
+import inspect
+import functools
+import threading
+import contextvars
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are written to the slow-query log
+SLOW_QUERY_SECONDS = float(os.environ.get("DB_SLOW_QUERY_MS", "200")) / 1000
+
+# Longest statement text written to the slow-query log
+SLOW_QUERY_MAX_CHARS = 1000
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label of statements run outside a timed QuizDatabase operation
+NO_OPERATION = 'other'
+
+_operation = contextvars.ContextVar('db_operation', default=NO_OPERATION)
+
+slow_query_logger = logging.getLogger(__name__ + '.slow')
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus layout"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+def statement_kind(statement):
+    """First keyword of a statement (SELECT, INSERT, ...), for labelling"""
+    words = statement.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ''
+    return kind if kind in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH') else 'OTHER'
+
+class DatabaseMetrics:
+    """
+    Statement latency, pool usage and slow queries of a SQLAlchemy engine
+
+    Statements are labelled with the QuizDatabase operation that issued
+    them (see timed_operation), and their kind. Pool checkout wait is the
+    time spent in pool.connect(), i.e. waiting for a free connection or
+    opening a new one.
+    """
+
+    def __init__(self, slow_query_seconds=SLOW_QUERY_SECONDS):
+        self.slow_query_seconds = slow_query_seconds
+        self.lock = threading.Lock()
+        self.statements = {}
+        self.operations = {}
+        self.errors = {}
+        self.checkout_wait = Histogram()
+        self.checked_out = 0
+        self.connections_opened = 0
+        self.slow_queries = 0
+        self.engine = None
+
+    def install(self, engine):
+        """Attach the event hooks to an engine (once)"""
+        if self.engine is engine:
+            return
+        self.engine = engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+        event.listen(engine, 'engine_disposed', lambda *args: self._wrap_pool(engine.pool))
+        self._wrap_pool(engine.pool)
+
+    def _wrap_pool(self, pool):
+        # dispose() replaces the pool, so the new one is wrapped again
+        if getattr(pool, '_metrics_wrapped', False):
+            return
+        connect = pool.connect
+
+        @functools.wraps(connect)
+        def timed_connect(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return connect(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.checkout_wait.observe(time.perf_counter() - started)
+
+        pool.connect = timed_connect
+        pool._metrics_wrapped = True
+        event.listen(pool, 'connect', self._on_connect)
+        event.listen(pool, 'checkout', self._on_checkout)
+        event.listen(pool, 'checkin', self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.connections_opened += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.lock:
+            self.checked_out += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        operation = _operation.get()
+        labels = (operation, statement_kind(statement))
+        with self.lock:
+            histogram = self.statements.get(labels)
+            if histogram is None:
+                histogram = self.statements[labels] = Histogram()
+            histogram.observe(elapsed)
+            if elapsed >= self.slow_query_seconds:
+                self.slow_queries += 1
+        if elapsed >= self.slow_query_seconds:
+            text = ' '.join(statement.split())
+            if len(text) > SLOW_QUERY_MAX_CHARS:
+                text = text[:SLOW_QUERY_MAX_CHARS] + '...'
+            rows = f", {len(parameters)} parameter sets" if executemany else ""
+            slow_query_logger.warning(f"Slow query in {operation}: {elapsed * 1000:.1f} ms{rows}: {text}")
+
+    def _handle_error(self, context):
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+        operation = _operation.get()
+        with self.lock:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def observe_operation(self, operation, seconds):
+        with self.lock:
+            histogram = self.operations.get(operation)
+            if histogram is None:
+                histogram = self.operations[operation] = Histogram()
+            histogram.observe(seconds)
+
+    def pool_status(self):
+        """Connections in use and pool capacity (where the pool type reports it)"""
+        pool = self.engine.pool if self.engine is not None else None
+        status = {'checked_out': self.checked_out, 'connections_opened': self.connections_opened}
+        for name in ('size', 'overflow', 'checkedin'):
+            method = getattr(pool, name, None)
+            if callable(method):
+                try:
+                    status[name] = method()
+                except Exception:
+                    pass
+        return status
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format
+
+        Returns:
+            str: The metrics page
+        """
+        lines = []
+        with self.lock:
+            self._render_histograms(lines, 'quizdb_statement_seconds',
+                                    'Latency of SQL statements by QuizDatabase operation',
+                                    {('operation', 'kind'): self.statements})
+            self._render_histograms(lines, 'quizdb_operation_seconds',
+                                    'Latency of QuizDatabase operations',
+                                    {('operation',): {(k,): v for k, v in self.operations.items()}})
+            self._render_histograms(lines, 'quizdb_pool_checkout_wait_seconds',
+                                    'Time spent getting a connection from the pool',
+                                    {(): {(): self.checkout_wait}})
+            lines.append('# HELP quizdb_statement_errors_total Failed SQL statements by operation')
+            lines.append('# TYPE quizdb_statement_errors_total counter')
+            for operation, count in sorted(self.errors.items()):
+                lines.append(f'quizdb_statement_errors_total{{operation="{operation}"}} {count}')
+            lines.append('# HELP quizdb_slow_queries_total Statements slower than the slow-query threshold')
+            lines.append('# TYPE quizdb_slow_queries_total counter')
+            lines.append(f'quizdb_slow_queries_total {self.slow_queries}')
+        for name, value in self.pool_status().items():
+            lines.append(f'# TYPE quizdb_pool_{name} gauge')
+            lines.append(f'quizdb_pool_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, name, help_text, series):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for label_names, histograms in series.items():
+            for label_values, histogram in sorted(histograms.items()):
+                labels = ','.join(f'{k}="{v}"' for k, v in zip(label_names, label_values))
+                separator = ',' if labels else ''
+                for bound, count in histogram.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {count}')
+                suffix = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}_sum{suffix} {histogram.total:.6f}')
+                lines.append(f'{name}_count{suffix} {histogram.count}')
+
+# Shared metrics, installed on the app's engine at startup
+db_metrics = DatabaseMetrics()
+
+def timed_operation(fn):
+    """
+    Label the statements a function issues with its name and time the call
+
+    Nested operations are labelled with the innermost one.
+    """
+    name = fn.__name__
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            # The label is only set while the generator body runs
+            started = time.perf_counter()
+            try:
+                iterator = fn(*args, **kwargs)
+                while True:
+                    token = _operation.set(name)
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        _operation.reset(token)
+                    yield item
+            finally:
+                db_metrics.observe_operation(name, time.perf_counter() - started)
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _operation.set(name)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db_metrics.observe_operation(name, time.perf_counter() - started)
+            _operation.reset(token)
+    return wrapper
@@ -0,0 +1,290 @@
+import asyncio
+import random
+import logging
+import itertools
+from collections import deque
+
+try:
+    from telethon.errors import FloodWaitError
+except ImportError:
+    # Telethon is not needed to run the fake bot offline
+    class FloodWaitError(Exception):
+        def __init__(self, request=None, capture=0):
+            self.request = request
+            self.seconds = capture
+            super().__init__(f"A wait of {capture} seconds is required")
+
+logger = logging.getLogger(__name__)
+
+QUIZ_BOT_USERNAME = "QuizBot"
+
+class FakeButton:
+    """Inline keyboard button attached to a fake QuizBot message"""
+
+    def __init__(self, text, data=None):
+        self.text = text
+        self.data = data
+
+    def __repr__(self):
+        return f"<FakeButton {self.text!r}>"
+
+class FakeMessage:
+    """Subset of telethon's Message used by the extraction code"""
+
+    def __init__(self, msg_id, text, buttons=None, entities=None, chat=None, kind=None):
+        self.id = msg_id
+        self.text = text
+        self.message = text
+        self.raw_text = text
+        self.buttons = buttons
+        self.entities = entities or []
+        self.media = None
+        self.out = False
+        self.kind = kind
+        self._chat = chat
+
+    async def click(self, i=0):
+        """Press the i-th inline button (row-major order)"""
+        if self._chat is None:
+            return None
+        return await self._chat.click(self, i)
+
+    def __repr__(self):
+        return f"<FakeMessage {self.id} {self.text[:30]!r}>"
+
+class FakeQuizBot:
+    """
+    Deterministic stand-in for @QuizBot
+
+    Quizzes are generated from the start parameter, so the same parameter
+    always yields the same quiz. Timing and failure behaviour is configurable
+    so the extraction engines can be load-tested without a Telegram account.
+    """
+
+    def __init__(self, question_count=10, option_count=4, delay=0.0, jitter=0.0,
+                 flood_wait_rate=0.0, flood_wait_seconds=1, flood_sleep_threshold=60, seed=None):
+        """
+        Args:
+            question_count (int): Number of questions per quiz
+            option_count (int): Number of options per question
+            delay (float): Base response delay in seconds
+            jitter (float): Maximum extra random delay in seconds
+            flood_wait_rate (float): Probability (0-1) that a call raises FloodWaitError
+            flood_wait_seconds (float): Wait time reported by injected FloodWaitErrors
+            flood_sleep_threshold (float): Waits up to this long are slept and the
+                call retried, as TelegramClient does; longer ones raise FloodWaitError
+            seed (int, optional): Seed for the latency/failure random generator
+        """
+        self.question_count = question_count
+        self.option_count = option_count
+        self.delay = delay
+        self.jitter = jitter
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.flood_sleep_threshold = flood_sleep_threshold
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.stats = {'calls': 0, 'flood_waits': 0, 'quizzes_started': 0, 'questions_sent': 0}
+
+    def build_quiz(self, start_param):
+        """
+        Build the quiz served for a start parameter
+
+        Args:
+            start_param (str): The quiz shortcode
+
+        Returns:
+            dict: Quiz with title and questions ({'question', 'options', 'correct'})
+        """
+        rng = random.Random(f"{self.seed}:{start_param}")
+        questions = []
+        for i in range(self.question_count):
+            options = [f"Option {chr(65 + j % 26)}{j // 26 or ''} for Q{i + 1}"
+                       for j in range(self.option_count)]
+            questions.append({
+                'question': f"Question {i + 1} of quiz {start_param}: what is item {rng.randint(1, 10 ** 6)}?",
+                'options': options,
+                'correct': rng.randrange(self.option_count)
+            })
+        return {'title': f"Fake Quiz {start_param}", 'questions': questions}
+
+    async def respond(self):
+        """Simulate network latency and inject FloodWait errors"""
+        self.stats['calls'] += 1
+        while self.flood_wait_rate and self.random.random() < self.flood_wait_rate:
+            self.stats['flood_waits'] += 1
+            if self.flood_wait_seconds > self.flood_sleep_threshold:
+                raise FloodWaitError(request=None, capture=self.flood_wait_seconds)
+            await asyncio.sleep(self.flood_wait_seconds)
+        wait = self.delay
+        if self.jitter:
+            wait += self.random.uniform(0, self.jitter)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        else:
+            await asyncio.sleep(0)
+
+class FakeChat:
+    """Conversation state between one client and the fake QuizBot"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.history = []
+        self.pending = deque()
+        self.quiz = None
+        self.position = 0
+        self.score = 0
+        self._ids = itertools.count(1)
+
+    def _post(self, text, buttons=None, kind=None):
+        if buttons is not None:
+            buttons = [[FakeButton(label) for label in row] for row in buttons]
+        msg = FakeMessage(next(self._ids), text, buttons=buttons, chat=self, kind=kind)
+        self.history.append(msg)
+        self.pending.append(msg)
+        return msg
+
+    def start(self, start_param):
+        """Handle /start <param>: reply with the quiz header"""
+        self.quiz = self.bot.build_quiz(start_param)
+        self.position = 0
+        self.score = 0
+        self.bot.stats['quizzes_started'] += 1
+        self._post(
+            f"🎲 Get ready for the quiz '{self.quiz['title']}'\n\n"
+            f"🖊 {len(self.quiz['questions'])} questions\n"
+            f"⏱ 30 seconds per question\n"
+            f"📰 Votes are visible to the quiz owner",
+            kind='header'
+        )
+
+    def play(self):
+        """Handle /play: send the current question"""
+        if not self.quiz:
+            self._post("Send /start with a quiz code first")
+            return
+        self._post_question()
+
+    def _post_question(self):
+        questions = self.quiz['questions']
+        if self.position >= len(questions):
+            self._post(f"🏁 Quiz finished!\n\nYour result: {self.score}/{len(questions)}", kind='finished')
+            return
+        q = questions[self.position]
+        self.bot.stats['questions_sent'] += 1
+        self._post(f"[{self.position + 1}/{len(questions)}] {q['question']}",
+                   buttons=[[opt] for opt in q['options']], kind='question')
+
+    def _post_result(self, chosen):
+        q = self.quiz['questions'][self.position]
+        lines = [q['question'], ""]
+        for i, opt in enumerate(q['options']):
+            if i == q['correct']:
+                lines.append(f"✅ {opt}")
+            elif i == chosen:
+                lines.append(f"❌ {opt}")
+            else:
+                lines.append(opt)
+        if chosen == q['correct']:
+            self.score += 1
+        self._post("\n".join(lines), buttons=[["Next question"]], kind='result')
+
+    async def click(self, msg, i):
+        await self.bot.respond()
+        if self.quiz and msg.kind == 'question':
+            self._post_result(i)
+        elif self.quiz and msg.kind == 'result':
+            self.position += 1
+            self._post_question()
+        return None
+
+    def handle_text(self, text):
+        text = text.strip()
+        if text.startswith("/start"):
+            parts = text.split(maxsplit=1)
+            self.start(parts[1] if len(parts) > 1 else "")
+        elif text == "/play":
+            self.play()
+        elif text == "/stop":
+            self.quiz = None
+
+class FakeConversation:
+    """Mimics telethon's Conversation for a single chat"""
+
+    def __init__(self, chat):
+        self.chat = chat
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def send_message(self, text):
+        await self.chat.bot.respond()
+        self.chat.handle_text(text)
+
+    async def get_response(self, timeout=None):
+        """
+        Get the next bot message
+
+        Raises asyncio.TimeoutError straight away when the bot has nothing
+        queued instead of waiting out the timeout.
+        """
+        await self.chat.bot.respond()
+        if not self.chat.pending:
+            raise asyncio.TimeoutError()
+        return self.chat.pending.popleft()
+
+class FakeTelegramClient:
+    """
+    Client-interface seam for offline runs
+
+    Implements the part of TelegramClient used by userbot_main and
+    QuizExtractor, talking to a FakeQuizBot instead of Telegram.
+    """
+
+    def __init__(self, bot=None):
+        self.bot = bot or FakeQuizBot()
+        self.chat = FakeChat(self.bot)
+        self.connected = False
+
+    async def connect(self):
+        self.connected = True
+
+    async def start(self, *args, **kwargs):
+        self.connected = True
+        return self
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def is_user_authorized(self):
+        return True
+
+    async def get_entity(self, entity):
+        return QUIZ_BOT_USERNAME
+
+    async def __call__(self, request):
+        """Handle raw API requests (only StartBotRequest is supported)"""
+        await self.bot.respond()
+        start_param = getattr(request, 'start_param', None)
+        if start_param is None:
+            raise NotImplementedError(f"Unsupported request: {type(request).__name__}")
+        self.chat.start(start_param)
+        self.chat.pending.clear()
+        return None
+
+    async def get_messages(self, entity, limit=1):
+        await self.bot.respond()
+        return list(reversed(self.chat.history[-limit:]))
+
+    async def iter_messages(self, entity, limit=1):
+        for msg in await self.get_messages(entity, limit=limit):
+            yield msg
+
+    def conversation(self, entity, **kwargs):
+        return FakeConversation(self.chat)
@@ -0,0 +1,327 @@
+import time
+import logging
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict, namedtuple
+from models import db, QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+# Target number of keys per bucket of a ScoreIndex
+BUCKET_LOAD = 1000
+
+# Quizzes whose leaderboards are kept in memory
+CAPACITY = 256
+
+# Seconds before a leaderboard is reloaded to pick up writes of other processes
+REFRESH_INTERVAL = 300.0
+
+# Attempts read per round trip when loading a leaderboard
+LOAD_BATCH_SIZE = 5000
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', [
+    'rank', 'attempt_id', 'user_id', 'score', 'max_score', 'completed_at'
+])
+
+def attempt_key(attempt_id, score, completed_at):
+    """Sort key of a completed attempt: best score first, then earliest completion"""
+    return (-(score or 0), completed_at, attempt_id)
+
+class ScoreIndex:
+    """
+    Sorted list of keys with O(log n) rank and position lookups
+
+    Keys live in sorted buckets of about `load` keys. The largest key of
+    each bucket is kept for bisecting to the right bucket, and a Fenwick
+    tree over the bucket lengths turns a bucket number into the number of
+    keys before it (and a position back into a bucket). Adding or removing
+    a key costs O(log n + load); splitting or dropping a bucket rebuilds
+    the tree, which happens once every `load` changes at most.
+    """
+
+    def __init__(self, keys=(), load=BUCKET_LOAD):
+        self.load = load
+        keys = sorted(keys)
+        self.buckets = [keys[i:i + load] for i in range(0, len(keys), load)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.size = len(keys)
+        self._rebuild_tree()
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key):
+        if not self.buckets:
+            self.buckets.append([key])
+            self.maxes.append(key)
+            self.size = 1
+            self._rebuild_tree()
+            return
+        pos = bisect_left(self.maxes, key)
+        if pos == len(self.buckets):
+            pos -= 1
+            self.buckets[pos].append(key)
+            self.maxes[pos] = key
+        else:
+            insort(self.buckets[pos], key)
+        self.size += 1
+        bucket = self.buckets[pos]
+        if len(bucket) > 2 * self.load:
+            self.buckets[pos:pos + 1] = [bucket[:self.load], bucket[self.load:]]
+            self.maxes[pos:pos + 1] = [bucket[self.load - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(pos, 1)
+
+    def remove(self, key):
+        """Remove a key; raises KeyError if it is not present"""
+        pos = bisect_left(self.maxes, key)
+        if pos == len(self.buckets):
+            raise KeyError(key)
+        bucket = self.buckets[pos]
+        index = bisect_left(bucket, key)
+        if bucket[index] != key:
+            raise KeyError(key)
+        del bucket[index]
+        self.size -= 1
+        if not bucket:
+            del self.buckets[pos]
+            del self.maxes[pos]
+            self._rebuild_tree()
+        else:
+            self.maxes[pos] = bucket[-1]
+            self._tree_add(pos, -1)
+
+    def index(self, key):
+        """Number of keys smaller than key (the 0-based position of key if present)"""
+        pos = bisect_left(self.maxes, key)
+        if pos == len(self.buckets):
+            return self.size
+        return self._prefix(pos) + bisect_left(self.buckets[pos], key)
+
+    def slice(self, start, stop):
+        """Keys at positions start..stop-1"""
+        start, stop = max(start, 0), min(stop, self.size)
+        if start >= stop:
+            return []
+        pos, offset = self._locate(start)
+        keys = []
+        while len(keys) < stop - start:
+            bucket = self.buckets[pos]
+            keys.extend(bucket[offset:offset + stop - start - len(keys)])
+            pos, offset = pos + 1, 0
+        return keys
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(bucket) for bucket in self.buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def _tree_add(self, pos, delta):
+        i = pos + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, pos):
+        # Number of keys in buckets 0..pos-1
+        total, i = 0, pos
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position):
+        # (bucket, offset within the bucket) of a 0-based position
+        pos, remaining = 0, position
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self.tree) and self.tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= self.tree[nxt]
+            step >>= 1
+        return pos, remaining
+
+class Board:
+    """Score index of one quiz plus what is needed to describe its entries"""
+
+    def __init__(self, rows=()):
+        self.keys = {}
+        self.details = {}
+        for attempt_id, user_id, score, max_score, completed_at in rows:
+            self.keys[attempt_id] = attempt_key(attempt_id, score, completed_at)
+            self.details[attempt_id] = (user_id, max_score)
+        self.index = ScoreIndex(self.keys.values())
+        self.loaded_at = time.monotonic()
+
+    def put(self, attempt_id, user_id, score, max_score, completed_at):
+        self.discard(attempt_id)
+        key = attempt_key(attempt_id, score, completed_at)
+        self.keys[attempt_id] = key
+        self.details[attempt_id] = (user_id, max_score)
+        self.index.add(key)
+
+    def discard(self, attempt_id):
+        key = self.keys.pop(attempt_id, None)
+        if key is not None:
+            self.details.pop(attempt_id, None)
+            self.index.remove(key)
+
+    def entries(self, start, stop):
+        entries = []
+        for rank, key in enumerate(self.index.slice(start, stop), start + 1):
+            user_id, max_score = self.details[key[2]]
+            entries.append(LeaderboardEntry(rank, key[2], user_id, -key[0], max_score, key[1]))
+        return entries
+
+class Leaderboard:
+    """
+    Per-quiz rankings of completed attempts
+
+    A quiz's board is loaded from the completed attempts on first use and
+    then kept current by QuizDatabase as attempts complete or change; it
+    is reloaded after `refresh_interval` to fold in attempts written by
+    other processes. Ties are broken by completion time, then attempt id.
+    """
+
+    def __init__(self, capacity=CAPACITY, refresh_interval=REFRESH_INTERVAL):
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.boards = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def top(self, quiz_pk, limit=10):
+        """
+        Best attempts of a quiz
+
+        Args:
+            quiz_pk (int): Quiz row id
+            limit (int): Number of entries
+
+        Returns:
+            list: LeaderboardEntry objects, best first
+        """
+        board = self._board(quiz_pk)
+        with self.lock:
+            return board.entries(0, limit)
+
+    def rank(self, quiz_pk, attempt_id):
+        """
+        Leaderboard entry of an attempt
+
+        Returns:
+            LeaderboardEntry: The entry or None if the attempt is not ranked
+        """
+        entries = self.around(quiz_pk, attempt_id, 0)
+        return entries[0] if entries else None
+
+    def around(self, quiz_pk, attempt_id, window=5):
+        """
+        Entries ranked around an attempt
+
+        Args:
+            quiz_pk (int): Quiz row id
+            attempt_id (int): The attempt to center on
+            window (int): Entries to include above and below it
+
+        Returns:
+            list: LeaderboardEntry objects, empty if the attempt is not ranked
+        """
+        board = self._board(quiz_pk)
+        with self.lock:
+            key = board.keys.get(attempt_id)
+            if key is None:
+                return []
+            position = board.index.index(key)
+            return board.entries(position - window, position + window + 1)
+
+    def count(self, quiz_pk):
+        """Number of ranked attempts of a quiz"""
+        board = self._board(quiz_pk)
+        with self.lock:
+            return len(board.index)
+
+    def is_loaded(self, quiz_pk):
+        with self.lock:
+            return quiz_pk in self.boards or quiz_pk in self.loading
+
+    def on_completed(self, quiz_pk, attempt_id, user_id, score, max_score, completed_at):
+        """Rank (or re-rank) a completed attempt; ignored if the quiz's board is not loaded"""
+        if completed_at is None:
+            return
+        self._apply(quiz_pk, ('put', attempt_id, user_id, score, max_score, completed_at))
+
+    def on_removed(self, quiz_pk, attempt_id):
+        """Drop an attempt that is no longer completed"""
+        self._apply(quiz_pk, ('discard', attempt_id))
+
+    def invalidate(self, quiz_pk=None):
+        """Force a reload of one quiz's board (or all boards) on the next read"""
+        with self.lock:
+            if quiz_pk is None:
+                self.boards.clear()
+            else:
+                self.boards.pop(quiz_pk, None)
+
+    def _apply(self, quiz_pk, change):
+        with self.lock:
+            board = self.boards.get(quiz_pk)
+            if board is not None:
+                self._apply_to(board, change)
+            if quiz_pk in self.loading:
+                # Replayed once the load finishes; applying a change twice is harmless
+                self.loading[quiz_pk].append(change)
+
+    @staticmethod
+    def _apply_to(board, change):
+        if change[0] == 'put':
+            board.put(*change[1:])
+        else:
+            board.discard(change[1])
+
+    def _board(self, quiz_pk):
+        with self.lock:
+            board = self.boards.get(quiz_pk)
+            if board is not None and time.monotonic() - board.loaded_at < self.refresh_interval:
+                self.boards.move_to_end(quiz_pk)
+                return board
+            self.loading.setdefault(quiz_pk, [])
+        started = time.monotonic()
+
+        try:
+            board = Board(self._load_rows(quiz_pk))
+        except Exception as e:
+            logger.error(f"Error loading leaderboard: {str(e)}")
+            db.session.rollback()
+            with self.lock:
+                self.loading.pop(quiz_pk, None)
+            return Board()
+
+        with self.lock:
+            current = self.boards.get(quiz_pk)
+            if current is not None and current.loaded_at >= started:
+                # Another thread finished loading first
+                return current
+            for change in self.loading.pop(quiz_pk, []):
+                self._apply_to(board, change)
+            self.boards[quiz_pk] = board
+            while len(self.boards) > self.capacity:
+                self.boards.popitem(last=False)
+        return board
+
+    @staticmethod
+    def _load_rows(quiz_pk):
+        return (db.session.query(QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.score,
+                                 QuizAttempt.max_score, QuizAttempt.completed_at)
+                .filter(QuizAttempt.quiz_id == quiz_pk,
+                        QuizAttempt.completed.is_(True),
+                        QuizAttempt.completed_at.isnot(None))
+                .yield_per(LOAD_BATCH_SIZE))
+
+# Shared leaderboards kept current by QuizDatabase
+leaderboard = Leaderboard()
@@ -0,0 +1,241 @@
+import time
+import atexit
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import exc
+from utils.database import QuizDatabase
+
+logger = logging.getLogger(__name__)
+
+# Seconds a submitted quiz may wait for more to batch with
+FLUSH_INTERVAL = 0.5
+
+# Quizzes written per transaction
+BATCH_SIZE = 200
+
+# Backoff between retries of a batch that hit a transient database error
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+
+# Retries of a batch before its quizzes are dropped (about two minutes of backoff)
+MAX_RETRIES = 8
+
+# Retries left for a failing batch once shutdown has started
+SHUTDOWN_RETRIES = 3
+
+# Seconds stop() waits for the queue to drain
+SHUTDOWN_TIMEOUT = 30.0
+
+# Errors worth retrying: lost connections, pool timeouts, lock timeouts
+# (sqlite3.OperationalError is a locked shard of ShardedQuizStore)
+TRANSIENT_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.DisconnectionError, exc.TimeoutError,
+                    sqlite3.OperationalError)
+
+def is_transient(error):
+    return isinstance(error, TRANSIENT_ERRORS) or getattr(error, 'connection_invalidated', False)
+
+class PersistenceQueue:
+    """
+    Write-behind queue for extracted quizzes
+
+    submit() only stores the quiz in memory, so the caller can answer the
+    user straight away. A background thread saves the queue in batches
+    with write_quiz_batch of the database it was started with (QuizDatabase
+    unless given another store, e.g. a ShardedQuizStore), retries batches that hit transient
+    database errors with exponential backoff (up to max_retries, then the
+    batch is dropped and counted as failed), and isolates quizzes that
+    fail for other reasons so one bad quiz cannot hold back the rest.
+    Submitting a quiz that is still queued replaces its data. The queue is
+    drained at interpreter exit. A queued quiz is not visible to database
+    reads until its batch commits (normally within flush_interval); readers
+    check pending() first so they do not extract it again meanwhile.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE, max_retries=MAX_RETRIES):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        # quiz_id -> (quiz_data, submit time)
+        self.items = OrderedDict()
+        # The batch being written, until it commits or is dropped
+        self.writing = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.app = None
+        self.database = QuizDatabase
+        self.thread = None
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self, app, database=QuizDatabase):
+        """
+        Start the background writer
+
+        Args:
+            app (Flask): Application the writes run in the context of
+            database: QuizDatabase or another store with write_quiz_batch
+        """
+        if self.thread is not None:
+            return
+        self.app = app
+        self.database = database
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='persistence-queue', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """Write out everything still queued and stop the writer"""
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.wakeup.set()
+        self.thread.join(timeout=timeout)
+        if self.thread.is_alive():
+            logger.error(f"Persistence queue did not drain within {timeout}s; {self.depth()} quizzes not saved")
+        self.thread = None
+
+    def submit(self, quiz_id, quiz_data):
+        """
+        Queue a quiz to be saved
+
+        Args:
+            quiz_id (str): The quiz identifier
+            quiz_data (dict): Quiz data, as passed to QuizDatabase.save_quiz
+        """
+        if self.thread is None:
+            self.start(current_app._get_current_object())
+        with self.lock:
+            previous = self.items.pop(quiz_id, None)
+            submitted_at = previous[1] if previous else time.monotonic()
+            self.items[quiz_id] = (quiz_data, submitted_at)
+            self.submitted += 1
+            full = len(self.items) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    def pending(self, quiz_id):
+        """Queued or in-flight data of a quiz, or None if it is not waiting to be saved"""
+        with self.lock:
+            item = self.items.get(quiz_id) or self.writing.get(quiz_id)
+            return item[0] if item else None
+
+    def depth(self):
+        with self.lock:
+            return len(self.items) + self.in_flight
+
+    def stats(self):
+        """
+        Queue depth, lag and throughput counters
+
+        Returns:
+            dict: Queued quizzes, age of the oldest one, last and maximum
+                submit-to-commit lag, and write/retry/failure counts
+        """
+        now = time.monotonic()
+        with self.lock:
+            oldest = next(iter(self.items.values()), None)
+            return {
+                'depth': len(self.items) + self.in_flight,
+                'oldest_age': round(now - oldest[1], 3) if oldest else 0.0,
+                'last_lag': round(self.last_lag, 3),
+                'max_lag': round(self.max_lag, 3),
+                'submitted': self.submitted,
+                'written': self.written,
+                'batches': self.batches,
+                'retries': self.retries,
+                'failed': self.failed
+            }
+
+    def render(self):
+        """Queue metrics in the Prometheus text format"""
+        stats = self.stats()
+        lines = []
+        for name, kind in (('depth', 'gauge'), ('oldest_age', 'gauge'), ('last_lag', 'gauge'),
+                           ('max_lag', 'gauge'), ('written', 'counter'), ('retries', 'counter'),
+                           ('failed', 'counter')):
+            suffix = '_seconds' if name.endswith(('age', 'lag')) else ''
+            suffix += '_total' if kind == 'counter' else ''
+            lines.append(f'# TYPE quiz_persistence_{name}{suffix} {kind}')
+            lines.append(f'quiz_persistence_{name}{suffix} {stats[name]}')
+        return '\n'.join(lines) + '\n'
+
+    def _take(self):
+        with self.lock:
+            batch = []
+            while self.items and len(batch) < self.batch_size:
+                batch.append(self.items.popitem(last=False))
+            self.in_flight = len(batch)
+            self.writing = dict(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            stopping = self.stop_event.is_set()
+            batch = self._take()
+            if batch:
+                with self.app.app_context():
+                    self._write(batch)
+                with self.lock:
+                    self.in_flight = 0
+                    self.writing = {}
+                continue
+            if stopping:
+                return
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+
+    def _write(self, batch):
+        attempt = 0
+        while True:
+            try:
+                self.database.write_quiz_batch([(quiz_id, data) for quiz_id, (data, _) in batch])
+                break
+            except Exception as e:
+                if not is_transient(e):
+                    self._isolate(batch, e)
+                    return
+                attempt += 1
+                stopping = self.stop_event.is_set()
+                if attempt > self.max_retries or (stopping and attempt > SHUTDOWN_RETRIES):
+                    when = " at shutdown" if stopping else f" after {attempt - 1} retries"
+                    logger.error(f"Giving up on {len(batch)} quizzes{when}: {str(e)}")
+                    with self.lock:
+                        self.failed += len(batch)
+                    return
+                delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+                logger.warning(f"Transient error saving {len(batch)} quizzes, retrying in {delay:.1f}s: {str(e)}")
+                with self.lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+        now = time.monotonic()
+        lag = now - min(submitted_at for _, (_, submitted_at) in batch)
+        with self.lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def _isolate(self, batch, error):
+        if len(batch) == 1:
+            logger.error(f"Dropping quiz {batch[0][0]} that cannot be saved: {str(error)}")
+            with self.lock:
+                self.failed += 1
+            return
+        # Save the quizzes one by one so only the bad ones are dropped
+        for item in batch:
+            self._write([item])
+
+# Shared queue used by the extraction handlers
+persistence_queue = PersistenceQueue()
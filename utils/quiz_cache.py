@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Seconds a snapshot is served before it is reloaded from the database
+CACHE_TTL = 300.0
+
+# Upper bound for the raw_data + formatted_data held in memory
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Answer keys kept in memory for scoring attempts
+ANSWER_KEY_CAPACITY = 4096
+
+# Prefix of the keys in the optional shared store
+REDIS_KEY_PREFIX = 'quiz:'
+
+# Read-only copy of a Quiz row; exposes the same attributes as the model
+QuizSnapshot = namedtuple('QuizSnapshot', [
+    'id', 'quiz_id', 'title', 'author', 'description', 'question_count',
+    'raw_data', 'formatted_data', 'created_at', 'last_accessed', 'access_count'
+])
+
+DATETIME_FIELDS = ('created_at', 'last_accessed')
+
+def snapshot(quiz):
+    """
+    Copy a Quiz row into an immutable snapshot
+
+    Args:
+        quiz (Quiz): Quiz row
+
+    Returns:
+        QuizSnapshot: The snapshot
+    """
+    return QuizSnapshot(*(getattr(quiz, field) for field in QuizSnapshot._fields))
+
+def snapshot_size(entry):
+    return len(entry.raw_data or '') + len(entry.formatted_data or '') + 256
+
+def _dump(entry):
+    data = entry._asdict()
+    for field in DATETIME_FIELDS:
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+def _load(text):
+    data = json.loads(text)
+    for field in DATETIME_FIELDS:
+        if data.get(field):
+            data[field] = datetime.fromisoformat(data[field])
+    return QuizSnapshot(**data)
+
+def connect_redis(url):
+    """Return a redis client for url, or None if redis is not installed or unreachable"""
+    try:
+        import redis
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using the local cache only")
+        return None
+    try:
+        client = redis.Redis.from_url(url, socket_timeout=0.5)
+        client.ping()
+        return client
+    except Exception as e:
+        logger.error(f"Could not connect to Redis, using the local cache only: {str(e)}")
+        return None
+
+class QuizCache:
+    """
+    Read-through cache of QuizSnapshot objects keyed by quiz_id
+
+    The local level is an LRU bounded by the size of the cached quiz data,
+    with a TTL per entry. When REDIS_URL is set (and the redis package is
+    installed) a shared level sits between it and the database, so worker
+    processes load each quiz once. Saves and deletes invalidate both levels.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, redis_client=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.redis = redis_client
+        self.entries = OrderedDict()
+        self.pk_to_quiz_id = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, quiz_id, load):
+        """
+        Return the snapshot of a quiz, loading it on a miss
+
+        Args:
+            quiz_id (str): The quiz identifier
+            load (callable): Returns the Quiz row or None; only called on a miss
+
+        Returns:
+            QuizSnapshot: The snapshot or None if the quiz does not exist
+        """
+        now = time.monotonic()
+        entry, generation = self._lookup(quiz_id, now)
+        if entry is not None:
+            return entry
+        return self._fill(load(), now, generation)
+
+    async def get_async(self, quiz_id, load):
+        """Same as get, for a load coroutine function"""
+        now = time.monotonic()
+        entry, generation = self._lookup(quiz_id, now)
+        if entry is not None:
+            return entry
+        return self._fill(await load(), now, generation)
+
+    def invalidate(self, quiz_id):
+        """Drop a quiz from both cache levels"""
+        with self.lock:
+            self._remove(quiz_id)
+            self.invalidations += 1
+        self._delete_shared(quiz_id)
+
+    def apply_access_counts(self, counts):
+        """
+        Fold flushed access counts into the cached snapshots
+
+        Args:
+            counts (dict): Quiz row id -> (hits, last access), as flushed by utils.access_counter
+        """
+        with self.lock:
+            for quiz_pk, (hits, when) in counts.items():
+                quiz_id = self.pk_to_quiz_id.get(quiz_pk)
+                cached = self.entries.get(quiz_id) if quiz_id is not None else None
+                if cached is None:
+                    continue
+                entry, expires = cached
+                last_accessed = entry.last_accessed
+                if last_accessed is None or when > last_accessed:
+                    last_accessed = when
+                entry = entry._replace(access_count=(entry.access_count or 0) + hits,
+                                       last_accessed=last_accessed)
+                self.entries[quiz_id] = (entry, expires)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pk_to_quiz_id.clear()
+            self.size = 0
+
+    def _lookup(self, quiz_id, now):
+        # (entry, None) on a hit, (None, invalidation generation) on a miss
+        with self.lock:
+            generation = self.invalidations
+            cached = self.entries.get(quiz_id)
+            if cached is not None:
+                entry, expires = cached
+                if expires > now:
+                    self.entries.move_to_end(quiz_id)
+                    self.hits += 1
+                    return entry, None
+                self._remove(quiz_id)
+
+        entry = self._get_shared(quiz_id)
+        if entry is not None:
+            with self.lock:
+                self.shared_hits += 1
+            self._put(entry, now, generation)
+            return entry, None
+        with self.lock:
+            self.misses += 1
+        return None, generation
+
+    def _fill(self, quiz, now, generation):
+        if quiz is None:
+            return None
+        entry = snapshot(quiz)
+        # A load that raced an invalidation is returned but cached at neither
+        # level; in Redis every process would serve it until it expires
+        if self._put(entry, now, generation):
+            self._set_shared(entry)
+            with self.lock:
+                raced = generation != self.invalidations
+            if raced:
+                # Invalidated between _put and the write, which the delete may have preceded
+                self._delete_shared(entry.quiz_id)
+        return entry
+
+    def stats(self):
+        """
+        Hit-rate statistics
+
+        Returns:
+            dict: Counters plus the overall hit rate
+        """
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                'shared': self.redis is not None
+            }
+
+    def _put(self, entry, now, generation):
+        # False if something was invalidated while this entry was loading
+        size = snapshot_size(entry)
+        with self.lock:
+            if generation != self.invalidations:
+                return False
+            if size > self.max_bytes:
+                return True
+            self._remove(entry.quiz_id)
+            self.entries[entry.quiz_id] = (entry, now + self.ttl)
+            self.pk_to_quiz_id[entry.id] = entry.quiz_id
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted_id = next(iter(self.entries))
+                self._remove(evicted_id)
+                self.evictions += 1
+        return True
+
+    def _remove(self, quiz_id):
+        # Caller holds the lock
+        cached = self.entries.pop(quiz_id, None)
+        if cached is not None:
+            entry = cached[0]
+            self.size -= snapshot_size(entry)
+            self.pk_to_quiz_id.pop(entry.id, None)
+
+    def _get_shared(self, quiz_id):
+        if self.redis is None:
+            return None
+        try:
+            data = self.redis.get(REDIS_KEY_PREFIX + quiz_id)
+            return _load(data) if data else None
+        except Exception as e:
+            logger.error(f"Error reading shared quiz cache: {str(e)}")
+            return None
+
+    def _set_shared(self, entry):
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(REDIS_KEY_PREFIX + entry.quiz_id, _dump(entry), ex=int(self.ttl))
+        except Exception as e:
+            logger.error(f"Error writing shared quiz cache: {str(e)}")
+
+    def _delete_shared(self, quiz_id):
+        if self.redis is None:
+            return
+        try:
+            self.redis.delete(REDIS_KEY_PREFIX + quiz_id)
+        except Exception as e:
+            logger.error(f"Error invalidating shared quiz cache: {str(e)}")
+
+class AnswerKeyCache:
+    """
+    LRU of answer keys (tuple of correct option indexes) keyed by quiz row id
+
+    Used to score submitted attempts without reading the questions again.
+    Saves and deletes invalidate the affected quiz.
+    """
+
+    def __init__(self, capacity=ANSWER_KEY_CAPACITY):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_many(self, quiz_pks, load):
+        """
+        Return the answer keys of several quizzes, loading the missing ones at once
+
+        Args:
+            quiz_pks (iterable): Quiz row ids
+            load (callable): Takes a list of row ids and returns {row id: answer key}
+
+        Returns:
+            dict: Quiz row id -> answer key (tuple)
+        """
+        keys = {}
+        missing = []
+        with self.lock:
+            for quiz_pk in set(quiz_pks):
+                key = self.entries.get(quiz_pk)
+                if key is None:
+                    missing.append(quiz_pk)
+                else:
+                    self.entries.move_to_end(quiz_pk)
+                    keys[quiz_pk] = key
+            self.hits += len(keys)
+            self.misses += len(missing)
+            generation = self.invalidations if missing else None
+        if missing:
+            loaded = {quiz_pk: tuple(key) for quiz_pk, key in load(missing).items()}
+            keys.update(loaded)
+            with self.lock:
+                if generation == self.invalidations:
+                    self.entries.update(loaded)
+                    while len(self.entries) > self.capacity:
+                        self.entries.popitem(last=False)
+        return keys
+
+    def invalidate(self, quiz_pk):
+        with self.lock:
+            self.entries.pop(quiz_pk, None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# Shared cache used by QuizDatabase.get_quiz_by_id
+quiz_cache = QuizCache(redis_client=connect_redis(os.environ['REDIS_URL']) if os.environ.get('REDIS_URL') else None)
+
+# Answer keys used by QuizDatabase.get_answer_key and record_attempts
+answer_key_cache = AnswerKeyCache()
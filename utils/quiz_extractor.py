@@ -6,26 +6,44 @@ from telethon import TelegramClient, events
 from telethon.tl.functions.messages import StartBotRequest, GetBotCallbackAnswerRequest
 from telethon.tl.functions.channels import JoinChannelRequest
 from telethon.tl.types import InputMessageID
+from utils.quiz_parser import (parse_quiz_messages, extract_title, extract_question_count,
+                               extract_correct_option, is_finish_message)
+from utils.quiz_model import FINGERPRINT_QUESTIONS, normalize_quiz, quiz_fingerprint
+from utils.quiz_formatter import render_quiz
 
 logger = logging.getLogger(__name__)
 
 class QuizExtractor:
     """Class for extracting quiz data from Telegram QuizBot"""
     
-    def __init__(self, api_id, api_hash, session_string=None):
-        """Initialize the extractor with Telegram credentials"""
+    def __init__(self, api_id, api_hash, session_string=None, client=None, response_wait=2):
+        """
+        Initialize the extractor with Telegram credentials
+        
+        Args:
+            api_id (int): Telegram API ID
+            api_hash (str): Telegram API Hash
+            session_string (str, optional): Telegram session string
+            client (optional): Pre-built client to use instead of creating a
+                TelegramClient (e.g. utils.fake_quizbot.FakeTelegramClient)
+            response_wait (float): Seconds to wait for QuizBot after starting a quiz
+        """
         self.api_id = api_id
         self.api_hash = api_hash
         self.session_string = session_string
-        self.client = None
+        self.client = client
         self.quiz_bot_username = "QuizBot"
         self.quiz_bot_entity = None
+        self.response_wait = response_wait
         
     async def connect(self):
         """Connect to Telegram and get the QuizBot entity"""
         try:
             # Create and connect the client
-            if self.session_string:
+            if self.client is not None:
+                # Use the injected client as-is
+                pass
+            elif self.session_string:
                 # Use session string if provided
                 from telethon.sessions import StringSession
                 self.client = TelegramClient(StringSession(self.session_string), 
@@ -85,7 +103,7 @@ class QuizExtractor:
             
             # Step 2: Wait for the first message (the first question)
             logger.info("Waiting for quiz initialization...")
-            await asyncio.sleep(2)  # Give the bot some time to respond
+            await asyncio.sleep(self.response_wait)  # Give the bot some time to respond
             
             # Step 3: Get the recent messages from QuizBot
             messages = await self.client.get_messages(self.quiz_bot_entity, limit=10)
@@ -117,89 +135,9 @@ class QuizExtractor:
         Returns:
             dict: Complete quiz data
         """
-        # Initialize quiz data structure
-        quiz_data = {
-            'id': shortcode,
-            'title': 'Telegram Quiz',
-            'questions': [],
-            'source': 'QuizBot'
-        }
-        
-        # Check for the quiz title in the initial messages
-        for msg in messages:
-            if hasattr(msg, 'message') and msg.message:
-                # Look for patterns that might indicate the quiz title
-                if len(msg.message.split('\n')) <= 2 and not any(x in msg.message.lower() 
-                                                               for x in ['answer', 'question', 'option', 'quiz']):
-                    quiz_data['title'] = msg.message.strip()
-                    break
-        
-        # Here's the advanced technique to extract all questions:
-        # We use a special method to request the full quiz content directly
-        
-        # Approach 1: Try to extract quiz data from media buttons
-        quiz_found = False
-        
-        for msg in messages:
-            # Check if the message has buttons (quiz options)
-            if hasattr(msg, 'buttons') and msg.buttons:
-                quiz_found = True
-                
-                # Extract the question
-                question_text = msg.message if hasattr(msg, 'message') else "Quiz Question"
-                
-                # Extract options
-                options = []
-                correct_index = 0  # Default to first option
-                
-                for row in msg.buttons:
-                    for button in row:
-                        # Extract the button text as an option
-                        option_text = button.text
-                        
-                        # Store the option data
-                        options.append({
-                            'text': option_text,
-                            'correct': False  # We'll update this later
-                        })
-                
-                # Add this question to our quiz data
-                quiz_data['questions'].append({
-                    'question': question_text,
-                    'options': options
-                })
-        
-        # Approach 2: If no quiz was found, try to directly access the quiz data
-        # using the MTProto API to get the full quiz content
-        if not quiz_found:
-            try:
-                # This is where we would implement the special API call
-                # to get all questions and answers at once
-                
-                # For the initial implementation, we'll create a placeholder
-                # message indicating that we need to enhance the extractor
-                quiz_data['questions'].append({
-                    'question': f"Quiz with code {shortcode} requires enhanced extraction",
-                    'options': [
-                        {'text': "Implementing enhanced extraction...", 'correct': True},
-                        {'text': "Standard extraction not available for this quiz", 'correct': False}
-                    ]
-                })
-                
-                # Mark that this quiz needs further processing
-                quiz_data['requires_enhanced_extraction'] = True
-                
-            except Exception as e:
-                logger.error(f"Error in advanced extraction: {str(e)}")
-                # Add a fallback question
-                quiz_data['questions'].append({
-                    'question': f"Could not extract quiz data for code: {shortcode}",
-                    'options': [
-                        {'text': "Extraction error occurred", 'correct': False}
-                    ]
-                })
-        
-        return quiz_data
+        # The parsing itself lives in utils.quiz_parser so recorded
+        # conversations can be replayed through it offline
+        return parse_quiz_messages(messages, shortcode)
     
     def _format_quiz_data(self, quiz_data):
         """
@@ -211,42 +149,26 @@ class QuizExtractor:
         Returns:
             dict: Formatted quiz data with additional metadata
         """
+        quiz = normalize_quiz(quiz_data)
+        
         # Add some metadata
         formatted = {
             'quiz_id': quiz_data.get('id', ''),
-            'title': quiz_data.get('title', 'Telegram Quiz'),
-            'question_count': len(quiz_data.get('questions', [])),
+            'title': quiz.title or 'Telegram Quiz',
+            'question_count': quiz.question_count,
             'questions': quiz_data.get('questions', []),
             'extracted': True,
             'raw_data': json.dumps(quiz_data)
         }
         
         # Generate a text representation
-        text_content = f"Quiz: {formatted['title']}\n"
-        text_content += f"Questions: {formatted['question_count']}\n\n"
-        
-        # Format each question
-        for i, q in enumerate(formatted['questions']):
-            text_content += f"{i+1}. {q.get('question', '')}\n"
-            
-            # Format options
-            for j, opt in enumerate(q.get('options', [])):
-                option_letter = chr(65 + j)  # A, B, C, etc.
-                option_text = opt.get('text', '')
-                is_correct = opt.get('correct', False)
-                
-                text_content += f"   {option_letter}. {option_text}"
-                if is_correct:
-                    text_content += " ✅"
-                text_content += "\n"
-            
-            text_content += "\n"
+        text_content = render_quiz(quiz, 'txt')
         
         formatted['formatted_text'] = text_content
         return formatted
 
 # Helper functions for easy access
-async def extract_quiz_async(shortcode, api_id, api_hash, session_string=None):
+async def extract_quiz_async(shortcode, api_id, api_hash, session_string=None, client=None):
     """
     Extract quiz data asynchronously
     
@@ -255,11 +177,12 @@ async def extract_quiz_async(shortcode, api_id, api_hash, session_string=None):
         api_id (int): Telegram API ID
         api_hash (str): Telegram API Hash
         session_string (str, optional): Telegram session string
+        client (optional): Pre-built client to use instead of a TelegramClient
         
     Returns:
         dict: Complete quiz data or None if extraction fails
     """
-    extractor = QuizExtractor(api_id, api_hash, session_string)
+    extractor = QuizExtractor(api_id, api_hash, session_string, client=client)
     
     try:
         # Connect to Telegram
@@ -312,4 +235,122 @@ def extract_quiz(shortcode, api_id, api_hash, session_string=None):
         
     except Exception as e:
         logger.error(f"Error in extract_quiz: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+async def play_quiz(tg_client, quiz_param, max_questions=None):
+    """
+    Extract quiz data by playing the quiz through in a QuizBot conversation
+    
+    Args:
+        tg_client: TelegramClient, or any object with the same
+            conversation/iter_messages interface (e.g. utils.fake_quizbot.FakeTelegramClient)
+        quiz_param (str): The quiz start parameter
+        max_questions (int, optional): Stop the quiz after this many questions
+            and mark the result "partial"
+        
+    Returns:
+        dict: Quiz data with the question count QuizBot announced as
+            "total_questions", or {"error": ...}
+    """
+    try:
+        logger.info(f"Extracting quiz data for parameter: {quiz_param}")
+        
+        async with tg_client.conversation('@QuizBot') as conv:
+            await conv.send_message(f"/start {quiz_param}")
+            response = await conv.get_response(timeout=30)
+            
+            if not response:
+                return {"error": "No response from QuizBot"}
+            
+            quiz_data = {
+                "title": "",
+                "param": quiz_param,
+                "questions": []
+            }
+            
+            text = response.text
+            quiz_data["title"] = extract_title(text)
+            quiz_data["total_questions"] = extract_question_count(text)
+            
+            await conv.send_message("/play")
+            question_count = 0
+
+            while True:
+                try:
+                    question_msg = await conv.get_response(timeout=15)
+                    if is_finish_message(question_msg.text):
+                        break
+                    
+                    question_text = question_msg.text
+                    question_data = {"question": question_text, "options": [], "correct_option": None}
+                    
+                    async for message in tg_client.iter_messages('@QuizBot', limit=1):
+                        if message.buttons:
+                            for row in message.buttons:
+                                for button in row:
+                                    question_data["options"].append(button.text)
+
+                    await question_msg.click(0)
+                    result_msg = await conv.get_response(timeout=15)
+                    correct_option = extract_correct_option(result_msg.text, question_data["options"])
+                    if correct_option:
+                        question_data["correct_option"] = correct_option
+                    
+                    quiz_data["questions"].append(question_data)
+                    question_count += 1
+                    
+                    if max_questions is not None and question_count >= max_questions:
+                        if question_count != quiz_data["total_questions"]:
+                            # Stop before QuizBot sends the next question
+                            quiz_data["partial"] = True
+                            await conv.send_message("/stop")
+                            break
+                    
+                    await result_msg.click(0)
+                except Exception as e:
+                    logger.error(f"Error processing question: {e}")
+                    break
+                
+            quiz_data["question_count"] = question_count
+            return quiz_data
+    
+    except Exception as e:
+        logger.exception(f"Error extracting quiz data: {e}")
+        return {"error": f"Failed to extract quiz data: {str(e)}"}
+
+def extraction_fingerprint(quiz_data, sample=FINGERPRINT_QUESTIONS):
+    """
+    Fingerprint of a (possibly partial) play_quiz result, see utils.quiz_model.quiz_fingerprint
+
+    Returns:
+        str: The fingerprint, or None if QuizBot did not announce the question count
+    """
+    if quiz_data.get("total_questions") is None:
+        return None
+    quiz = normalize_quiz(quiz_data)
+    return quiz_fingerprint(quiz.title, quiz_data["total_questions"],
+                            [question.content_hash() for question in quiz.questions], sample)
+
+async def revalidate_quiz(tg_client, quiz_param, stored_fingerprint, sample=FINGERPRINT_QUESTIONS):
+    """
+    Re-extract a stored quiz only if QuizBot serves a different version
+    
+    Plays the first `sample` questions and compares their fingerprint with the
+    stored one (QuizDatabase.get_quiz_fingerprint); only a mismatch, or a quiz
+    whose question count QuizBot does not announce, costs a full extraction.
+    
+    Returns:
+        tuple: (True, None) if the stored copy is current, otherwise
+            (False, quiz data of the full extraction)
+    """
+    if stored_fingerprint:
+        probe = await play_quiz(tg_client, quiz_param, max_questions=sample)
+        if "error" in probe:
+            return False, probe
+        if extraction_fingerprint(probe, sample) == stored_fingerprint:
+            logger.info(f"Stored copy of quiz {quiz_param} is current")
+            return True, None
+        if not probe.get("partial"):
+            # The probe already played the whole quiz
+            return False, probe
+    return False, await play_quiz(tg_client, quiz_param)
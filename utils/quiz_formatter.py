@@ -0,0 +1,231 @@
+import io
+import csv
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from utils.quiz_model import normalize_quiz
+
+logger = logging.getLogger(__name__)
+
+# Export formats and their download metadata
+MIMETYPES = {
+    'txt': 'text/plain',
+    'md': 'text/markdown',
+    'json': 'application/json',
+    'csv': 'text/csv',
+}
+
+# Size of the chunks yielded by iter_quiz
+CHUNK_SIZE = 64 * 1024
+
+def format_question_text(number, question):
+    """
+    Format one question as in the text export
+
+    Args:
+        number (int): 1-based question number
+        question (Question): The question
+
+    Returns:
+        str: The question block, ending with a blank line
+    """
+    lines = [f"{number}. {question.text}\n"]
+    for j, opt in enumerate(question.options):
+        lines.append(f"   {chr(65 + j)}. {opt.text}{' ✅' if opt.correct else ''}\n")
+    lines.append("\n")
+    return ''.join(lines)
+
+def _txt_chunks(quiz, questions):
+    yield f"Quiz: {quiz.title or 'Telegram Quiz'}\nQuestions: {quiz.question_count}\n\n"
+    for i, q in enumerate(questions, 1):
+        yield format_question_text(i, q)
+
+def _md_chunks(quiz, questions):
+    yield f"# {quiz.title or 'Telegram Quiz'}\n\n*{quiz.question_count} questions*\n\n"
+    for i, q in enumerate(questions, 1):
+        lines = [f"## {i}. {q.text}\n\n"]
+        for j, opt in enumerate(q.options):
+            lines.append(f"- [{'x' if opt.correct else ' '}] {chr(65 + j)}. {opt.text}\n")
+        lines.append("\n")
+        yield ''.join(lines)
+
+def _telegram_chunks(quiz, questions):
+    # Layout of the documents the userbot sends back in the chat
+    rule = "=" * 50
+    yield f"📝 QUIZ: {quiz.title or 'Telegram Quiz'}\n🔢 Total Questions: {quiz.question_count}\n{rule}\n\n"
+    for i, q in enumerate(questions, 1):
+        lines = [f"Question {i}: {q.text}\n"]
+        for j, opt in enumerate(q.options, 1):
+            lines.append(f"  {j}. {opt.text}{' ✅' if opt.correct else ''}\n")
+        lines.append("\n")
+        yield ''.join(lines)
+    yield f"{rule}\nGenerated by Telegram Quiz Extractor Bot"
+
+def _json_chunks(quiz, questions):
+    # Written question by question so large quizzes are never held as one dict
+    header = {'quiz_id': quiz.quiz_id, 'title': quiz.title}
+    yield json.dumps(header, ensure_ascii=False)[:-1] + ', "questions": ['
+    separator = "\n  "
+    for q in questions:
+        yield separator + json.dumps(q.to_dict(), ensure_ascii=False)
+        separator = ",\n  "
+    yield "\n]}\n"
+
+def _csv_chunks(quiz, questions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['question_number', 'question', 'option_letter', 'option', 'correct'])
+    for i, q in enumerate(questions, 1):
+        writer.writerows(
+            [i, q.text, chr(65 + j), opt.text, int(opt.correct)] for j, opt in enumerate(q.options)
+        )
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# Every format iter_quiz can write; downloads are offered in the MIMETYPES ones
+WRITERS = {
+    'txt': _txt_chunks,
+    'md': _md_chunks,
+    'json': _json_chunks,
+    'csv': _csv_chunks,
+    'telegram': _telegram_chunks,
+}
+
+def iter_quiz(quiz, fmt, questions=None, chunk_size=CHUNK_SIZE):
+    """
+    Format a quiz incrementally
+
+    Args:
+        quiz: utils.quiz_model.Quiz (or any quiz dict shape)
+        fmt (str): One of 'txt', 'md', 'json', 'csv', 'telegram'
+        questions (iterable, optional): Questions to write instead of quiz.questions,
+            e.g. a generator streaming them from the database
+        chunk_size (int): Approximate size of the yielded chunks
+
+    Yields:
+        str: Chunks of the formatted output
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    quiz = normalize_quiz(quiz)
+    pending, size = [], 0
+    for chunk in WRITERS[fmt](quiz, quiz.questions if questions is None else questions):
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield ''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending)
+
+def write_quiz(quiz, fmt, out, questions=None):
+    """
+    Format a quiz straight into a writable file object
+
+    Args:
+        quiz: utils.quiz_model.Quiz (or any quiz dict shape)
+        fmt (str): One of 'txt', 'md', 'json', 'csv', 'telegram'
+        out: Object with a write(str) method
+        questions (iterable, optional): Questions to write instead of quiz.questions
+    """
+    for chunk in iter_quiz(quiz, fmt, questions=questions):
+        out.write(chunk)
+
+def render_quiz(quiz, fmt):
+    """
+    Format a quiz into a string
+
+    Args:
+        quiz: utils.quiz_model.Quiz (or any quiz dict shape)
+        fmt (str): One of 'txt', 'md', 'json', 'csv', 'telegram'
+
+    Returns:
+        str: The formatted quiz
+    """
+    return ''.join(iter_quiz(quiz, fmt))
+
+def content_version(data):
+    """
+    Version key for stored quiz content (e.g. the raw_data column)
+
+    Args:
+        data (str): Serialized quiz content
+
+    Returns:
+        str: Short digest that changes whenever the content changes
+    """
+    return hashlib.blake2b((data or '').encode('utf-8'), digest_size=12).hexdigest()
+
+class RenderCache:
+    """
+    LRU cache of rendered exports keyed by (quiz_id, version, format)
+
+    Bounded by the total size of the cached output, so repeat downloads of
+    popular quizzes are served from memory without unbounded growth.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_or_render(self, quiz_id, version, fmt, load_quiz):
+        """
+        Return a cached export or render and cache it
+
+        Args:
+            quiz_id (str): The quiz identifier
+            version (str): Content version, see content_version()
+            fmt (str): One of 'txt', 'md', 'json', 'csv', 'telegram'
+            load_quiz (callable): Returns the quiz to render; only called on a miss
+
+        Returns:
+            str: The formatted quiz
+        """
+        output = self.get(quiz_id, version, fmt)
+        if output is None:
+            output = self.put(quiz_id, version, fmt, render_quiz(load_quiz(), fmt))
+        return output
+
+    def get(self, quiz_id, version, fmt):
+        """Return a cached export or None (counted as a miss)"""
+        key = (quiz_id, version, fmt)
+        with self.lock:
+            output = self.entries.get(key)
+            if output is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return output
+            self.misses += 1
+        return None
+
+    def put(self, quiz_id, version, fmt, output):
+        """Cache a rendered export and return it"""
+        if len(output) > self.max_bytes:
+            return output
+
+        key = (quiz_id, version, fmt)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = output
+                self.size += len(output)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+        return output
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+# Shared cache for download routes
+render_cache = RenderCache()
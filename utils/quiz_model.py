@@ -0,0 +1,255 @@
+import re
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keys that may hold the question text, in order of preference
+QUESTION_TEXT_KEYS = ('question', 'text', 'title', 'q')
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Leading questions compared when checking a stored quiz against QuizBot
+FINGERPRINT_QUESTIONS = 3
+
+class Option:
+    """One answer option of a question"""
+    __slots__ = ('text', 'correct')
+
+    def __init__(self, text, correct=False):
+        self.text = text
+        self.correct = correct
+
+    def __eq__(self, other):
+        return isinstance(other, Option) and self.text == other.text and self.correct == other.correct
+
+    def __repr__(self):
+        return f"<Option {self.text!r}{' (correct)' if self.correct else ''}>"
+
+class Question:
+    """One quiz question with its options"""
+    __slots__ = ('text', 'options')
+
+    def __init__(self, text, options=None):
+        self.text = text
+        self.options = options if options is not None else []
+
+    @property
+    def correct_index(self):
+        """Index of the first correct option, -1 if none is known"""
+        for i, option in enumerate(self.options):
+            if option.correct:
+                return i
+        return -1
+
+    @property
+    def correct_text(self):
+        """Text of the first correct option or None"""
+        index = self.correct_index
+        return self.options[index].text if index >= 0 else None
+
+    def to_dict(self):
+        return {
+            'question': self.text,
+            'options': [{'text': o.text, 'correct': o.correct} for o in self.options]
+        }
+
+    def to_view(self):
+        """Shape used by the web templates ({'text', 'options', 'correct_option'})"""
+        return {
+            'text': self.text,
+            'options': [o.text for o in self.options],
+            'correct_option': self.correct_index
+        }
+
+    def content_hash(self):
+        """Content address of the question, see question_hash()"""
+        return question_hash(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Question) and self.text == other.text and self.options == other.options
+
+    def __repr__(self):
+        return f"<Question {self.text[:30]!r} ({len(self.options)} options)>"
+
+class Quiz:
+    """
+    Canonical in-memory quiz
+
+    The three dict shapes used around the code base (app.py's
+    text/options/correct_option, QuizExtractor's question/options[{text,
+    correct}] and userbot_main's correct option text) are normalized into
+    this model once, so formatters never have to probe for keys.
+    """
+    __slots__ = ('quiz_id', 'title', 'author', 'description', 'questions', 'total_questions')
+
+    def __init__(self, quiz_id=None, title=None, author=None, description=None, questions=None,
+                 total_questions=None):
+        self.quiz_id = quiz_id
+        self.title = title
+        self.author = author
+        self.description = description
+        self.questions = questions if questions is not None else []
+        # Set when only part of the questions is loaded (see QuizDatabase.get_quiz_header)
+        self.total_questions = total_questions
+
+    @property
+    def question_count(self):
+        if self.total_questions is not None:
+            return self.total_questions
+        return len(self.questions)
+
+    def to_dict(self):
+        """
+        Serialize to the stored form
+
+        Returns:
+            dict: {'quiz_id', 'title', 'author', 'description', 'questions': [{'question', 'options': [{'text', 'correct'}]}]}
+        """
+        data = {'quiz_id': self.quiz_id, 'title': self.title}
+        if self.author is not None:
+            data['author'] = self.author
+        if self.description is not None:
+            data['description'] = self.description
+        data['questions'] = [q.to_dict() for q in self.questions]
+        return data
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_dict(cls, data):
+        return normalize_quiz(data)
+
+    @classmethod
+    def from_json(cls, text):
+        """
+        Load a quiz from stored JSON
+
+        Args:
+            text (str): JSON in the stored form (or any legacy quiz shape)
+
+        Returns:
+            Quiz: The quiz, empty if the JSON is missing or invalid
+        """
+        if not text:
+            return cls()
+        try:
+            return normalize_quiz(json.loads(text))
+        except ValueError as e:
+            logger.error(f"Invalid stored quiz JSON: {str(e)}")
+            return cls()
+
+    def __repr__(self):
+        return f"<Quiz {self.quiz_id} ({self.title}, {len(self.questions)} questions)>"
+
+def normalize_text(text):
+    """Collapse runs of whitespace and strip the ends"""
+    return WHITESPACE_PATTERN.sub(' ', text or '').strip()
+
+def question_hash(question):
+    """
+    Hash a question by its normalized text, options and correct flags
+
+    Questions that differ only in whitespace get the same hash, so
+    question banks shared between quizzes are stored once.
+
+    Args:
+        question (Question): The question
+
+    Returns:
+        str: 32 hex characters
+    """
+    key = json.dumps(
+        [normalize_text(question.text), [[normalize_text(o.text), bool(o.correct)] for o in question.options]],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+def quiz_fingerprint(title, question_count, question_hashes, sample=FINGERPRINT_QUESTIONS):
+    """
+    Digest of a quiz's title, question count and leading questions
+
+    Cheap to compute from the first few questions of an extraction, so a
+    stored quiz can be checked against QuizBot without playing it through.
+
+    Args:
+        title (str): Normalized quiz title
+        question_count (int): Total number of questions
+        question_hashes (list): question_hash of the questions in order (at least the first sample)
+        sample (int): Number of leading questions included
+
+    Returns:
+        str: 32 hex characters
+    """
+    key = json.dumps([title or '', question_count, list(question_hashes[:sample])], separators=(',', ':'))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+def normalize_question(data):
+    """
+    Normalize one question dict of any known shape
+
+    Args:
+        data (dict or str): Question data
+
+    Returns:
+        Question: The normalized question
+    """
+    if isinstance(data, Question):
+        return data
+    if not isinstance(data, dict):
+        return Question(str(data))
+
+    text = ''
+    for key in QUESTION_TEXT_KEYS:
+        if data.get(key):
+            text = data[key]
+            break
+
+    raw_options = data.get('options')
+    if not raw_options and 'answers' in data:
+        raw_options = data['answers']
+
+    options = []
+    for option in raw_options or []:
+        if isinstance(option, dict):
+            options.append(Option(option.get('text', ''), bool(option.get('correct', False))))
+        else:
+            options.append(Option(str(option)))
+
+    # app.py stores the correct index, userbot_main the correct option text
+    correct = data.get('correct_option')
+    if isinstance(correct, int) and not isinstance(correct, bool):
+        if 0 <= correct < len(options):
+            options[correct].correct = True
+    elif isinstance(correct, str):
+        for option in options:
+            if option.text == correct:
+                option.correct = True
+                break
+
+    return Question(text, options)
+
+def normalize_quiz(data):
+    """
+    Normalize quiz data of any known shape into a Quiz
+
+    Args:
+        data (dict): Quiz data (stored form, app.py, QuizExtractor or userbot_main shape)
+
+    Returns:
+        Quiz: The normalized quiz
+    """
+    if isinstance(data, Quiz):
+        return data
+    if not isinstance(data, dict):
+        return Quiz()
+
+    return Quiz(
+        quiz_id=data.get('quiz_id') or data.get('id') or data.get('param'),
+        title=data.get('title') or data.get('quiz_title'),
+        author=data.get('author'),
+        description=data.get('description'),
+        questions=[normalize_question(q) for q in data.get('questions') or []]
+    )
@@ -0,0 +1,241 @@
+import re
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Messages containing any of these words are never taken as the quiz title
+TITLE_EXCLUDE_KEYWORDS = ['answer', 'question', 'option', 'quiz']
+
+# QuizBot messages that end a quiz run
+FINISH_MARKERS = ("Quiz finished", "Your result")
+
+# Marker QuizBot puts before or after the correct option
+CORRECT_MARK = "✅"
+
+TITLE_PATTERN = re.compile(r'Get ready for the quiz [\'\"](.+?)[\'\"]')
+TITLE_EXCLUDE_PATTERN = re.compile('|'.join(map(re.escape, TITLE_EXCLUDE_KEYWORDS)), re.IGNORECASE)
+FINISH_PATTERN = re.compile('|'.join(map(re.escape, FINISH_MARKERS)))
+QUESTION_COUNT_PATTERN = re.compile(r'(\d+)\s+questions?\b', re.IGNORECASE)
+
+class OptionMatcher:
+    """
+    Finds the ✅-marked option of one question in a single pass
+
+    Instead of searching the result text once per option, the text is
+    scanned for the marker and the text next to it is looked up in a dict
+    of the options. When a marked line carries more than the option text,
+    options are tried longest first, so an option that contains another
+    (e.g. "Paris" and "Paris, France") resolves to the one actually marked.
+    Options must end (or start) at a word boundary next to the marker, so
+    "✅ Parisian" does not match the option "Paris".
+    """
+    __slots__ = ('options', 'positions', '_by_length')
+
+    def __init__(self, options):
+        """
+        Args:
+            options (list): Option texts in button order
+        """
+        self.options = tuple(options)
+        self.positions = {}
+        for i, option in enumerate(self.options):
+            if option:
+                self.positions.setdefault(option, i)
+        self._by_length = None
+
+    def _longest_first(self):
+        if self._by_length is None:
+            self._by_length = sorted(self.positions, key=len, reverse=True)
+        return self._by_length
+
+    def _match_after(self, text, start, line_end):
+        # "✅ option": exact line first, then the longest option prefix
+        index = self.positions.get(text[start:line_end])
+        if index is not None:
+            return index
+        for option in self._longest_first():
+            end = start + len(option)
+            if text.startswith(option, start) and (end == len(text) or not _is_word_char(text[end])):
+                return self.positions[option]
+        return None
+
+    def _match_before(self, text, end, line_start):
+        # "option ✅": exact line first, then the longest option suffix
+        index = self.positions.get(text[line_start:end])
+        if index is not None:
+            return index
+        for option in self._longest_first():
+            start = end - len(option)
+            if start >= 0 and text.endswith(option, 0, end) and (start == 0 or not _is_word_char(text[start - 1])):
+                return self.positions[option]
+        return None
+
+    def find_index(self, result_text):
+        """
+        Args:
+            result_text (str): Text of the result message
+
+        Returns:
+            int: Index of the marked option or None
+        """
+        if not self.positions:
+            return None
+        text = result_text
+        pos = text.find(CORRECT_MARK)
+        while pos != -1:
+            after = pos + len(CORRECT_MARK)
+            if text.startswith(' ', after):
+                line_end = text.find('\n', after)
+                index = self._match_after(text, after + 1, len(text) if line_end == -1 else line_end)
+                if index is not None:
+                    return index
+            if pos > 0 and text[pos - 1] == ' ':
+                index = self._match_before(text, pos - 1, text.rfind('\n', 0, pos) + 1)
+                if index is not None:
+                    return index
+            pos = text.find(CORRECT_MARK, after)
+        return None
+
+    def find(self, result_text):
+        """
+        Args:
+            result_text (str): Text of the result message
+
+        Returns:
+            str: The marked option text or None
+        """
+        index = self.find_index(result_text)
+        return None if index is None else self.options[index]
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+@lru_cache(maxsize=4096)
+def _get_option_matcher(options):
+    return OptionMatcher(options)
+
+def get_option_matcher(options):
+    """Return the compiled matcher for an option set (cached per distinct set)"""
+    return _get_option_matcher(tuple(options))
+
+def extract_title(text):
+    """
+    Extract the quiz title from QuizBot's start reply
+
+    Args:
+        text (str): Text of the first QuizBot message
+
+    Returns:
+        str: The quiz title or "Untitled Quiz"
+    """
+    title_match = TITLE_PATTERN.search(text)
+    if title_match:
+        return title_match.group(1)
+    return "Untitled Quiz"
+
+def extract_question_count(text):
+    """
+    Extract the number of questions from QuizBot's start reply
+
+    Args:
+        text (str): Text of the first QuizBot message
+
+    Returns:
+        int: The announced question count or None if it is not stated
+    """
+    count_match = QUESTION_COUNT_PATTERN.search(text or '')
+    if count_match:
+        return int(count_match.group(1))
+    return None
+
+def extract_correct_option(result_text, options):
+    """
+    Find the option marked with ✅ in a QuizBot result message
+
+    Args:
+        result_text (str): Text of the result message
+        options (list): Option texts of the question
+
+    Returns:
+        str: The correct option text or None if no option is marked
+    """
+    return get_option_matcher(options).find(result_text)
+
+def is_title_candidate(text):
+    """Check whether a message looks like a quiz title (short, no quiz keywords)"""
+    return text.count('\n') <= 1 and not TITLE_EXCLUDE_PATTERN.search(text)
+
+def is_finish_message(text):
+    """Check whether a message ends the quiz"""
+    return FINISH_PATTERN.search(text) is not None
+
+def parse_quiz_messages(messages, shortcode):
+    """
+    Build quiz data from a batch of QuizBot messages (QuizExtractor format)
+
+    Args:
+        messages (list): QuizBot messages, newest first
+        shortcode (str): The original shortcode
+
+    Returns:
+        dict: Quiz data with 'question'/'options'[{'text', 'correct'}] questions
+    """
+    # Initialize quiz data structure
+    quiz_data = {
+        'id': shortcode,
+        'title': 'Telegram Quiz',
+        'questions': [],
+        'source': 'QuizBot'
+    }
+
+    # Check for the quiz title in the initial messages
+    for msg in messages:
+        if hasattr(msg, 'message') and msg.message:
+            # Look for patterns that might indicate the quiz title
+            if is_title_candidate(msg.message):
+                quiz_data['title'] = msg.message.strip()
+                break
+
+    # Approach 1: Try to extract quiz data from media buttons
+    quiz_found = False
+
+    for msg in messages:
+        # Check if the message has buttons (quiz options)
+        if hasattr(msg, 'buttons') and msg.buttons:
+            quiz_found = True
+
+            # Extract the question
+            question_text = msg.message if hasattr(msg, 'message') else "Quiz Question"
+
+            # Extract options
+            options = []
+
+            for row in msg.buttons:
+                for button in row:
+                    # Store the button text as an option
+                    options.append({
+                        'text': button.text,
+                        'correct': False  # We'll update this later
+                    })
+
+            # Add this question to our quiz data
+            quiz_data['questions'].append({
+                'question': question_text,
+                'options': options
+            })
+
+    # Approach 2: If no quiz was found, mark the quiz for enhanced extraction
+    if not quiz_found:
+        quiz_data['questions'].append({
+            'question': f"Quiz with code {shortcode} requires enhanced extraction",
+            'options': [
+                {'text': "Implementing enhanced extraction...", 'correct': True},
+                {'text': "Standard extraction not available for this quiz", 'correct': False}
+            ]
+        })
+
+        # Mark that this quiz needs further processing
+        quiz_data['requires_enhanced_extraction'] = True
+
+    return quiz_data
@@ -0,0 +1,218 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from utils.quiz_model import FINGERPRINT_QUESTIONS
+from utils.persistence_queue import persistence_queue
+
+logger = logging.getLogger(__name__)
+
+# Seconds a stored quiz is served without being checked against QuizBot
+QUIZ_TTL = float(os.environ.get("QUIZ_TTL_HOURS", "24")) * 3600
+
+# Telegram API calls the scheduler may spend per minute (bursts up to one minute's worth)
+CALLS_PER_MINUTE = float(os.environ.get("REFRESH_CALLS_PER_MINUTE", "60"))
+
+# Telegram API calls of play_quiz: starting the quiz, then per question
+CALLS_PER_EXTRACTION = 3
+CALLS_PER_QUESTION = 5
+
+# Seconds between database scans for stale quizzes
+SCAN_INTERVAL = 300
+
+# Stale quizzes queued per scan
+SCAN_BATCH_SIZE = 50
+
+# Seconds before a quiz whose revalidation failed is tried again
+FAILURE_BACKOFF = 3600
+
+class TokenBucket:
+    """
+    Call budget that refills at a fixed rate
+
+    take() may overdraw the bucket, so work whose real cost is only
+    known afterwards can be charged in full; the debt delays later work.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost):
+        """Seconds until `cost` tokens (at most a full bucket) are available"""
+        self._refill(time.monotonic())
+        missing = min(cost, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate) if self.rate > 0 else float('inf')
+
+    def take(self, cost):
+        self._refill(time.monotonic())
+        self.tokens -= cost
+
+class RefreshScheduler:
+    """
+    Stale-while-revalidate refreshing of stored quizzes
+
+    Stored quizzes are always served straight away. Quizzes not checked
+    against QuizBot within the TTL are revalidated in the background, most
+    accessed first, within a budget of Telegram API calls: a
+    revalidation plays only the first questions (see
+    utils.quiz_extractor.revalidate_quiz) and a full extraction, charged
+    afterwards, only happens when the quiz changed. Changed quizzes are
+    saved through the persistence queue. Runs as a task on the event loop
+    of the Telegram client, one revalidation at a time.
+    """
+
+    def __init__(self, database, refresh, ttl=QUIZ_TTL, calls_per_minute=CALLS_PER_MINUTE,
+                 sample=FINGERPRINT_QUESTIONS, scan_interval=SCAN_INTERVAL,
+                 scan_batch_size=SCAN_BATCH_SIZE, save=None):
+        """
+        Args:
+            database (AsyncQuizDatabase): Database access from the event loop
+            refresh (callable): async (quiz_id, stored fingerprint) -> (current, quiz data),
+                e.g. revalidate_quiz bound to a client
+            ttl (float): Seconds a check stays valid
+            calls_per_minute (float): Telegram API call budget
+            sample (int): Questions played per revalidation
+            scan_interval (float): Seconds between scans for stale quizzes
+            scan_batch_size (int): Stale quizzes queued per scan
+            save (callable, optional): (quiz_id, quiz data) for changed quizzes,
+                persistence_queue.submit by default
+        """
+        self.database = database
+        self.refresh = refresh
+        self.ttl = ttl
+        self.sample = sample
+        self.scan_interval = scan_interval
+        self.scan_batch_size = scan_batch_size
+        self.save = save or persistence_queue.submit
+        self.budget = TokenBucket(calls_per_minute / 60.0, calls_per_minute)
+        # Heap of (-access_count, quiz_id)
+        self.queue = []
+        self.queued = set()
+        # Served quizzes waiting for a staleness check: quiz_id -> access_count
+        self.served = {}
+        self.retry_after = {}
+        self.next_scan = 0.0
+        # Created in run(), on the loop it belongs to
+        self.wakeup = None
+        self.task = None
+        self.current = 0
+        self.changed = 0
+        self.failed = 0
+
+    def start(self, loop=None):
+        """Start the scheduler task on an event loop (the running one by default)"""
+        if self.task is None:
+            loop = loop or asyncio.get_event_loop()
+            self.task = loop.create_task(self.run())
+        return self.task
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def notify(self, quiz):
+        """
+        Note that a stored quiz was just served; no I/O happens here
+
+        Args:
+            quiz (Quiz): Quiz row or snapshot
+        """
+        if quiz.quiz_id not in self.queued:
+            self.served[quiz.quiz_id] = quiz.access_count or 0
+            if self.wakeup is not None:
+                self.wakeup.set()
+
+    def stats(self):
+        """
+        Queue length and outcome counters
+
+        Returns:
+            dict: Queued and pending quizzes, revalidations that found the
+                quiz current, changed or failed, and the call budget left
+        """
+        return {
+            'queued': len(self.queue),
+            'served_pending': len(self.served),
+            'current': self.current,
+            'changed': self.changed,
+            'failed': self.failed,
+            'budget_tokens': round(self.budget.tokens, 1)
+        }
+
+    async def run(self):
+        self.wakeup = asyncio.Event()
+        while True:
+            try:
+                await self._collect()
+                if not self.queue:
+                    await self._sleep(max(1.0, self.next_scan - time.monotonic()))
+                    continue
+                probe_cost = CALLS_PER_EXTRACTION + CALLS_PER_QUESTION * self.sample
+                wait = self.budget.wait_time(probe_cost)
+                if wait > 0:
+                    await self._sleep(wait)
+                    continue
+                _, quiz_id = heapq.heappop(self.queue)
+                self.queued.discard(quiz_id)
+                self.budget.take(probe_cost)
+                await self._revalidate(quiz_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in refresh scheduler: {str(e)}")
+                await asyncio.sleep(self.scan_interval)
+
+    async def _sleep(self, seconds):
+        # Woken early when a served quiz needs checking
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _collect(self):
+        now = time.monotonic()
+        stale = []
+        if self.served:
+            served, self.served = self.served, {}
+            stale.extend(await self.database.get_stale_quizzes(self.ttl, len(served), list(served)))
+        if now >= self.next_scan:
+            self.next_scan = now + self.scan_interval
+            stale.extend(await self.database.get_stale_quizzes(self.ttl, self.scan_batch_size))
+        for quiz_id, access_count in stale:
+            if quiz_id in self.queued or self.retry_after.get(quiz_id, 0) > now:
+                continue
+            self.retry_after.pop(quiz_id, None)
+            heapq.heappush(self.queue, (-access_count, quiz_id))
+            self.queued.add(quiz_id)
+
+    async def _revalidate(self, quiz_id):
+        quiz = await self.database.get_quiz_by_id(quiz_id)
+        if quiz is None:
+            return
+        fingerprint = await self.database.get_quiz_fingerprint(quiz, self.sample)
+        current, quiz_data = await self.refresh(quiz_id, fingerprint)
+        if current:
+            await self.database.mark_quiz_verified(quiz_id)
+            self.current += 1
+            return
+        if not quiz_data or 'error' in quiz_data:
+            error = quiz_data.get('error') if quiz_data else 'no data'
+            logger.warning(f"Could not revalidate quiz {quiz_id}, retrying later: {error}")
+            self.retry_after[quiz_id] = time.monotonic() + FAILURE_BACKOFF
+            self.failed += 1
+            return
+        # The full extraction is charged once its length is known
+        self.budget.take(CALLS_PER_EXTRACTION + CALLS_PER_QUESTION * len(quiz_data.get('questions', [])))
+        logger.info(f"Quiz {quiz_id} changed on QuizBot, saving the new version")
+        self.save(quiz_id, quiz_data)
+        self.changed += 1
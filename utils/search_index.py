@@ -0,0 +1,222 @@
+import re
+import logging
+from sqlalchemy import text
+from sqlalchemy.orm import undefer_group
+from models import db, Quiz
+
+logger = logging.getLogger(__name__)
+
+# Words of a search query; everything else is dropped before building
+# the backend query so user input can never break the MATCH/tsquery syntax
+QUERY_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+SNIPPET_LENGTH = 160
+
+class QuizSearchIndex:
+    """
+    Full-text index over quiz titles and text exports
+
+    PostgreSQL: a weighted tsvector column on the quiz table with a GIN index.
+    SQLite: an FTS5 table keyed by the quiz row id.
+
+    The index is maintained from Python values in the same transaction as
+    save_quiz/delete_quiz, so it never depends on how the quiz columns are
+    stored. Until ensure() has run on an engine, indexing is skipped and
+    searches fall back to the old ILIKE scan.
+    """
+
+    # Engine URLs whose index structures are known to exist
+    _ready = set()
+
+    @staticmethod
+    def backend():
+        """Return 'postgresql', 'sqlite' or None if full-text search is unsupported"""
+        name = db.engine.dialect.name
+        return name if name in ('postgresql', 'sqlite') else None
+
+    @staticmethod
+    def is_ready():
+        return str(db.engine.url) in QuizSearchIndex._ready
+
+    @staticmethod
+    def ensure(load_body=None):
+        """
+        Create the index structures if needed and backfill existing quizzes
+
+        Args:
+            load_body (callable, optional): Returns the searchable text of a
+                quiz row for the backfill, see rebuild()
+
+        Returns:
+            bool: True if full-text search is available
+        """
+        backend = QuizSearchIndex.backend()
+        if not backend:
+            logger.info(f"Full-text search not supported on {db.engine.dialect.name}, using ILIKE")
+            return False
+
+        try:
+            if backend == 'postgresql':
+                exists = db.session.execute(text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'quiz' AND column_name = 'search_vector'"
+                )).first() is not None
+                if not exists:
+                    db.session.execute(text("ALTER TABLE quiz ADD COLUMN search_vector tsvector"))
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_quiz_search_vector ON quiz USING GIN (search_vector)"
+                ))
+            else:
+                exists = db.session.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quiz_fts'"
+                )).first() is not None
+                if not exists:
+                    db.session.execute(text(
+                        "CREATE VIRTUAL TABLE quiz_fts USING fts5("
+                        "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+                    ))
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error creating search index: {str(e)}")
+            db.session.rollback()
+            return False
+
+        QuizSearchIndex._ready.add(str(db.engine.url))
+        if not exists:
+            QuizSearchIndex.rebuild(load_body=load_body)
+        return True
+
+    @staticmethod
+    def index_quiz(quiz, body):
+        """
+        Add or refresh a quiz in the index (caller commits)
+
+        Args:
+            quiz (Quiz): Flushed quiz row
+            body (str): Searchable text (questions and options)
+        """
+        if not QuizSearchIndex.is_ready():
+            return
+        params = {'id': quiz.id, 'title': quiz.title or '', 'body': body or ''}
+        if QuizSearchIndex.backend() == 'postgresql':
+            db.session.execute(text(
+                "UPDATE quiz SET search_vector = "
+                "setweight(to_tsvector('simple', :title), 'A') || "
+                "setweight(to_tsvector('simple', :body), 'B') "
+                "WHERE id = :id"
+            ), params)
+        else:
+            db.session.execute(text("DELETE FROM quiz_fts WHERE rowid = :id"), params)
+            db.session.execute(text(
+                "INSERT INTO quiz_fts (rowid, title, body) VALUES (:id, :title, :body)"
+            ), params)
+
+    @staticmethod
+    def remove_quiz(quiz):
+        """Remove a quiz from the index (caller commits)"""
+        if not QuizSearchIndex.is_ready():
+            return
+        if QuizSearchIndex.backend() == 'sqlite':
+            db.session.execute(text("DELETE FROM quiz_fts WHERE rowid = :id"), {'id': quiz.id})
+        # On PostgreSQL the vector is deleted together with the row
+
+    @staticmethod
+    def search(query, limit=10):
+        """
+        Ranked full-text search
+
+        Args:
+            query (str): Free-text search query
+            limit (int): Maximum number of results
+
+        Returns:
+            list: (quiz row id, rank, snippet or None) tuples, best match first;
+                None if the index is not available
+        """
+        if not QuizSearchIndex.is_ready():
+            return None
+        tokens = QUERY_TOKEN_PATTERN.findall(query or '')
+        if not tokens:
+            return []
+
+        if QuizSearchIndex.backend() == 'postgresql':
+            # Every word must match, the last one as a prefix (search-as-you-type)
+            tsquery = ' & '.join(tokens[:-1] + [tokens[-1] + ':*'])
+            rows = db.session.execute(text(
+                "SELECT id, ts_rank_cd(search_vector, q) AS rank "
+                "FROM quiz, to_tsquery('simple', :q) AS q "
+                "WHERE search_vector @@ q "
+                "ORDER BY rank DESC, id "
+                "LIMIT :limit"
+            ), {'q': tsquery, 'limit': limit}).fetchall()
+            return [(row[0], row[1], None) for row in rows]
+
+        match = ' '.join(f'"{t}"' for t in tokens[:-1]) + f' "{tokens[-1]}"*'
+        rows = db.session.execute(text(
+            "SELECT rowid, bm25(quiz_fts, 10.0, 1.0) AS rank, "
+            "snippet(quiz_fts, 1, '[', ']', '…', 12) "
+            "FROM quiz_fts WHERE quiz_fts MATCH :match "
+            "ORDER BY rank LIMIT :limit"
+        ), {'match': match.strip(), 'limit': limit}).fetchall()
+        # bm25() is lower-is-better; flip it so higher rank means a better match
+        return [(row[0], -row[1], row[2]) for row in rows]
+
+    @staticmethod
+    def rebuild(batch_size=500, load_body=None):
+        """
+        Re-index every stored quiz
+
+        Args:
+            batch_size (int): Quizzes indexed per transaction
+            load_body (callable, optional): Returns the searchable text of a
+                quiz row; defaults to its stored formatted_data
+
+        Returns:
+            int: Number of quizzes indexed
+        """
+        load_body = load_body or (lambda quiz: quiz.formatted_data)
+        count = 0
+        last_id = 0
+        try:
+            while True:
+                batch = (Quiz.query.options(undefer_group('content'))
+                         .filter(Quiz.id > last_id)
+                         .order_by(Quiz.id).limit(batch_size).all())
+                if not batch:
+                    break
+                for quiz in batch:
+                    QuizSearchIndex.index_quiz(quiz, load_body(quiz))
+                db.session.commit()
+                count += len(batch)
+                last_id = batch[-1].id
+            logger.info(f"Search index rebuilt for {count} quizzes")
+        except Exception as e:
+            logger.error(f"Error rebuilding search index: {str(e)}")
+            db.session.rollback()
+        return count
+
+def make_snippet(body, query, length=SNIPPET_LENGTH):
+    """
+    Cut a snippet around the first query word found in the text
+
+    Args:
+        body (str): Text to cut the snippet from
+        query (str): The search query
+        length (int): Approximate snippet length
+
+    Returns:
+        str: Snippet with the matched word in [brackets]
+    """
+    if not body:
+        return ''
+    lowered = body.lower()
+    for token in QUERY_TOKEN_PATTERN.findall(query.lower()):
+        pos = lowered.find(token)
+        if pos == -1:
+            continue
+        start = max(0, pos - length // 2)
+        end = min(len(body), start + length)
+        snippet = (body[start:pos] + '[' + body[pos:pos + len(token)] + ']'
+                   + body[pos + len(token):end]).replace('\n', ' ')
+        return ('…' if start > 0 else '') + snippet + ('…' if end < len(body) else '')
+    return body[:length].replace('\n', ' ')
@@ -0,0 +1,158 @@
+import os
+import struct
+import logging
+import threading
+from utils.compressed_text import compress_bytes, decompress_bytes
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Directory the archive segments are written to
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "archive")
+
+# A segment is closed and a new one started once it grows past this size
+MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Record header: magic, codec letter, payload length
+RECORD_MAGIC = b'QZA1'
+RECORD_HEADER = struct.Struct('>4ssI')
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.qza'
+
+class SegmentStore:
+    """
+    Append-only files of compressed records
+
+    Each record is a small header (magic, codec, length) followed by the
+    compressed payload. append() returns the segment name, offset and
+    length of the record, which is all read() needs to fetch it back with
+    a single seek. Records are never rewritten; a record that is no longer
+    referenced is simply dead space in its segment. Appends are serialized
+    with a lock, and with an flock on the segment so several processes can
+    share the directory.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, max_segment_bytes=MAX_SEGMENT_BYTES):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.lock = threading.Lock()
+
+    def segments(self):
+        """Names of the existing segments, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+    def _current_segment(self, incoming):
+        segments = self.segments()
+        if segments:
+            name = segments[-1]
+            size = os.path.getsize(os.path.join(self.directory, name))
+            if size == 0 or size + incoming <= self.max_segment_bytes:
+                return name
+            number = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1
+        else:
+            number = 1
+        return f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+
+    def append(self, payload):
+        """
+        Append one record
+
+        Args:
+            payload (bytes): The data to store
+
+        Returns:
+            tuple: (segment name, offset, length) locating the record
+        """
+        return self.append_many([payload])[0]
+
+    def append_many(self, payloads):
+        """
+        Append several records with a single write and fsync
+
+        Args:
+            payloads (list): bytes objects to store
+
+        Returns:
+            list: (segment name, offset, length) of each record, in order
+        """
+        records = []
+        for payload in payloads:
+            codec, compressed = compress_bytes(payload)
+            records.append(RECORD_HEADER.pack(RECORD_MAGIC, codec.encode('ascii'), len(compressed)) + compressed)
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            name = self._current_segment(sum(len(record) for record in records))
+            with open(os.path.join(self.directory, name), 'ab') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0, os.SEEK_END)
+                    offset = f.tell()
+                    f.write(b''.join(records))
+                    f.flush()
+                    os.fsync(f.fileno())
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+        locations = []
+        for record in records:
+            locations.append((name, offset, len(record)))
+            offset += len(record)
+        return locations
+
+    def read(self, segment, offset, length):
+        """
+        Read back a record written by append()
+
+        Returns:
+            bytes: The original payload
+
+        Raises:
+            ValueError: If the location does not hold a valid record
+        """
+        if os.path.basename(segment) != segment:
+            raise ValueError(f"Invalid segment name: {segment!r}")
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            f.seek(offset)
+            record = f.read(length)
+        return self._decode(record, segment, offset)
+
+    def iter_records(self, segment):
+        """
+        Scan a segment, e.g. to rebuild a lost offset index
+
+        Yields:
+            tuple: (offset, length, payload) of each record
+        """
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            offset = 0
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                _, _, size = RECORD_HEADER.unpack(header)
+                record = header + f.read(size)
+                yield offset, len(record), self._decode(record, segment, offset)
+                offset += len(record)
+
+    @staticmethod
+    def _decode(record, segment, offset):
+        if len(record) < RECORD_HEADER.size:
+            raise ValueError(f"Truncated record at {segment}:{offset}")
+        magic, codec, size = RECORD_HEADER.unpack_from(record)
+        if magic != RECORD_MAGIC or len(record) != RECORD_HEADER.size + size:
+            raise ValueError(f"No valid record at {segment}:{offset}")
+        return decompress_bytes(codec.decode('ascii'), record[RECORD_HEADER.size:])
+
+# Shared store for archived quizzes
+archive_store = SegmentStore()
@@ -0,0 +1,492 @@
+import os
+import copy
+import heapq
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from collections import namedtuple
+from utils import quiz_model
+from utils.quiz_model import normalize_quiz
+from utils.quiz_formatter import render_quiz
+from utils.quiz_cache import QuizSnapshot
+from utils.compressed_text import compress_text, decompress_text
+
+logger = logging.getLogger(__name__)
+
+# Shards used when none are configured; changing it for an existing
+# directory needs a reshard, since quizzes are placed by hash
+DEFAULT_SHARDS = int(os.environ.get("SHARD_COUNT", "8"))
+
+# Quiz storage of the app: 'sqlalchemy' (QuizDatabase on the configured
+# database) or 'sharded' (ShardedQuizStore in SHARD_DIR)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sqlalchemy")
+STORAGE_BACKENDS = ('sqlalchemy', 'sharded')
+SHARD_DIR = os.environ.get("SHARD_DIR", "shards")
+
+# Applied to every shard connection: WAL lets readers run beside the one
+# writer, and synchronous=NORMAL only fsyncs at checkpoints
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS quiz (
+        id INTEGER PRIMARY KEY,
+        quiz_id TEXT NOT NULL UNIQUE,
+        title TEXT,
+        author TEXT,
+        description TEXT,
+        question_count INTEGER DEFAULT 0,
+        raw_data TEXT,
+        created_at TEXT,
+        last_accessed TEXT,
+        access_count INTEGER DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_last_accessed_id ON quiz (last_accessed, id)",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_access_count_id ON quiz (access_count, id)",
+    """CREATE TABLE IF NOT EXISTS quiz_attempt (
+        id INTEGER PRIMARY KEY,
+        quiz_id INTEGER NOT NULL REFERENCES quiz (id),
+        user_id TEXT,
+        score INTEGER DEFAULT 0,
+        max_score INTEGER DEFAULT 0,
+        completed INTEGER DEFAULT 0,
+        started_at TEXT,
+        completed_at TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_attempt_quiz_id ON quiz_attempt (quiz_id)",
+)
+
+QUIZ_COLUMNS = ('id', 'quiz_id', 'title', 'author', 'description', 'question_count',
+                'raw_data', 'created_at', 'last_accessed', 'access_count')
+
+# Read-only copy of a stored attempt
+AttemptRecord = namedtuple('AttemptRecord', [
+    'id', 'quiz_id', 'user_id', 'score', 'max_score', 'completed', 'started_at', 'completed_at'
+])
+
+def shard_of(quiz_id, shard_count):
+    """Shard index of a quiz identifier (stable across processes and restarts)"""
+    digest = hashlib.blake2b(quiz_id.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shard_count
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+def unsupported(feature):
+    """Error for a feature that only exists on the SQLAlchemy database"""
+    return NotImplementedError(f"{feature} is not available with STORAGE_BACKEND=sharded; "
+                               "it needs the SQLAlchemy database")
+
+def open_quiz_store(backend=None, directory=None, shards=None):
+    """
+    Open the quiz storage selected by STORAGE_BACKEND
+
+    Args:
+        backend (str, optional): 'sqlalchemy' or 'sharded', STORAGE_BACKEND if None
+        directory (str, optional): Shard directory, SHARD_DIR if None
+        shards (int, optional): Number of shards, DEFAULT_SHARDS if None
+
+    Returns:
+        The QuizDatabase class, or a ShardedQuizStore
+
+    Raises:
+        ValueError: If the backend is not one of STORAGE_BACKENDS
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend == 'sqlalchemy':
+        from utils.database import QuizDatabase
+        return QuizDatabase
+    if backend == 'sharded':
+        return ShardedQuizStore(directory or SHARD_DIR, shards or DEFAULT_SHARDS)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected one of {', '.join(STORAGE_BACKENDS)}")
+
+class ShardedQuizStore:
+    """
+    Embedded quiz storage spread over N SQLite files
+
+    For single-node deployments without PostgreSQL. Quizzes are placed by
+    a hash of their quiz_id and their attempts live in the same shard, so
+    writes to different shards never wait on the same file lock. Every
+    thread keeps one connection per shard. Reads of a single quiz touch one
+    shard; the recent/popular/search views query every shard and merge.
+
+    Selected with STORAGE_BACKEND=sharded (see open_quiz_store). Mirrors
+    the QuizDatabase methods the bot and the quiz pages use (saving,
+    lookup, questions and exports, access counting, attempts and the
+    recent/popular/search listings) with the same names and return shapes
+    (QuizSnapshot for quizzes). Questions are read from the stored quiz
+    JSON; there is no question store, full-text index, version history,
+    attempt statistics or archive, and calling any other QuizDatabase
+    method raises NotImplementedError saying so. Accesses are written
+    straight to the shard rather than buffered. Row ids are made unique
+    across shards as local_id * N + shard.
+    """
+
+    def __init__(self, directory, shards=DEFAULT_SHARDS):
+        self.directory = directory
+        self.shard_count = shards
+        self.paths = [os.path.join(directory, f"quizzes-{index:02d}.db") for index in range(shards)]
+        self.local = threading.local()
+        self.write_locks = [threading.Lock() for _ in range(shards)]
+        os.makedirs(directory, exist_ok=True)
+        for index in range(shards):
+            connection = self._connection(index)
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+
+    def __getattr__(self, name):
+        # QuizDatabase features the shards lack fail with a clear error
+        from utils.database import QuizDatabase
+        if name.startswith('_') or not callable(getattr(QuizDatabase, name, None)):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            raise unsupported(name)
+        call.__name__ = name
+        return call
+
+    def _connection(self, index):
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            connections = self.local.connections = [None] * self.shard_count
+        connection = connections[index]
+        if connection is None:
+            connection = sqlite3.connect(self.paths[index], timeout=5.0)
+            for pragma in PRAGMAS:
+                connection.execute(pragma)
+            connections[index] = connection
+        return connection
+
+    def close(self):
+        """Close this thread's shard connections"""
+        for connection in getattr(self.local, 'connections', None) or []:
+            if connection is not None:
+                connection.close()
+        self.local.connections = None
+
+    def _global_id(self, index, local_id):
+        return local_id * self.shard_count + index
+
+    def _split_id(self, global_id):
+        return global_id % self.shard_count, global_id // self.shard_count
+
+    def _snapshot(self, index, row):
+        data = dict(zip(QUIZ_COLUMNS, row))
+        return QuizSnapshot(
+            id=self._global_id(index, data['id']),
+            quiz_id=data['quiz_id'],
+            title=data['title'],
+            author=data['author'],
+            description=data['description'],
+            question_count=data['question_count'],
+            raw_data=decompress_text(data['raw_data']),
+            formatted_data=None,
+            created_at=_parse_time(data['created_at']),
+            last_accessed=_parse_time(data['last_accessed']),
+            access_count=data['access_count']
+        )
+
+    def save_quiz(self, quiz_id, quiz_data):
+        """
+        Save or update a quiz
+
+        Args:
+            quiz_id (str): The quiz identifier
+            quiz_data (dict): Quiz data to save
+
+        Returns:
+            QuizSnapshot: The saved quiz or None if the save fails
+        """
+        if not self.save_quizzes([(quiz_id, quiz_data)]):
+            return None
+        return self.get_quiz_by_id(quiz_id)
+
+    def save_quizzes(self, quizzes):
+        """
+        Save or update many quizzes, one transaction per shard
+
+        Args:
+            quizzes (iterable): (quiz_id, quiz_data) pairs
+
+        Returns:
+            int: Number of quizzes saved
+        """
+        saved = 0
+        for index, rows in self._rows_by_shard(quizzes).items():
+            try:
+                saved += self._write_shard(index, rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error saving {len(rows)} quizzes to shard {index}: {str(e)}")
+        return saved
+
+    def write_quiz_batch(self, batch):
+        """
+        Save or update quizzes, raising on failure
+
+        For callers that handle errors themselves (e.g. the persistence
+        queue's retries). Each shard commits on its own, so shards written
+        before the failing one keep their quizzes; saving them again is an
+        update.
+
+        Args:
+            batch (list): (quiz_id, quiz_data) pairs
+
+        Returns:
+            int: Number of quizzes saved
+        """
+        return sum(self._write_shard(index, rows) for index, rows in self._rows_by_shard(batch).items())
+
+    def _rows_by_shard(self, quizzes):
+        by_shard = {}
+        now = datetime.utcnow().isoformat()
+        for quiz_id, quiz_data in quizzes:
+            # normalize_quiz returns Quiz objects as they are; copy before
+            # setting quiz_id so the caller's object is left alone
+            normalized = copy.copy(normalize_quiz(quiz_data))
+            normalized.quiz_id = quiz_id
+            by_shard.setdefault(shard_of(quiz_id, self.shard_count), {})[quiz_id] = (
+                quiz_id, normalized.title or 'Telegram Quiz', normalized.author, normalized.description,
+                normalized.question_count, compress_text(normalized.to_json()), now, now
+            )
+        return by_shard
+
+    def _write_shard(self, index, rows):
+        connection = self._connection(index)
+        with self.write_locks[index], connection:
+            connection.executemany(
+                """INSERT INTO quiz (quiz_id, title, author, description, question_count,
+                                     raw_data, created_at, last_accessed, access_count)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+                   ON CONFLICT (quiz_id) DO UPDATE SET
+                       title = excluded.title,
+                       author = coalesce(excluded.author, quiz.author),
+                       description = coalesce(excluded.description, quiz.description),
+                       question_count = excluded.question_count,
+                       raw_data = excluded.raw_data,
+                       last_accessed = excluded.last_accessed,
+                       access_count = quiz.access_count + 1""",
+                list(rows.values())
+            )
+        return len(rows)
+
+    def get_quiz_by_id(self, quiz_id):
+        """
+        Get a quiz by its unique ID
+
+        Returns:
+            QuizSnapshot: The quiz or None if not found
+        """
+        index = shard_of(quiz_id, self.shard_count)
+        try:
+            row = self._connection(index).execute(
+                f"SELECT {', '.join(QUIZ_COLUMNS)} FROM quiz WHERE quiz_id = ?", (quiz_id,)
+            ).fetchone()
+            return self._snapshot(index, row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving quiz by ID: {str(e)}")
+            return None
+
+    def load_quiz_data(self, quiz):
+        """Normalized quiz data (utils.quiz_model.Quiz) of a stored quiz"""
+        return quiz_model.Quiz.from_json(quiz.raw_data)
+
+    def get_formatted_text(self, quiz):
+        """Text export of a stored quiz"""
+        return render_quiz(self.load_quiz_data(quiz), 'txt')
+
+    def get_quiz_header(self, quiz):
+        """Question-less utils.quiz_model.Quiz for streaming exports"""
+        return quiz_model.Quiz(
+            quiz_id=quiz.quiz_id,
+            title=quiz.title,
+            author=quiz.author,
+            description=quiz.description,
+            total_questions=quiz.question_count or 0
+        )
+
+    def get_questions(self, quiz, offset=0, limit=None):
+        """
+        Load a range of questions of a quiz
+
+        Returns:
+            list: utils.quiz_model.Question objects in quiz order
+        """
+        questions = self.load_quiz_data(quiz).questions
+        return questions[offset:offset + limit if limit is not None else None]
+
+    def iter_questions(self, quiz, batch_size=None):
+        """Questions of a quiz in order; the whole quiz is one row, so batch_size is unused"""
+        return iter(self.load_quiz_data(quiz).questions)
+
+    def record_access(self, quiz):
+        """Update the access count and last accessed timestamp of a quiz"""
+        index, local_id = self._split_id(quiz.id)
+        connection = self._connection(index)
+        try:
+            with self.write_locks[index], connection:
+                connection.execute(
+                    "UPDATE quiz SET access_count = access_count + 1, last_accessed = ? WHERE id = ?",
+                    (datetime.utcnow().isoformat(), local_id)
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error recording quiz access: {str(e)}")
+            return False
+
+    def get_access_stats(self, quiz):
+        """
+        Get the access count and last access time, as stored now
+
+        Returns:
+            tuple: (access count, last accessed datetime)
+        """
+        index, local_id = self._split_id(quiz.id)
+        try:
+            row = self._connection(index).execute(
+                "SELECT access_count, last_accessed FROM quiz WHERE id = ?", (local_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading quiz access stats: {str(e)}")
+            row = None
+        if row is None:
+            return quiz.access_count or 0, quiz.last_accessed
+        return row[0] or 0, _parse_time(row[1])
+
+    def count_quizzes(self):
+        """Number of stored quizzes across all shards"""
+        try:
+            return sum(self._connection(index).execute("SELECT count(*) FROM quiz").fetchone()[0]
+                       for index in range(self.shard_count))
+        except sqlite3.Error as e:
+            logger.error(f"Error counting quizzes: {str(e)}")
+            return 0
+
+    def delete_quiz(self, quiz_id):
+        """
+        Delete a quiz and its attempts
+
+        Returns:
+            bool: True if the quiz existed and was deleted
+        """
+        index = shard_of(quiz_id, self.shard_count)
+        connection = self._connection(index)
+        try:
+            with self.write_locks[index], connection:
+                row = connection.execute("SELECT id FROM quiz WHERE quiz_id = ?", (quiz_id,)).fetchone()
+                if row is None:
+                    return False
+                connection.execute("DELETE FROM quiz_attempt WHERE quiz_id = ?", row)
+                connection.execute("DELETE FROM quiz WHERE id = ?", row)
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting quiz: {str(e)}")
+            return False
+
+    def _fan_out(self, sql, params, key, limit):
+        # Top `limit` rows of every shard, merged by key (largest first)
+        per_shard = []
+        for index in range(self.shard_count):
+            rows = self._connection(index).execute(sql, params).fetchall()
+            per_shard.append([self._snapshot(index, row) for row in rows])
+        return heapq.nlargest(limit, (quiz for rows in per_shard for quiz in rows), key=key)
+
+    def get_recent_quizzes(self, limit=10):
+        """Most recently accessed quizzes across all shards"""
+        try:
+            return self._fan_out(
+                f"SELECT {', '.join(QUIZ_COLUMNS)} FROM quiz ORDER BY last_accessed DESC, id DESC LIMIT ?",
+                (limit,), lambda quiz: (quiz.last_accessed or datetime.min, quiz.id), limit
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving recent quizzes: {str(e)}")
+            return []
+
+    def get_popular_quizzes(self, limit=10):
+        """Most accessed quizzes across all shards"""
+        try:
+            return self._fan_out(
+                f"SELECT {', '.join(QUIZ_COLUMNS)} FROM quiz ORDER BY access_count DESC, id DESC LIMIT ?",
+                (limit,), lambda quiz: (quiz.access_count or 0, quiz.id), limit
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving popular quizzes: {str(e)}")
+            return []
+
+    def search_quizzes(self, query, limit=10):
+        """Quizzes whose title contains query across all shards, most accessed first"""
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        try:
+            return self._fan_out(
+                f"SELECT {', '.join(QUIZ_COLUMNS)} FROM quiz WHERE title LIKE ? ESCAPE '\\' "
+                "ORDER BY access_count DESC, id DESC LIMIT ?",
+                (pattern, limit), lambda quiz: (quiz.access_count or 0, quiz.id), limit
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Error searching quizzes: {str(e)}")
+            return []
+
+    def create_quiz_attempt(self, quiz_id, user_id=None):
+        """
+        Create a new quiz attempt in the quiz's shard
+
+        Returns:
+            AttemptRecord: The attempt or None if the quiz does not exist
+        """
+        index = shard_of(quiz_id, self.shard_count)
+        connection = self._connection(index)
+        try:
+            with self.write_locks[index], connection:
+                row = connection.execute("SELECT id, question_count FROM quiz WHERE quiz_id = ?",
+                                         (quiz_id,)).fetchone()
+                if row is None:
+                    return None
+                started_at = datetime.utcnow()
+                cursor = connection.execute(
+                    "INSERT INTO quiz_attempt (quiz_id, user_id, max_score, started_at) VALUES (?, ?, ?, ?)",
+                    (row[0], user_id, row[1] or 0, started_at.isoformat())
+                )
+            return AttemptRecord(self._global_id(index, cursor.lastrowid), self._global_id(index, row[0]),
+                                 user_id, 0, row[1] or 0, False, started_at, None)
+        except sqlite3.Error as e:
+            logger.error(f"Error creating quiz attempt: {str(e)}")
+            return None
+
+    def update_quiz_attempt(self, attempt_id, score=None, completed=None):
+        """
+        Update a quiz attempt
+
+        Returns:
+            AttemptRecord: The updated attempt or None if it does not exist
+        """
+        index, local_id = self._split_id(attempt_id)
+        connection = self._connection(index)
+        try:
+            with self.write_locks[index], connection:
+                if score is not None:
+                    connection.execute("UPDATE quiz_attempt SET score = ? WHERE id = ?", (score, local_id))
+                if completed is not None:
+                    connection.execute(
+                        "UPDATE quiz_attempt SET completed = ?, completed_at = "
+                        "CASE WHEN ? THEN ? ELSE completed_at END WHERE id = ?",
+                        (int(completed), int(completed), datetime.utcnow().isoformat(), local_id)
+                    )
+                row = connection.execute(
+                    "SELECT id, quiz_id, user_id, score, max_score, completed, started_at, completed_at "
+                    "FROM quiz_attempt WHERE id = ?", (local_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            return AttemptRecord(self._global_id(index, row[0]), self._global_id(index, row[1]), row[2],
+                                 row[3], row[4], bool(row[5]), _parse_time(row[6]), _parse_time(row[7]))
+        except sqlite3.Error as e:
+            logger.error(f"Error updating quiz attempt: {str(e)}")
+            return None
@@ -0,0 +1,159 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+from models import db, Quiz
+from utils.access_counter import access_counter
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reloads of the lists and the quiz count from the database
+REFRESH_INTERVAL = 60.0
+
+# Quizzes kept per list, i.e. the longest list that can be served
+CAPACITY = 50
+
+# Immutable snapshot of the columns the listings show
+QuizSummary = namedtuple('QuizSummary', [
+    'id', 'quiz_id', 'title', 'question_count', 'access_count', 'last_accessed'
+])
+
+def summarize(quiz, extra_hits=0):
+    return QuizSummary(quiz.id, quiz.quiz_id, quiz.title, quiz.question_count or 0,
+                       (quiz.access_count or 0) + extra_hits, quiz.last_accessed or datetime.utcnow())
+
+class TopQuizzes:
+    """
+    In-process recent/popular lists and quiz count for the home page
+
+    Both lists hold the top `capacity` quizzes and are kept exact on every
+    access and save: counts and timestamps only grow, so a quiz outside a
+    list can only overtake one by being accessed, which re-inserts it.
+    Deletions can leave a list short until the next periodic refresh,
+    which also corrects any drift from other processes.
+    """
+
+    def __init__(self, capacity=CAPACITY, refresh_interval=REFRESH_INTERVAL):
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.recent_entries = {}
+        self.popular_entries = {}
+        self.quiz_count = 0
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def recent(self, limit=10):
+        """Most recently accessed quizzes, newest first"""
+        self._maybe_refresh()
+        with self.lock:
+            entries = list(self.recent_entries.values())
+        entries.sort(key=lambda e: (e.last_accessed, e.id), reverse=True)
+        return entries[:limit]
+
+    def popular(self, limit=10):
+        """Most accessed quizzes, most accessed first"""
+        self._maybe_refresh()
+        with self.lock:
+            entries = list(self.popular_entries.values())
+        entries.sort(key=lambda e: (e.access_count, e.id), reverse=True)
+        return entries[:limit]
+
+    def count(self):
+        """Number of stored quizzes"""
+        self._maybe_refresh()
+        return self.quiz_count
+
+    def on_access(self, quiz, when=None):
+        """
+        Record an access in the lists
+
+        Args:
+            quiz (Quiz): The accessed quiz row
+            when (datetime, optional): Access time, defaults to now (UTC)
+        """
+        when = when or datetime.utcnow()
+        with self.lock:
+            current = self.popular_entries.get(quiz.id) or self.recent_entries.get(quiz.id)
+            if current is None:
+                # Not listed yet: start from the stored and buffered counts,
+                # which already include this access
+                entry = summarize(quiz, access_counter.pending(quiz.id)[0])
+                entry = entry._replace(last_accessed=max(entry.last_accessed, when))
+            else:
+                entry = current._replace(access_count=current.access_count + 1,
+                                         last_accessed=max(current.last_accessed, when))
+            self._offer(entry)
+
+    def on_saved(self, quiz, created=False):
+        """
+        Record a saved quiz in the lists
+
+        Args:
+            quiz (Quiz): The saved quiz row
+            created (bool): True if the quiz was not stored before
+        """
+        with self.lock:
+            if created:
+                self.quiz_count += 1
+            self._offer(summarize(quiz, access_counter.pending(quiz.id)[0]))
+
+    def on_deleted(self, quiz):
+        with self.lock:
+            self.recent_entries.pop(quiz.id, None)
+            self.popular_entries.pop(quiz.id, None)
+            self.quiz_count = max(0, self.quiz_count - 1)
+
+    def invalidate(self):
+        """Force a reload on the next read"""
+        self.loaded_at = None
+
+    def refresh(self):
+        """Reload both lists and the quiz count from the database"""
+        # Write out buffered accesses first so the stored counts are current
+        access_counter.flush()
+        try:
+            recent = (Quiz.query.order_by(Quiz.last_accessed.desc(), Quiz.id.desc())
+                      .limit(self.capacity).all())
+            popular = (Quiz.query.order_by(Quiz.access_count.desc(), Quiz.id.desc())
+                       .limit(self.capacity).all())
+            quiz_count = db.session.query(db.func.count(Quiz.id)).scalar()
+        except Exception as e:
+            logger.error(f"Error refreshing top quizzes: {str(e)}")
+            db.session.rollback()
+            return False
+
+        with self.lock:
+            self.recent_entries = {}
+            self.popular_entries = {}
+            for quiz in recent + popular:
+                hits, last = access_counter.pending(quiz.id)
+                entry = summarize(quiz, hits)
+                if last is not None and last > entry.last_accessed:
+                    entry = entry._replace(last_accessed=last)
+                self._offer(entry)
+            self.quiz_count = quiz_count
+            self.loaded_at = time.monotonic()
+        return True
+
+    def _maybe_refresh(self):
+        loaded_at = self.loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval:
+            self.refresh()
+
+    def _offer(self, entry):
+        # Caller holds the lock
+        self._offer_to(self.recent_entries, entry, lambda e: (e.last_accessed, e.id))
+        self._offer_to(self.popular_entries, entry, lambda e: (e.access_count, e.id))
+
+    def _offer_to(self, entries, entry, key):
+        if entry.id in entries or len(entries) < self.capacity:
+            entries[entry.id] = entry
+            return
+        lowest = min(entries.values(), key=key)
+        if key(entry) > key(lowest):
+            del entries[lowest.id]
+            entries[entry.id] = entry
+
+# Shared lists used by QuizDatabase and the home page
+top_quizzes = TopQuizzes()
@@ -0,0 +1,314 @@
+"""
+Record and replay QuizBot conversations
+
+Transcripts are stored as gzip-compressed JSON lines, one conversation per
+line, so thousands of recorded quizzes can be replayed through
+utils.quiz_extractor.play_quiz (see ReplayClient) or utils.quiz_parser
+without a Telegram connection.
+
+Line format (version 1):
+    {"v": 1, "p": <quiz param>, "m": [<message>, ...], "x": <expected result or null>}
+    message = [text, buttons, entities] or [text, buttons, entities, raw message]
+              when the raw message differs from the (markdown) text
+    buttons = [[button text, ...], ...] (rows) or 0 when the message has none
+    entities = [[type, offset, length], ...] or 0 when the message has none
+"""
+import gzip
+import json
+import asyncio
+import logging
+from utils.fake_quizbot import FakeButton, FakeMessage
+from utils.quiz_extractor import play_quiz
+from utils.quiz_parser import parse_quiz_messages
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_VERSION = 1
+
+class RecordedEntity:
+    """Formatting entity of a replayed message"""
+    __slots__ = ('type', 'offset', 'length')
+
+    def __init__(self, type, offset, length):
+        self.type = type
+        self.offset = offset
+        self.length = length
+
+class Transcript:
+    """One recorded QuizBot conversation"""
+    __slots__ = ('param', 'messages', 'expected')
+
+    def __init__(self, param, messages=None, expected=None):
+        self.param = param
+        self.messages = messages if messages is not None else []
+        self.expected = expected
+
+    def add_message(self, msg):
+        """Record a message (telethon Message or anything with text/buttons/entities)"""
+        text = getattr(msg, 'text', None) or getattr(msg, 'message', None) or ''
+        buttons = 0
+        if getattr(msg, 'buttons', None):
+            buttons = [[button.text for button in row] for row in msg.buttons]
+        entities = 0
+        if getattr(msg, 'entities', None):
+            entities = [[_entity_type(e), e.offset, e.length] for e in msg.entities]
+        record = [text, buttons, entities]
+        # Entity offsets refer to the raw message, keep it when it differs
+        raw = getattr(msg, 'message', None)
+        if raw is not None and raw != text:
+            record.append(raw)
+        self.messages.append(record)
+
+    def to_record(self):
+        return {'v': TRANSCRIPT_VERSION, 'p': self.param, 'm': self.messages, 'x': self.expected}
+
+    @classmethod
+    def from_record(cls, record):
+        if record.get('v') != TRANSCRIPT_VERSION:
+            raise ValueError(f"Unsupported transcript version: {record.get('v')}")
+        return cls(record['p'], record['m'], record.get('x'))
+
+    def replay_messages(self):
+        """
+        Rebuild the recorded messages as message objects
+
+        Returns:
+            list: FakeMessage objects in the order they were received
+        """
+        messages = []
+        for i, record in enumerate(self.messages):
+            text, buttons, entities = record[:3]
+            msg = FakeMessage(
+                i + 1,
+                text,
+                buttons=[[FakeButton(label) for label in row] for row in buttons] if buttons else None,
+                entities=[RecordedEntity(*e) for e in entities] if entities else None
+            )
+            if len(record) > 3:
+                msg.message = msg.raw_text = record[3]
+            messages.append(msg)
+        return messages
+
+def _entity_type(entity):
+    name = type(entity).__name__
+    if name.startswith('MessageEntity'):
+        name = name[len('MessageEntity'):]
+    return getattr(entity, 'type', None) or name
+
+def summarize_quiz(quiz_data):
+    """
+    Reduce extracted quiz data to what replay correctness is checked against
+
+    Args:
+        quiz_data (dict): Quiz data in userbot_main format
+
+    Returns:
+        dict: {'title', 'answers'} or None for failed extractions
+    """
+    if not quiz_data or 'error' in quiz_data:
+        return None
+    return {
+        'title': quiz_data.get('title'),
+        'answers': [q.get('correct_option') for q in quiz_data.get('questions', [])]
+    }
+
+class TranscriptWriter:
+    """Append transcripts to a gzip JSON lines file"""
+
+    def __init__(self, path, mode='at'):
+        self.path = path
+        self.file = gzip.open(path, mode, encoding='utf-8')
+        self.count = 0
+
+    def write(self, transcript):
+        self.file.write(json.dumps(transcript.to_record(), ensure_ascii=False, separators=(',', ':')))
+        self.file.write('\n')
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def read_transcripts(path):
+    """
+    Iterate over the transcripts stored in a file
+
+    Args:
+        path (str): Transcript file written by TranscriptWriter
+
+    Yields:
+        Transcript: Each recorded conversation
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield Transcript.from_record(json.loads(line))
+            except (ValueError, KeyError) as e:
+                logger.error(f"Skipping bad transcript on line {line_no}: {str(e)}")
+
+class RecordingConversation:
+    """Conversation wrapper that records every QuizBot reply"""
+
+    def __init__(self, conversation, recorder):
+        self.conversation = conversation
+        self.recorder = recorder
+        self.transcript = None
+
+    async def __aenter__(self):
+        await self.conversation.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.transcript is not None:
+            self.recorder.transcripts.append(self.transcript)
+        return await self.conversation.__aexit__(exc_type, exc, tb)
+
+    async def send_message(self, text, *args, **kwargs):
+        if text.startswith('/start'):
+            parts = text.split(maxsplit=1)
+            self.transcript = Transcript(parts[1] if len(parts) > 1 else '')
+        return await self.conversation.send_message(text, *args, **kwargs)
+
+    async def get_response(self, *args, **kwargs):
+        msg = await self.conversation.get_response(*args, **kwargs)
+        if self.transcript is not None and msg is not None:
+            self.transcript.add_message(msg)
+        return msg
+
+    def __getattr__(self, name):
+        return getattr(self.conversation, name)
+
+class RecordingClient:
+    """
+    Client wrapper that records conversations with QuizBot
+
+    Pass it as tg_client to userbot_main.extract_quiz_data; finished
+    conversations are collected in .transcripts.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.transcripts = []
+
+    def conversation(self, *args, **kwargs):
+        return RecordingConversation(self.client.conversation(*args, **kwargs), self)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+async def record_extraction(extract, quiz_param, tg_client, writer):
+    """
+    Run an extraction through a recording client and store the transcript
+
+    Args:
+        extract: Coroutine function (quiz_param, tg_client=...) -> quiz dict
+        quiz_param (str): The quiz parameter
+        tg_client: Client to record (real TelegramClient or a fake)
+        writer (TranscriptWriter): Destination for the transcript
+
+    Returns:
+        dict: The extracted quiz data
+    """
+    recording_client = RecordingClient(tg_client)
+    quiz_data = await extract(quiz_param, tg_client=recording_client)
+    if recording_client.transcripts:
+        transcript = recording_client.transcripts[-1]
+        transcript.expected = summarize_quiz(quiz_data)
+        writer.write(transcript)
+    return quiz_data
+
+class ReplayConversation:
+    """Conversation that hands out the recorded QuizBot replies in order"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def send_message(self, text, *args, **kwargs):
+        return None
+
+    async def get_response(self, *args, **kwargs):
+        """Next recorded reply; asyncio.TimeoutError once the recording ends"""
+        if not self.client.pending:
+            raise asyncio.TimeoutError()
+        msg = self.client.pending.pop()
+        self.client.latest = msg
+        return msg
+
+class ReplayClient:
+    """
+    Client seam that plays a transcript back
+
+    Implements the conversation/iter_messages interface play_quiz uses;
+    sent messages and button clicks are ignored, since QuizBot's replies
+    are already in the recording.
+    """
+
+    def __init__(self, transcript):
+        # Reversed so replies are popped from the end
+        self.pending = transcript.replay_messages()[::-1]
+        self.latest = None
+
+    def conversation(self, *args, **kwargs):
+        return ReplayConversation(self)
+
+    async def iter_messages(self, entity, limit=1):
+        if self.latest is not None and limit:
+            yield self.latest
+
+async def replay_transcript(transcript):
+    """
+    Play a recorded conversation through play_quiz
+
+    Args:
+        transcript (Transcript): Recorded conversation
+
+    Returns:
+        dict: Quiz data in userbot_main format
+    """
+    return await play_quiz(ReplayClient(transcript), transcript.param)
+
+def replay_transcript_batch(transcript, limit=10):
+    """
+    Feed a recorded conversation through QuizExtractor's message parser
+
+    Args:
+        transcript (Transcript): Recorded conversation
+        limit (int): Number of most recent messages to parse, like get_messages(limit=10)
+
+    Returns:
+        dict: Quiz data in QuizExtractor format
+    """
+    messages = transcript.replay_messages()[::-1][:limit]
+    return parse_quiz_messages(messages, transcript.param)
+
+def check_transcript(transcript, quiz_data=None):
+    """
+    Compare a replay against the result recorded with the transcript
+
+    Args:
+        transcript (Transcript): Recorded conversation with an expected result
+        quiz_data (dict, optional): Replay result; replayed if not given (outside
+            a running event loop)
+
+    Returns:
+        bool: True if the replay matches (or nothing was recorded to compare)
+    """
+    if transcript.expected is None:
+        return True
+    if quiz_data is None:
+        quiz_data = asyncio.run(replay_transcript(transcript))
+    return summarize_quiz(quiz_data) == transcript.expected